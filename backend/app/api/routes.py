@@ -1,27 +1,85 @@
 import io
 import json
 import os
+import tempfile
 
-from flask import Blueprint, jsonify, request, send_file, send_from_directory
+from flask import Blueprint, Response, jsonify, request, send_file, send_from_directory
 
-from app.config import UPLOAD_DIR
+from app.config import (
+    UPLOAD_DIR, AUDIO_STREAMING_DEFAULT, WHISPER_MODEL_SIZES, NER_MAX_CUSTOM_LABELS, DATASET_FORMATS,
+    VECTOR_SEARCH_MAX_K, OLLAMA_TENANT_HEADER, OLLAMA_BATCH_ENDPOINTS
+)
 from app.core.pipeline import SecurePipeline
+from app.core.metrics import metrics
+from app.core.circuit_breaker import ModelUnavailableError
+from app.core.ollama_scheduler import BATCH, INTERACTIVE, start_request_scheduling
+from app.processors.audio_redaction import AudioRedactor
+from app.processors.batch_blur import iter_zip_images
+from app.processors.dataset import detect_format
+from app.utils.vector_codec import negotiate_encoding, set_request_encoding, decode_vector
 
 api = Blueprint('api', __name__)
 pipeline = SecurePipeline()
 
 
+@api.before_request
+def choose_vector_encoding():
+    try:
+        encoding = negotiate_encoding(request.args.get('vector_encoding'), request.headers.get('Accept'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 406
+    set_request_encoding(encoding)
+
+
+@api.before_request
+def choose_model_priority():
+    """Bulk endpoints queue behind interactive ones for model slots; clients may only lower their priority."""
+    batch = request.endpoint in OLLAMA_BATCH_ENDPOINTS or request.headers.get('X-Priority', '').lower() == 'batch'
+    tenant = request.headers.get(OLLAMA_TENANT_HEADER) or request.remote_addr
+    start_request_scheduling(BATCH if batch else INTERACTIVE, tenant)
+
+
+@api.errorhandler(ModelUnavailableError)
+def model_unavailable(e):
+    response = jsonify({"error": str(e), "component": e.component})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, int(round(e.retry_after))))
+    return response
+
+
+def _server_error(e):
+    """500 for unexpected errors; 503 + Retry-After when a model host is unavailable."""
+    if isinstance(e, ModelUnavailableError):
+        return model_unavailable(e)
+    return jsonify({"error": str(e)}), 500
+
+
+def _custom_labels(body):
+    """Optional per-request NER label set; returns (labels, error message)."""
+    labels = body.get('labels')
+    if labels is None:
+        return None, None
+    if not isinstance(labels, list) or not all(isinstance(l, str) for l in labels):
+        return None, "labels must be a list of strings"
+    if not labels or len(labels) > NER_MAX_CUSTOM_LABELS:
+        return None, f"labels must contain 1-{NER_MAX_CUSTOM_LABELS} entries"
+    return labels, None
+
+
 @api.route('/process/text', methods=['POST'])
 def process_text():
     data = request.json
     text = data.get('text', '')
     epsilon = float(data.get('epsilon', 1.0))
+    labels, error = _custom_labels(data)
+    if error:
+        return jsonify({"error": error}), 400
 
     try:
-        result = pipeline.run_text_pipeline(text, epsilon)
+        result = pipeline.run_text_pipeline(text, epsilon, labels, chunk_vectors=bool(data.get('chunk_vectors', False)))
         return jsonify(result)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _server_error(e)
 
 
 @api.route('/process/form', methods=['POST'])
@@ -29,11 +87,14 @@ def process_form():
     body = request.json
     form_data = body.get('data', {})
     epsilon = float(body.get('epsilon', 1.0))
+    labels, error = _custom_labels(body)
+    if error:
+        return jsonify({"error": error}), 400
     try:
-        result = pipeline.run_form_pipeline(form_data, epsilon)
+        result = pipeline.run_form_pipeline(form_data, epsilon, labels)
         return jsonify(result)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _server_error(e)
 
 
 @api.route('/process/audio', methods=['POST'])
@@ -43,11 +104,57 @@ def process_audio():
 
     file = request.files['file']
     epsilon = float(request.form.get('epsilon', 1.0))
+    stream = request.form.get('stream', str(AUDIO_STREAMING_DEFAULT)).lower() == 'true'
+    model_size = request.form.get('model_size')
+    if model_size and model_size != 'auto' and model_size not in WHISPER_MODEL_SIZES:
+        return jsonify({"error": f"Unknown model_size: {model_size}"}), 400
     try:
-        result = pipeline.run_audio_pipeline(file, epsilon)
+        if stream:
+            result = pipeline.run_audio_stream_pipeline(file, epsilon, model_size)
+        else:
+            result = pipeline.run_audio_pipeline(file, epsilon, model_size)
         return jsonify(result)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _server_error(e)
+
+
+@api.route('/process/audio/redact', methods=['POST'])
+def process_audio_redact():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file"}), 400
+
+    file = request.files['file']
+    epsilon = float(request.form.get('epsilon', 1.0))
+    mode = request.form.get('mode')
+    model_size = request.form.get('model_size')
+    if model_size and model_size != 'auto' and model_size not in WHISPER_MODEL_SIZES:
+        return jsonify({"error": f"Unknown model_size: {model_size}"}), 400
+    if mode and mode not in AudioRedactor.MODES:
+        return jsonify({"error": f"Unknown redaction mode: {mode}"}), 400
+    output = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    try:
+        result = pipeline.run_audio_redaction_pipeline(file, epsilon, output, mode, model_size)
+    except Exception as e:
+        output.close()
+        return _server_error(e)
+
+    output.seek(0)
+    response = send_file(
+        output,
+        mimetype='audio/wav',
+        as_attachment=True,
+        download_name="redacted_audio.wav"
+    )
+    response.headers['X-Privacy-Metadata'] = json.dumps({
+        "unsafe_words": result.get("audit_log"),
+        "safe_description": result.get("safe_content"),
+        "redacted_ranges": result.get("redacted_ranges"),
+        "duration_seconds": result.get("duration_seconds"),
+        "whisper_model": result.get("whisper_model"),
+        "safe_vector": result.get("safe_vector"),
+        "vector_id": result.get("vector_id")
+    })
+    return response
 
 
 @api.route('/process/image/blur', methods=['POST'])
@@ -70,13 +177,133 @@ def process_image_blur():
             "description": result.get("description"),
             "unsafe_words": result.get("audit_log"),
             "safe_description": result.get("safe_content"),
-            "safe_vector": result.get("safe_vector")
-
+            "safe_vector": result.get("safe_vector"),
+            "vector_id": result.get("vector_id")
         }
         response.headers['X-Privacy-Metadata'] = json.dumps(metadata)
         return response
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _server_error(e)
+
+
+@api.route('/process/image/blur/batch', methods=['POST'])
+def process_image_blur_batch():
+    archive = request.files.get('archive')
+    files = request.files.getlist('files')
+    if archive is None and not files:
+        return jsonify({"error": "Send a zip as 'archive' or images as 'files'"}), 400
+
+    if archive is not None:
+        images = iter_zip_images(archive.stream)
+    else:
+        images = ((f.filename, f.read()) for f in files)
+
+    # Spools to disk once the archive outgrows memory.
+    output = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    try:
+        summary = pipeline.run_image_batch_pipeline(images, output)
+    except Exception as e:
+        output.close()
+        return _server_error(e)
+
+    output.seek(0)
+    response = send_file(
+        output,
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name="blurred_images.zip"
+    )
+    response.headers['X-Metadata'] = json.dumps(summary)
+    return response
+
+
+@api.route('/process/video/blur', methods=['POST'])
+def process_video_blur():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part"}), 400
+
+    file = request.files['file']
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    # OpenCV decodes from a path, so the upload is saved once; the output is removed after sending.
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=UPLOAD_DIR) as src:
+        file.save(src)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4", dir=UPLOAD_DIR) as dst:
+        output_path = dst.name
+
+    def cleanup():
+        for path in (src.name, output_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    try:
+        result = pipeline.run_video_pipeline(src.name, output_path)
+        response = send_file(
+            output_path,
+            mimetype='video/mp4',
+            as_attachment=True,
+            download_name="blurred_video.mp4"
+        )
+    except Exception as e:
+        cleanup()
+        return _server_error(e)
+
+    response.headers['X-Metadata'] = json.dumps(result)
+    response.call_on_close(cleanup)
+    return response
+
+
+@api.route('/process/dataset', methods=['POST'])
+def process_dataset():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part"}), 400
+
+    file = request.files['file']
+    epsilon = float(request.form.get('epsilon', 1.0))
+    try:
+        fmt = request.form.get('format') or detect_format(file.filename)
+        if fmt not in DATASET_FORMATS:
+            raise ValueError(f"Unsupported dataset format: {fmt}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def split(name):
+        return [c.strip() for c in request.form.get(name, '').split(',') if c.strip()]
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # The upload is read straight from Werkzeug's spooled file; the output goes to disk, not RAM.
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{fmt}", dir=UPLOAD_DIR) as dst:
+        output_path = dst.name
+
+    def cleanup():
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    try:
+        with open(output_path, 'wb') as output:
+            result = pipeline.run_dataset_pipeline(
+                file.stream, output, fmt, epsilon,
+                columns=split('columns') or None,
+                skip_columns=split('skip_columns'),
+                embed_column=request.form.get('embed_column') or None
+            )
+        response = send_file(
+            output_path,
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=f"redacted_dataset.{fmt}"
+        )
+    except ValueError as e:
+        # Malformed input (undecodable rows, a JSONL line that is not an object, missing pyarrow).
+        cleanup()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        cleanup()
+        return _server_error(e)
+
+    response.headers['X-Metadata'] = json.dumps(result)
+    response.call_on_close(cleanup)
+    return response
 
 
 @api.route('/process/document/blur', methods=['POST'])
@@ -101,7 +328,8 @@ def process_document_blur():
             "description": result.get("description", "No description available."),
             "unsafe_words": result.get("unsafe_words", []),
             "safe_description": result.get("safe_content"),
-            "safe_vector": result.get("safe_vector", [])
+            "safe_vector": result.get("safe_vector", []),
+            "vector_id": result.get("vector_id")
         })
         return response
     finally:
@@ -109,6 +337,38 @@ def process_document_blur():
             os.remove(temp_path)
 
 
+@api.route('/search', methods=['POST'])
+def search_vectors():
+    if pipeline.vector_store is None:
+        return jsonify({"error": "Vector store is disabled (set VECTOR_STORE_ENABLED=true)"}), 404
+    body = request.json or {}
+    text = body.get('text')
+    vector = body.get('vector')
+    try:
+        top_k = int(body.get('top_k', 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+    if not 1 <= top_k <= VECTOR_SEARCH_MAX_K:
+        return jsonify({"error": f"top_k must be between 1 and {VECTOR_SEARCH_MAX_K}"}), 400
+    if (text is None) == (vector is None):
+        return jsonify({"error": "Provide exactly one of text or vector"}), 400
+    if text is not None and not (isinstance(text, str) and text.strip()):
+        return jsonify({"error": "text must be a non-empty string"}), 400
+    if vector is not None:
+        try:
+            vector = decode_vector(vector)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    try:
+        results = pipeline.run_search_pipeline(top_k, text=text, vector=vector)
+        return jsonify({"results": results})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return _server_error(e)
+
+
 @api.route('/uploads/<path:filename>')
 def serve_uploads(filename):
     return send_from_directory(UPLOAD_DIR, filename)
@@ -116,4 +376,16 @@ def serve_uploads(filename):
 
 @api.route('/status', methods=['GET'])
 def health():
-    return jsonify({"status": "online", "message": "Secure Pipeline Active"})
\ No newline at end of file
+    return jsonify({"status": "online", "message": "Secure Pipeline Active"})
+
+
+@api.route('/ready', methods=['GET'])
+def readiness():
+    if not pipeline.is_ready():
+        return jsonify({"status": "loading", "message": "Models are still loading"}), 503
+    return jsonify({"status": "ready", "message": "Models loaded"})
+
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
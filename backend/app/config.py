@@ -13,6 +13,34 @@ PORT = int(os.getenv("PORT", "8000"))
 # Use 'http://host.docker.internal:11434' ONLY if running backend inside Docker.
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
 TIMEOUT_SECONDS = 300
+OLLAMA_CONNECT_TIMEOUT_SECONDS = 5  # an unreachable host fails in seconds, not TIMEOUT_SECONDS
+
+# Circuit breakers around the Ollama clients (embedder, vision): after N consecutive
+# failures calls are rejected instantly for the cooldown, then one probe is let through.
+CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN_SECONDS", "30"))
+# "degraded": keep serving with zero vectors / placeholder descriptions and flag the response.
+# "fail": raise, and the API answers 503 with Retry-After.
+OLLAMA_FAILURE_MODE = os.getenv("OLLAMA_FAILURE_MODE", "degraded").lower()
+
+# Scheduler in front of every Ollama call: one lane per model kind with its own concurrency
+# limit, so embeddings never queue behind vision generations. Within a lane, interactive
+# requests go before batch ones and waiting tenants are served round-robin.
+# With OLLAMA_SLOT_DIR set the limits hold across all workers; keep them at or below the
+# server's OLLAMA_NUM_PARALLEL per model.
+OLLAMA_LANE_CONCURRENCY = {
+    "embed": int(os.getenv("OLLAMA_EMBED_CONCURRENCY", "4")),
+    "vision": int(os.getenv("OLLAMA_VISION_CONCURRENCY", "1")),
+}
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "64"))  # waiting calls per lane before rejecting
+OLLAMA_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_QUEUE_TIMEOUT_SECONDS", "120"))
+# Directory of per-slot lock files that makes the lane limits global across processes
+# (gunicorn.conf.py sets it for its workers); empty = limits apply per process.
+OLLAMA_SLOT_DIR = os.getenv("OLLAMA_SLOT_DIR", "")
+OLLAMA_SLOT_POLL_SECONDS = 0.02
+OLLAMA_TENANT_HEADER = "X-Tenant-ID"  # falls back to the client address
+# Endpoints whose model calls run at batch priority (X-Priority: batch lowers any other request).
+OLLAMA_BATCH_ENDPOINTS = {"api.process_document_blur", "api.process_dataset", "api.process_image_blur_batch"}
 
 # --- MODEL REGISTRY ---
 # Standard Dimensions: Nomic/BERT = 768.
@@ -21,11 +49,28 @@ EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
 LLM_MODEL = os.getenv("LLM_MODEL", "qwen2.5-coder")
 VISION_MODEL = os.getenv("VISION_MODEL", "llama3.2-vision")
 
+# --- EMBEDDING SETTINGS ---
+# Texts longer than EMBED_CHUNK_TOKENS are split into overlapping token windows, embedded
+# in /api/embed batches and pooled, instead of being truncated by the model's context.
+# Tokens are approximated by words and punctuation marks (a conservative proxy for WordPiece).
+EMBED_CHUNK_TOKENS = 1000
+EMBED_CHUNK_OVERLAP_TOKENS = 64
+EMBED_BATCH_SIZE = 16  # chunks per /api/embed request
+EMBED_MAX_CHUNKS = 128  # longer inputs embed an evenly spaced subset of windows
+EMBED_POOLING = os.getenv("EMBED_POOLING", "weighted")  # "weighted" (by chunk tokens) or "mean"
+
 # --- GLINER SETTINGS ---
 NER_MODEL_NAME = "urchade/gliner_small-v2.1"
 GLINER_MODEL_NAME = NER_MODEL_NAME  # backwards compatibility
 GLINER_LOCAL_DIR = "gliner_small"
 
+# NER inference runtime: "torch" (fp32 PyTorch) or "onnx" (ONNX Runtime, exported by
+# download_models.py --onnx). Falls back to torch when the ONNX export is missing.
+NER_RUNTIME = os.getenv("NER_RUNTIME", "torch").lower()
+GLINER_ONNX_DIR = "gliner_small_onnx"
+NER_ONNX_QUANTIZED = True  # int8 dynamic quantization of the exported graph
+NER_ONNX_MODEL_FILE = "model_quantized.onnx" if NER_ONNX_QUANTIZED else "model.onnx"
+
 # --- PRIVACY SETTINGS ---
 DEFAULT_EPSILON = 1.0
 L1_SENSITIVITY = 0.1  # Adjusted for better default utility with embedding vectors
@@ -37,6 +82,23 @@ PDF_RENDER_SCALE = 2.0
 AUDIT_BOX_WIDTH = 5
 BLUR_RADIUS = 15
 
+# --- VISION INPUT ---
+# Every image sent to Ollama is prepared once: downscaled (INTER_AREA) so its longer side
+# fits the vision model's input (llama3.2-vision tiles 560px, up to 2x2) and encoded
+# without an optimize pass. Format "jpeg" or "webp".
+VISION_INPUT_MAX_SIDE = 1120
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower()
+VISION_IMAGE_QUALITY = 85
+
+# --- VISION CACHE ---
+# Descriptions of already-blurred images, keyed by tenant + model + prompt + pixels.
+# By default only identical pixels hit. VISION_CACHE_MAX_DISTANCE > 0 opts into near-duplicate
+# matching of images (within that many bits of 64-bit pHash and dHash); document pages never
+# match fuzzily, since a blurred page can look like another page of the same layout.
+VISION_CACHE_ENABLED = os.getenv("VISION_CACHE_ENABLED", "True").lower() == "true"
+VISION_CACHE_MAX_ENTRIES = 2048
+VISION_CACHE_MAX_DISTANCE = int(os.getenv("VISION_CACHE_MAX_DISTANCE", "0"))
+
 # --- YUNET SETTINGS ---
 FACE_DETECTION_MODEL_NAME = 'face_detection_yunet_2023mar.onnx'
 FACE_DETECTION_MODEL_DIR = "face_detection_yunet"
@@ -45,12 +107,54 @@ DEFAULT_TEST_IMAGE = os.path.join("data", "test_data", "selfie_test.jpg")
 DEFAULT_BLURRED_OUTPUT = os.path.join("data", "results", "blurred_selfie.jpg")
 FACE_CONFIDENCE_THRESHOLD = 0.9
 FACE_BLUR_KERNEL_SIZE = 51
+# YuNet runs on a proxy whose long side is at most this many pixels (0 = full size);
+# boxes are scaled back and padded by FACE_BOX_PADDING of their size per side.
+FACE_DETECTION_MAX_SIDE = int(os.getenv("FACE_DETECTION_MAX_SIDE", "1280"))
+FACE_BOX_PADDING = 0.1
+# Optional overlapping tiles for very large images so small faces survive the downscale.
+FACE_TILING_ENABLED = os.getenv("FACE_TILING_ENABLED", "False").lower() == "true"
+FACE_TILE_TRIGGER_SIDE = 4000
+FACE_TILE_SIZE = 2560
+FACE_TILE_OVERLAP = 0.2
+
+# --- BATCH IMAGE SETTINGS ---
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", str(os.cpu_count() or 4)))
+BATCH_MAX_IN_FLIGHT_PER_WORKER = 2  # bounds decoded images held in memory
+BATCH_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'webp', 'tif', 'tiff'}
+# Zip members whose uncompressed size exceeds this are reported as errors, not extracted.
+BATCH_MAX_IMAGE_BYTES = int(os.getenv("BATCH_MAX_IMAGE_BYTES", str(64 * 1024 * 1024)))
+
+# --- DATASET SETTINGS ---
+DATASET_FORMATS = ("csv", "jsonl", "parquet")  # parquet requires pyarrow
+DATASET_BATCH_ROWS = int(os.getenv("DATASET_BATCH_ROWS", "1000"))  # rows held in memory at once
+
+# --- VIDEO SETTINGS ---
+# YuNet runs every N frames. Frames in between are held until the next keyframe, so a face
+# first detected there is also blurred in the frames before it.
+VIDEO_DETECTION_INTERVAL = int(os.getenv("VIDEO_DETECTION_INTERVAL", "5"))
+VIDEO_TRACK_IOU_THRESHOLD = 0.3
+VIDEO_TRACK_MAX_MISSES = 2  # keyframes a track survives without a matching detection
+VIDEO_TRACK_PADDING = 0.15  # extra box margin between keyframes to cover motion
+VIDEO_FRAME_QUEUE_SIZE = 32
+VIDEO_OUTPUT_CODEC = "mp4v"  # the source's first audio track is copied over unchanged when mp4 can hold it
 
 # --- DETECTION RULES ---
 NER_THRESHOLD = 0.3
 
 SCANNER_CHUNK_SIZE = 300
 SCANNER_CHUNK_OVERLAP = 50
+# NER pre-filter: values matching one of these rules skip GLiNER and only get the regex
+# scan. Drop a rule here if it costs recall; decisions are counted in ner_prefilter_total.
+NER_PREFILTER_RULES = ("empty", "boolean", "numeric", "uuid", "iso_date", "no_letters")
+NER_PREFILTER_MAX_CHARS = 64  # longer values always go to the model
+NER_LABEL_CACHE_SIZE = 32  # label sets (e.g. per-tenant entity types) with cached encodings
+NER_MAX_CUSTOM_LABELS = 50
+
+# Cross-request micro-batching: chunks from concurrent requests are collected for up to
+# NER_BATCH_MAX_WAIT_MS or NER_BATCH_MAX_SIZE items and run as one GLiNER forward pass.
+NER_MICRO_BATCHING = os.getenv("NER_MICRO_BATCHING", "False").lower() == "true"
+NER_BATCH_MAX_SIZE = int(os.getenv("NER_BATCH_MAX_SIZE", "16"))
+NER_BATCH_MAX_WAIT_MS = float(os.getenv("NER_BATCH_MAX_WAIT_MS", "5"))
 
 NER_LABELS = [
     "person", "organization", "location",
@@ -82,6 +186,31 @@ PII_REGEX_PATTERNS = [
     (r'\b[A-Z][a-zA-Z0-9]+\s+(?:Inc|Corp|LLC|Ltd)\b\.?', 'organization'),
 ]
 
+# Keyword gate: a regex family only runs when one of its anchors occurs in the text
+# (case-insensitive). Families missing here fall back to the pattern's literal prefix,
+# or always run if it has none. Anchors are necessary for a match, so the gate never
+# changes findings. KEYWORD_GATE_STRICT_SECRETS also gates the anchorless secret
+# families (generic keys, hashes) on SECRET_KEYWORDS, trading their recall for speed.
+KEYWORD_GATE_ENABLED = os.getenv("KEYWORD_GATE_ENABLED", "True").lower() == "true"
+KEYWORD_GATE_STRICT_SECRETS = os.getenv("KEYWORD_GATE_STRICT_SECRETS", "False").lower() == "true"
+_DIGITS = [str(d) for d in range(10)]
+PII_REGEX_ANCHORS = {
+    'aws_access_key': ['akia', 'asia'],
+    'bearer_token': ['bearer'],
+    'password': ['password', 'pwd', 'passwd'],
+    'generic_key': [],
+    'hash_or_key': [],
+    'ssn': _DIGITS,
+    'credit_card': _DIGITS,
+    'email_address': ['@', 'at'],
+    'phone_number': _DIGITS,
+    'address': _DIGITS,
+    'location_zip': _DIGITS,
+    'organization': ['inc', 'corp', 'llc', 'ltd'],
+}
+SECRET_PATTERN_LABELS = {'openai_key', 'github_token', 'aws_access_key', 'bearer_token',
+                         'password', 'generic_key', 'hash_or_key'}
+
 # --- SYSTEM PROMPTS ---
 CODE_SCANNER_PROMPT = """
 You are a Security Auditor. Your task is to identify SENSITIVE SECRETS in the provided text.
@@ -113,8 +242,6 @@ UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 PII_TEST_DOCUMENT_IMAGE = os.path.join("data", "test_data", "document_image_test.png")
-PII_IMAGE_MAX_DIMENSION = 700
-PII_IMAGE_QUALITY = 96
 PII_MODEL_TEMPERATURE = 0.0
 
 PII_EXTRACTOR_SYSTEM_PROMPT = (
@@ -126,15 +253,119 @@ PII_EXTRACTOR_SYSTEM_PROMPT = (
     "If nothing found, return empty lists."
 )
 
+# Combined mode: one vision call per document page returns the PII lists and a PII-free
+# summary, replacing the separate description call on the blurred render. Any extracted
+# value that still appears in the summary is redacted before it is used.
+PII_COMBINED_DESCRIPTION = os.getenv("PII_COMBINED_DESCRIPTION", "False").lower() == "true"
+PII_SUMMARY_REDACTION = "[REDACTED]"
+PII_EXTRACTOR_COMBINED_SYSTEM_PROMPT = (
+    "You are a PII extraction API. Output JSON ONLY. "
+    "Extract clearly visible: names, id_numbers, addresses, "
+    "date_of_birth, phone_numbers, emails, social_security_numbers, "
+    "api_keys, credit_cards. "
+    "Also add \"summary\": a summary of the main content of the page in at most 3 sentences "
+    "that does NOT contain any of the extracted values or any other personal data. "
+    "Format: {\"names\": [\"John Doe\"], ..., \"summary\": \"An invoice for ...\"}. "
+    "If nothing found, return empty lists."
+)
+
+# --- VECTOR STORE ---
+# Append-only store of the DP-noised safe vectors (L2-normalized, cosine search).
+# Index: "ivf" (pure NumPy inverted lists) or "hnsw" (requires hnswlib).
+# Opt-in: when enabled, each request's redacted text is persisted next to its vector.
+VECTOR_STORE_ENABLED = os.getenv("VECTOR_STORE_ENABLED", "False").lower() == "true"
+VECTOR_STORE_DIR = os.path.join(DATA_DIR, "vector_store")
+VECTOR_STORE_DTYPE = "float16"  # or "float32"
+VECTOR_STORE_INDEX = os.getenv("VECTOR_STORE_INDEX", "ivf")
+VECTOR_STORE_MAX_TEXT_CHARS = 2000  # redacted text kept alongside each vector
+VECTOR_SEARCH_MAX_K = 100
+VECTOR_IVF_TRAIN_MIN = 20000  # below this the store is searched brute force
+VECTOR_IVF_MAX_LISTS = 1024
+VECTOR_IVF_TRAIN_SAMPLE = 100000
+VECTOR_IVF_NPROBE = 16
+VECTOR_IVF_REBUILD_TAIL = 50000  # unindexed rows scanned brute force before lists are rebuilt
+VECTOR_HNSW_M = 16
+VECTOR_HNSW_EF_CONSTRUCTION = 200
+VECTOR_HNSW_EF_SEARCH = 64
+
 # --- AUDIO SETTINGS ---
 WHISPER_MODEL_SIZE = "small"
 WHISPER_DEVICE = "cpu"
+WHISPER_VAD_FILTER = True  # skip silence (Silero VAD) in streaming transcription
+
+# Whisper model pool: several sizes can be resident, evicted LRU under a memory budget.
+# Requests pick a size via `model_size` ("auto" chooses by duration and load).
+WHISPER_MODEL_SIZES = ("tiny", "base", "small", "medium")  # fastest -> most accurate
+WHISPER_MODEL_MEMORY_MB = {"tiny": 150, "base": 250, "small": 600, "medium": 1600}  # int8, approx.
+WHISPER_POOL_MEMORY_MB = int(os.getenv("WHISPER_POOL_MEMORY_MB", "2048"))
+WHISPER_AUTO_DURATION_TIERS = ((120, "small"), (1800, "base"))  # (max seconds, size); longer -> tiny
+WHISPER_DOWNGRADE_ACTIVE_REQUESTS = 4  # "auto" drops one size per this many in-flight transcriptions
+AUDIO_STREAMING_DEFAULT = os.getenv("AUDIO_STREAMING_DEFAULT", "False").lower() == "true"
+AUDIO_STREAM_BATCH_SEGMENTS = 8  # max segments scanned together while transcription continues
+AUDIO_STREAM_QUEUE_SIZE = 64
+AUDIO_STREAM_PUT_TIMEOUT_SECONDS = 0.1  # how often a blocked transcriber checks whether the scan gave up
+
+# Audio redaction output (mute/bleep PII spans in the waveform)
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_REDACTION_MODE = "bleep"  # "bleep" (1 kHz tone) or "mute"
+AUDIO_REDACTION_PADDING_SECONDS = 0.15
+AUDIO_BLEEP_FREQUENCY = 1000
+AUDIO_BLEEP_AMPLITUDE = 0.3
+AUDIO_TRANSCRIBE_WINDOW_SECONDS = 600  # PCM is handed to Whisper in windows of this length
+AUDIO_SPLIT_SEARCH_SECONDS = 10  # window cuts move to the quietest frame within +/- this range
+AUDIO_SPLIT_FRAME_MS = 30
+
+# Parallel transcription: long audio is split on silence and fanned out to worker
+# processes, each with its own Whisper model. Size workers * cpu_threads to the core count.
+AUDIO_PARALLEL_WORKERS = int(os.getenv("AUDIO_PARALLEL_WORKERS", "0"))  # 0/1 disables
+AUDIO_PARALLEL_CPU_THREADS = int(os.getenv("AUDIO_PARALLEL_CPU_THREADS", "4"))
+AUDIO_PARALLEL_NUM_WORKERS = 1  # CTranslate2 inference workers per process
+AUDIO_PARALLEL_MIN_SECONDS = 300  # shorter audio is transcribed in-process
+AUDIO_PARALLEL_MIN_WINDOW_SECONDS = 60
 
 # --- API & WEB SETTINGS ---
 CORS_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000"
 ]
+# Response vectors: "json" (float list), "f32"/"f16" (base64, little-endian) or "int8" (base64 + scale).
+# Picked per request with ?vector_encoding=f16 or "Accept: application/json; vector-encoding=f16".
+VECTOR_ENCODINGS = ("json", "f32", "f16", "int8")
+VECTOR_ENCODING_DEFAULT = os.getenv("VECTOR_ENCODING_DEFAULT", "json")
+# raw_vector is the embedding before noise, i.e. outside the DP guarantee.
+INCLUDE_RAW_VECTOR = os.getenv("INCLUDE_RAW_VECTOR", "True").lower() == "true"
+
+# --- PRODUCTION SERVER (gunicorn.conf.py) ---
+# Each deployment runs one profile; route text/form traffic and media traffic
+# (image, audio, document) to separate instances to size them independently.
+SERVER_PROFILE = os.getenv("SERVER_PROFILE", "all")
+SERVER_PROFILES = {
+    "all": {"workers": 2, "threads": 4, "timeout": 600},
+    "text": {"workers": 4, "threads": 8, "timeout": 60},
+    "media": {"workers": 2, "threads": 2, "timeout": 900},
+}
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", "0"))  # 0 = use profile
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "0"))  # 0 = use profile
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "120"))
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "2000"))
+WORKER_MAX_REQUESTS_JITTER = 200
+# Torch intra-op threads per worker; keeps workers * threads within the core count.
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "2"))
+# Set by gunicorn.conf.py: the master imports the app without Whisper or any thread/file
+# handle, and each worker creates those in main.start_worker() (post_fork).
+WORKER_DEFERRED_START = os.getenv("WORKER_DEFERRED_START", "False").lower() == "true"
+
+# --- OBSERVABILITY ---
+METRICS_PREFIX = "safedata"
+METRICS_HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Set (by gunicorn.conf.py) when several worker processes serve /metrics: each worker writes
+# its series to <dir>/<pid>.json and /metrics sums counters and histograms over all of them;
+# gauges are reported per live worker with a "worker" label.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_INTERVAL_SECONDS = 1.0
+# Attach per-stage durations as an X-Timing header on every response;
+# clients can also opt in per request by sending "X-Timing: 1" (or "true").
+TIMING_HEADER_ENABLED = os.getenv("TIMING_HEADER_ENABLED", "False").lower() == "true"
 
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB Max Upload
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'wav', 'mp3'}
@@ -0,0 +1,164 @@
+"""Circuit breakers for the Ollama clients, plus the per-request record of degraded components."""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+from app.config import CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_COOLDOWN_SECONDS
+from app.core.metrics import metrics
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+metrics.describe("circuit_breaker_state", "Breaker state per client: 0 closed, 1 half-open, 2 open")
+metrics.describe("circuit_breaker_rejections_total", "Calls rejected without contacting the model host")
+
+# Components that fell back to a placeholder during the current request.
+_degraded: ContextVar[Optional[List[str]]] = ContextVar("degraded_components", default=None)
+
+
+class ModelUnavailableError(RuntimeError):
+    """A model host call failed (or was not attempted) and OLLAMA_FAILURE_MODE is "fail"."""
+
+    def __init__(self, component: str, message: str, retry_after: float = 0.0):
+        super().__init__(f"{component} unavailable: {message}")
+        self.component = component
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ModelUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open rejects every call
+    until `cooldown` has passed, then half-open lets a single probe through: success closes
+    the breaker, failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_BREAKER_FAILURES,
+                 cooldown: float = CIRCUIT_BREAKER_COOLDOWN_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+        self._probing = False
+        self._lock = threading.Lock()
+        self._cooldown_timer: Optional[threading.Timer] = None
+        metrics.set_gauge("circuit_breaker_state", _STATE_VALUES[CLOSED], {"breaker": name})
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._end_cooldown()
+            return self._state
+
+    def _end_cooldown(self) -> None:
+        if self._state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+            self._set_state(HALF_OPEN)
+
+    def _start_cooldown(self) -> None:
+        self.opened_at = self.clock()
+        self._set_state(OPEN)
+        # Moves the gauge to half-open when the cooldown ends, even if no call arrives to do it.
+        if self._cooldown_timer is not None:
+            self._cooldown_timer.cancel()
+        self._cooldown_timer = threading.Timer(self.cooldown, lambda: self.state)
+        self._cooldown_timer.daemon = True
+        self._cooldown_timer.start()
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            metrics.set_gauge("circuit_breaker_state", _STATE_VALUES[state], {"breaker": self.name})
+            metrics.inc("circuit_breaker_transitions_total", {"breaker": self.name, "state": state})
+            print(f"[CIRCUIT BREAKER] {self.name} -> {state}")
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (self.clock() - self.opened_at))
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            self._end_cooldown()
+            if self._state == OPEN:
+                metrics.inc("circuit_breaker_rejections_total", {"breaker": self.name})
+                raise CircuitOpenError(self.name, "circuit open", self.retry_after())
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    metrics.inc("circuit_breaker_rejections_total", {"breaker": self.name})
+                    raise CircuitOpenError(self.name, "circuit half-open, probe in flight", self.cooldown)
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._start_cooldown()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Ends a call that proved nothing about the host without changing the state."""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Wraps one host call. Transport errors and HTTP errors count as failures and only a
+        normal exit counts as success. Anything else (a bug, KeyboardInterrupt, a closed
+        generator) is re-raised and leaves the state alone.
+        """
+        self.before_call()
+        try:
+            yield
+        except requests.RequestException:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """One breaker per client name per process, shared by every instance of that client."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def start_request_degradation() -> None:
+    _degraded.set([])
+
+
+def mark_degraded(component: str) -> None:
+    components = _degraded.get()
+    if components is None:
+        components = []
+        _degraded.set(components)
+    if component not in components:
+        components.append(component)
+
+
+def get_degraded() -> List[str]:
+    return list(_degraded.get() or [])
@@ -1,19 +1,78 @@
 import sys
 import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import requests
 import numpy as np
 # Added EMBED_DIMENSION to imports
-from app.config import OLLAMA_BASE_URL, EMBED_MODEL, TIMEOUT_SECONDS, EMBED_DIMENSION
+from app.config import (
+    OLLAMA_BASE_URL,
+    EMBED_MODEL,
+    TIMEOUT_SECONDS,
+    OLLAMA_CONNECT_TIMEOUT_SECONDS,
+    OLLAMA_FAILURE_MODE,
+    EMBED_DIMENSION,
+    EMBED_CHUNK_TOKENS,
+    EMBED_CHUNK_OVERLAP_TOKENS,
+    EMBED_BATCH_SIZE,
+    EMBED_MAX_CHUNKS,
+    EMBED_POOLING
+)
+from app.core.metrics import metrics, count_model_call, count_error
+from app.core.circuit_breaker import CircuitOpenError, ModelUnavailableError, get_breaker, mark_degraded
+from app.core.ollama_scheduler import LANE_EMBED, scheduler
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def split_by_tokens(text: str, max_tokens: int = EMBED_CHUNK_TOKENS,
+                    overlap: int = EMBED_CHUNK_OVERLAP_TOKENS) -> List[Dict[str, Any]]:
+    """Overlapping windows of at most max_tokens tokens: [{"start", "end", "tokens", "text"}] (char offsets)."""
+    spans = [m.span() for m in _TOKEN_RE.finditer(text)]
+    if not spans:
+        return []
+    step = max(1, max_tokens - overlap)
+    chunks = []
+    for first in range(0, len(spans), step):
+        last = min(first + max_tokens, len(spans)) - 1
+        start, end = spans[first][0], spans[last][1]
+        chunks.append({"start": start, "end": end, "tokens": last - first + 1, "text": text[start:end]})
+        if last == len(spans) - 1:
+            break
+    return chunks
+
+
+def _is_long(clean_text: str) -> bool:
+    return len(clean_text) > EMBED_CHUNK_TOKENS and len(_TOKEN_RE.findall(clean_text)) > EMBED_CHUNK_TOKENS
+
+
+def pool_vectors(vectors: np.ndarray, weights: Sequence[float], mode: str = EMBED_POOLING) -> np.ndarray:
+    """
+    Mean (or token-weighted mean) of the chunk vectors, rescaled to their average norm so
+    pooled and single-call vectors have the same magnitude (the DP noise scale is absolute).
+    """
+    w = np.ones(len(vectors)) if mode == "mean" else np.asarray(weights, dtype=np.float64)
+    w = w / w.sum()
+    pooled = (w[:, None] * vectors).sum(axis=0)
+    norm = np.linalg.norm(pooled)
+    if norm > 0:
+        pooled *= float(w @ np.linalg.norm(vectors, axis=1)) / norm
+    return pooled.astype(np.float32)
 
 
 class Embedder:
     def __init__(self):
         self.url = f"{OLLAMA_BASE_URL}/api/embeddings"
+        self.batch_url = f"{OLLAMA_BASE_URL}/api/embed"
         self.model = EMBED_MODEL
+        self.breaker = get_breaker("embedder")
+        self.scheduler = scheduler
 
     def get_vector(self, text: str) -> np.ndarray:
-        """Turns text into a raw vector using local Ollama."""
+        """Turns text into a raw vector using local Ollama; long texts are chunked and pooled."""
         clean_text = text.replace("\n", " ").strip()
+        if _is_long(clean_text):
+            return self.get_chunked_vectors(text)[0]
 
         payload = {
             "model": self.model,
@@ -21,8 +80,11 @@ class Embedder:
         }
 
         try:
-            response = requests.post(self.url, json=payload, timeout=TIMEOUT_SECONDS)
-            response.raise_for_status()
+            with self.scheduler.slot(LANE_EMBED), self.breaker.guard():
+                count_model_call(self.model)
+                response = requests.post(self.url, json=payload,
+                                         timeout=(OLLAMA_CONNECT_TIMEOUT_SECONDS, TIMEOUT_SECONDS))
+                response.raise_for_status()
 
             vector = response.json().get("embedding")
             if not vector:
@@ -31,12 +93,97 @@ class Embedder:
             return np.array(vector, dtype=np.float32)
 
         except Exception as e:
-            print(f"[EMBEDDER ERROR]: {e}")
-            return np.zeros(EMBED_DIMENSION, dtype=np.float32)
+            return self._fallback(e)
+
+    def _fallback(self, error: Exception) -> np.ndarray:
+        """Zero vector flagged as degraded, or ModelUnavailableError in fail-fast mode."""
+        if not isinstance(error, CircuitOpenError):
+            print(f"[EMBEDDER ERROR]: {error}")
+        count_error("embedder")
+        if OLLAMA_FAILURE_MODE == "fail":
+            if isinstance(error, ModelUnavailableError):
+                raise error
+            raise ModelUnavailableError("embedder", str(error), self.breaker.retry_after()) from error
+        mark_degraded("embedder")
+        return np.zeros(EMBED_DIMENSION, dtype=np.float32)
+
+    def get_vectors(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """
+        One vector per text. Short texts go EMBED_BATCH_SIZE at a time through /api/embed;
+        long ones are chunked and pooled as in get_vector.
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        short: List[Tuple[int, str]] = []
+        for i, text in enumerate(texts):
+            clean_text = text.replace("\n", " ").strip()
+            if _is_long(clean_text):
+                vectors[i] = self.get_chunked_vectors(text)[0]
+            else:
+                short.append((i, clean_text))
+
+        try:
+            for start in range(0, len(short), EMBED_BATCH_SIZE):
+                batch = short[start:start + EMBED_BATCH_SIZE]
+                embeddings = self._embed_batch([t for _, t in batch])
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+                for (i, _), vector in zip(batch, embeddings):
+                    vectors[i] = np.asarray(vector, dtype=np.float32)
+        except Exception as e:
+            fallback = self._fallback(e)
+            for i, _ in short:
+                if vectors[i] is None:
+                    vectors[i] = fallback.copy()
+        return vectors
+
+    def get_chunked_vectors(self, text: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Pooled vector plus the per-chunk vectors ([{"start", "end", "tokens", "vector"}]).
+        Chunks are embedded EMBED_BATCH_SIZE at a time through /api/embed.
+        """
+        chunks = split_by_tokens(text, EMBED_CHUNK_TOKENS, EMBED_CHUNK_OVERLAP_TOKENS)
+        if len(chunks) > EMBED_MAX_CHUNKS:
+            keep = np.linspace(0, len(chunks) - 1, EMBED_MAX_CHUNKS).round().astype(int)
+            chunks = [chunks[i] for i in keep]
+        if not chunks:
+            return np.zeros(EMBED_DIMENSION, dtype=np.float32), []
+
+        try:
+            vectors: List[List[float]] = []
+            for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+                batch = [c["text"].replace("\n", " ") for c in chunks[i:i + EMBED_BATCH_SIZE]]
+                vectors.extend(self._embed_batch(batch))
+            if len(vectors) != len(chunks):
+                raise ValueError(f"Expected {len(chunks)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            return self._fallback(e), []
+
+        metrics.inc("embed_chunks_total", value=len(chunks))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        pooled = pool_vectors(matrix, [c["tokens"] for c in chunks], EMBED_POOLING)
+        chunk_vectors = [
+            {"start": c["start"], "end": c["end"], "tokens": c["tokens"], "vector": v}
+            for c, v in zip(chunks, matrix)
+        ]
+        return pooled, chunk_vectors
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with self.scheduler.slot(LANE_EMBED), self.breaker.guard():
+            count_model_call(self.model)
+            response = requests.post(
+                self.batch_url,
+                json={"model": self.model, "input": texts},
+                timeout=(OLLAMA_CONNECT_TIMEOUT_SECONDS, TIMEOUT_SECONDS)
+            )
+            response.raise_for_status()
+        embeddings = response.json().get("embeddings")
+        if not embeddings:
+            raise ValueError(f"No embeddings returned for model {self.model}")
+        return embeddings
 
 
 if __name__ == "__main__":
     client = Embedder()
     print(f"Using Model: {client.model}")
     test_vec = client.get_vector("Testing config-based embedding.")
-    print(f"Vector Preview: {test_vec[:5]}...")
\ No newline at end of file
+    print(f"Vector Preview: {test_vec[:5]}...")
@@ -0,0 +1,107 @@
+"""Aho-Corasick keyword gate that decides which regex families are worth running on a text."""
+
+import re
+from typing import Dict, Iterable, List, Pattern, Sequence, Set, Tuple
+
+from app.config import (
+    PII_REGEX_PATTERNS,
+    PII_REGEX_ANCHORS,
+    SECRET_KEYWORDS,
+    SECRET_PATTERN_LABELS,
+    KEYWORD_GATE_STRICT_SECRETS
+)
+from app.core.metrics import metrics
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; a lookahead regex gives the same answers
+    ahocorasick = None
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def literal_prefix(pattern: str) -> str:
+    """Leading literal characters of a regex ('sk-[a-z]+' -> 'sk-'), stopping at the first metacharacter."""
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            prefix.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch in _REGEX_META:
+            break
+        prefix.append(ch)
+        i += 1
+    # A quantifier right after the prefix makes its last character optional.
+    if i < len(pattern) and pattern[i] in "*?{" and prefix:
+        prefix.pop()
+    return "".join(prefix)
+
+
+class KeywordGate:
+    """
+    One pass over the lower-cased text finds every anchor keyword; only the regex
+    families with a present anchor are returned. Families without anchors always run,
+    except secret families in strict mode, which then need one of SECRET_KEYWORDS.
+    """
+
+    def __init__(self, patterns: Sequence[Tuple[str, str]] = PII_REGEX_PATTERNS,
+                 anchors: Dict[str, List[str]] = PII_REGEX_ANCHORS,
+                 secret_keywords: Iterable[str] = SECRET_KEYWORDS,
+                 secret_labels: Iterable[str] = SECRET_PATTERN_LABELS,
+                 strict_secrets: bool = KEYWORD_GATE_STRICT_SECRETS):
+        self.patterns = [(re.compile(p), label) for p, label in patterns]
+        secret_keywords = [k.lower() for k in secret_keywords if k.strip()]
+        secret_labels = set(secret_labels)
+
+        self._always: Set[int] = set()
+        self._keyword_patterns: Dict[str, Set[int]] = {}
+        for index, (pattern, label) in enumerate(patterns):
+            keywords = anchors.get(label)
+            if keywords is None:
+                prefix = literal_prefix(pattern)
+                keywords = [prefix] if len(prefix) >= 2 else []
+            keywords = [k.lower() for k in keywords]
+            if not keywords and strict_secrets and label in secret_labels:
+                keywords = secret_keywords
+            if not keywords:
+                self._always.add(index)
+                continue
+            for keyword in keywords:
+                self._keyword_patterns.setdefault(keyword, set()).add(index)
+
+        # A keyword that contains another keyword also implies it.
+        self._implied: Dict[str, Set[int]] = {
+            k: set().union(*(v for other, v in self._keyword_patterns.items() if other in k))
+            for k in self._keyword_patterns
+        }
+        self._automaton = None
+        self._regex = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self._keyword_patterns:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        elif self._keyword_patterns:
+            ordered = sorted(self._keyword_patterns, key=len, reverse=True)
+            # Lookahead so matches may overlap, like Aho-Corasick.
+            self._regex = re.compile("(?=(" + "|".join(re.escape(k) for k in ordered) + "))")
+
+    def _found_keywords(self, text: str) -> Set[str]:
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+        if self._regex is None:
+            return set()
+        return {m.group(1) for m in self._regex.finditer(text)}
+
+    def select(self, text: str) -> List[Tuple[Pattern, str]]:
+        """Compiled (pattern, label) pairs that can possibly match `text`, in config order."""
+        enabled = set(self._always)
+        for keyword in self._found_keywords(text.lower()):
+            enabled |= self._implied[keyword]
+        skipped = len(self.patterns) - len(enabled)
+        if skipped:
+            metrics.inc("keyword_gate_patterns_skipped_total", value=skipped)
+        return [self.patterns[i] for i in sorted(enabled)]
@@ -0,0 +1,354 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import (
+    METRICS_HISTOGRAM_BUCKETS,
+    METRICS_PREFIX,
+    METRICS_MULTIPROC_DIR,
+    METRICS_FLUSH_INTERVAL_SECONDS,
+    WORKER_DEFERRED_START
+)
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows); gunicorn's master is the only caller there anyway
+    fcntl = None
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# Counters and histograms of every exited worker, summed (see mark_process_dead).
+EXITED_FILE = "exited.json"
+
+# Per-request stage timings, collected for the optional X-Timing header.
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key)
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * n_buckets
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics store (counters, gauges, histograms).
+    Renders the Prometheus text exposition format without extra dependencies.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX, buckets: Tuple[float, ...] = METRICS_HISTOGRAM_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._mp_dir: Optional[str] = None
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}_{name}"
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[self._name(name)] = help_text
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1.0) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(self._name(name), {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(self._name(name), {})[key] = float(value)
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(self._name(name), {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(len(self.buckets))
+            if idx < len(self.buckets):
+                hist.counts[idx] += 1
+            hist.total += value
+            hist.count += 1
+
+    def get_counter(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._counters.get(self._name(name), {}).get(_label_key(labels), 0.0)
+
+    def get_gauge(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._gauges.get(self._name(name), {}).get(_label_key(labels), 0.0)
+
+    def get_histogram_count(self, name: str, labels: Optional[Dict[str, str]] = None) -> int:
+        with self._lock:
+            hist = self._histograms.get(self._name(name), {}).get(_label_key(labels))
+            return hist.count if hist else 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def clear_counts(self) -> None:
+        """Drops counters and histograms but keeps gauges (current state, still true after a fork)."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, list]]:
+        """JSON-serializable copy of every series (what a worker writes for /metrics)."""
+        with self._lock:
+            return {
+                "counters": {n: [[list(k), v] for k, v in s.items()] for n, s in self._counters.items()},
+                "gauges": {n: [[list(k), v] for k, v in s.items()] for n, s in self._gauges.items()},
+                "histograms": {n: [[list(k), h.counts, h.total, h.count] for k, h in s.items()]
+                               for n, s in self._histograms.items()},
+            }
+
+    def enable_multiprocess(self, directory: str, interval: float = METRICS_FLUSH_INTERVAL_SECONDS) -> None:
+        """Writes this process's snapshot to `directory` every `interval` seconds (daemon thread)."""
+        os.makedirs(directory, exist_ok=True)
+        self._mp_dir = directory
+
+        def loop():
+            while self._mp_dir:
+                time.sleep(interval)
+                self.flush()
+
+        threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+    def disable_multiprocess(self) -> None:
+        """Stops writing snapshots; the flush thread exits after its current sleep."""
+        self._mp_dir = None
+
+    def flush(self) -> None:
+        directory = self._mp_dir
+        if not directory:
+            return
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[METRICS ERROR]: could not write {path}: {e}")
+
+    def render(self) -> str:
+        """Serializes every series in the Prometheus text format (version 0.0.4)."""
+        directory = self._mp_dir
+        if directory:
+            self.flush()
+            counters, gauges, histograms = _merge_snapshots(directory, len(self.buckets))
+        else:
+            with self._lock:
+                counters = {n: dict(s) for n, s in self._counters.items()}
+                gauges = {n: dict(s) for n, s in self._gauges.items()}
+                histograms = {n: {k: (h.counts, h.total, h.count) for k, h in s.items()}
+                              for n, s in self._histograms.items()}
+
+        lines: List[str] = []
+        for kind, store in (("counter", counters), ("gauge", gauges)):
+            for name in sorted(store):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(store[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for name in sorted(histograms):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _add_snapshot(counters: dict, gauges: dict, histograms: dict, snap: dict, worker: str) -> None:
+    """Adds one snapshot() into the merged series; gauges get a `worker` label."""
+    for name, series in snap.get("counters", {}).items():
+        target = counters.setdefault(name, {})
+        for key, value in series:
+            key = tuple(tuple(pair) for pair in key)
+            target[key] = target.get(key, 0.0) + value
+    for name, series in snap.get("gauges", {}).items():
+        target = gauges.setdefault(name, {})
+        for key, value in series:
+            target[tuple(sorted([*(tuple(pair) for pair in key), ("worker", worker)]))] = value
+    for name, series in snap.get("histograms", {}).items():
+        target = histograms.setdefault(name, {})
+        for key, counts, total, count in series:
+            key = tuple(tuple(pair) for pair in key)
+            prev_counts, prev_total, prev_count = target.get(key, ([0] * len(counts), 0.0, 0))
+            target[key] = ([a + b for a, b in zip(prev_counts, counts)], prev_total + total, prev_count + count)
+
+
+def _merge_snapshots(directory: str, n_buckets: int):
+    """
+    Counters and histograms are summed over every worker file plus EXITED_FILE (what all
+    exited workers counted), so totals never drop on a worker restart; gauges only come
+    from live workers.
+    """
+    counters: Dict[str, Dict[LabelKey, float]] = {}
+    gauges: Dict[str, Dict[LabelKey, float]] = {}
+    histograms: Dict[str, Dict[LabelKey, tuple]] = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now; picked up on the next scrape
+        _add_snapshot(counters, gauges, histograms, snap, filename[:-len(".json")])
+    return counters, gauges, histograms
+
+
+def _read_snapshot(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def mark_process_dead(pid: int, directory: str = METRICS_MULTIPROC_DIR) -> None:
+    """
+    Drops an exited worker's gauges and folds its counters and histograms into EXITED_FILE,
+    so they keep counting towards the totals and the directory holds one file per live
+    worker plus one aggregate, however often workers restart.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    snap = _read_snapshot(path)
+    if not snap:
+        return
+    exited = os.path.join(directory, EXITED_FILE)
+    try:
+        with open(os.path.join(directory, "exited.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            counters, histograms = {}, {}
+            for source in (_read_snapshot(exited), snap):
+                _add_snapshot(counters, {}, histograms, source, "")
+            with open(f"{exited}.tmp", "w") as f:
+                json.dump({
+                    "counters": {n: [[list(k), v] for k, v in s.items()] for n, s in counters.items()},
+                    "histograms": {n: [[list(k), *h] for k, h in s.items()] for n, s in histograms.items()},
+                }, f)
+            os.replace(f"{exited}.tmp", exited)
+        os.remove(path)
+    except OSError as e:
+        print(f"[METRICS ERROR]: could not fold {path} into {exited}: {e}")
+
+
+def start_worker_metrics(directory: str = METRICS_MULTIPROC_DIR) -> None:
+    """
+    In a worker forked from the preloaded master: forgets the master's counts (every worker
+    would report them again) and starts this worker's flush thread.
+    """
+    metrics.clear_counts()
+    if directory:
+        metrics.enable_multiprocess(directory)
+
+
+metrics = MetricsRegistry()
+if METRICS_MULTIPROC_DIR and not WORKER_DEFERRED_START:
+    metrics.enable_multiprocess(METRICS_MULTIPROC_DIR)
+metrics.describe("stage_duration_seconds", "Time spent in each pipeline/processor stage.")
+metrics.describe("request_duration_seconds", "End-to-end request latency per endpoint.")
+metrics.describe("model_calls_total", "Calls issued to local or remote models.")
+metrics.describe("cache_hits_total", "Cache lookups that avoided recomputation.")
+metrics.describe("errors_total", "Errors caught per component.")
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times a block and records it in the stage histogram.
+    Errors raised inside the block are counted and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.inc("errors_total", {"component": stage})
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_duration_seconds", elapsed, {"stage": stage})
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def count_model_call(model: str) -> None:
+    metrics.inc("model_calls_total", {"model": model})
+
+
+def count_cache_hit(cache: str) -> None:
+    metrics.inc("cache_hits_total", {"cache": cache})
+
+
+def count_error(component: str) -> None:
+    metrics.inc("errors_total", {"component": component})
+
+
+def start_request_timing() -> None:
+    """Begins collecting stage timings for the current request context."""
+    _request_timings.set([])
+
+
+def get_request_timings() -> List[Tuple[str, float]]:
+    return list(_request_timings.get() or [])
+
+
+def timing_requested(header: Optional[str]) -> bool:
+    """True for an X-Timing request header of "1" or "true" (any case)."""
+    return (header or "").strip().lower() in ("1", "true")
+
+
+def format_timing_header(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Renders timings as `stage;dur=ms` pairs, the Server-Timing syntax."""
+    parts = [f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in timings]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
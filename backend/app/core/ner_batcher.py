@@ -0,0 +1,121 @@
+"""Collects NER chunks from concurrent requests and runs them as batched GLiNER forward passes."""
+
+from __future__ import annotations
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import NER_BATCH_MAX_SIZE, NER_BATCH_MAX_WAIT_MS
+from app.core.metrics import metrics, count_model_call
+
+
+class _NERRequest:
+    __slots__ = ("text", "labels", "embeddings", "future", "enqueued")
+
+    def __init__(self, text: str, labels: List[str], embeddings: Any):
+        self.text = text
+        self.labels = labels
+        self.embeddings = embeddings
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+
+class NERMicroBatcher:
+    """
+    A single worker thread drains the queue: it blocks for the first chunk, then keeps
+    collecting until max_batch chunks are queued or max_wait_ms has passed since that
+    first chunk. Chunks are grouped by label set (one forward pass needs one label set)
+    and each caller's Future receives its own entity list.
+    """
+
+    def __init__(self, model: Any, threshold: float,
+                 max_batch: int = NER_BATCH_MAX_SIZE,
+                 max_wait_ms: float = NER_BATCH_MAX_WAIT_MS):
+        self.model = model
+        self.threshold = threshold
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_NERRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        # Started lazily and per process: threads do not survive a fork.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="ner-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str, labels: Sequence[str], embeddings: Any = None) -> Future:
+        self._ensure_worker()
+        request = _NERRequest(text, list(labels), embeddings)
+        self._queue.put(request)
+        metrics.set_gauge("ner_batch_queue_depth", self._queue.qsize())
+        return request.future
+
+    def predict(self, text: str, labels: Sequence[str], embeddings: Any = None) -> List[Dict]:
+        return self.submit(text, labels, embeddings).result()
+
+    def _collect(self, batch: List[_NERRequest]) -> None:
+        """Fills `batch` in place, so _run still knows every taken request if this raises."""
+        batch.append(self._queue.get())
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        metrics.set_gauge("ner_batch_queue_depth", self._queue.qsize())
+
+    def _run(self) -> None:
+        while True:
+            batch: List[_NERRequest] = []
+            try:
+                self._collect(batch)
+                groups: Dict[tuple, List[_NERRequest]] = {}
+                for request in batch:
+                    groups.setdefault(tuple(request.labels), []).append(request)
+                for group in groups.values():
+                    self._run_group(group)
+            except Exception as e:
+                # The thread must survive: fail whatever this batch left unresolved and go on.
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run_group(self, group: List[_NERRequest]) -> None:
+        now = time.monotonic()
+        for request in group:
+            metrics.observe("ner_batch_wait_seconds", now - request.enqueued)
+        metrics.inc("ner_batches_total")
+        metrics.inc("ner_batched_chunks_total", value=len(group))
+        count_model_call("gliner")
+
+        texts = [request.text for request in group]
+        labels, embeddings = group[0].labels, group[0].embeddings
+        try:
+            if embeddings is not None:
+                results = self.model.batch_predict_with_embeds(texts, embeddings, labels, threshold=self.threshold)
+            else:
+                results = self.model.batch_predict_entities(texts, labels, threshold=self.threshold)
+            if len(results) != len(group):
+                raise RuntimeError(f"GLiNER returned {len(results)} results for {len(group)} texts")
+        except Exception as e:
+            for request in group:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request, entities in zip(group, results):
+            if not request.future.done():  # a caller may have cancelled it
+                request.future.set_result(entities)
@@ -0,0 +1,266 @@
+"""Admission control for Ollama calls: per-lane concurrency limits, priorities and per-tenant fairness."""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import IO, Deque, Dict, Iterator, Mapping, Optional
+
+from app.config import (
+    OLLAMA_LANE_CONCURRENCY,
+    OLLAMA_MAX_QUEUE,
+    OLLAMA_QUEUE_TIMEOUT_SECONDS,
+    OLLAMA_SLOT_DIR,
+    OLLAMA_SLOT_POLL_SECONDS
+)
+from app.core.circuit_breaker import ModelUnavailableError
+from app.core.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): lane limits are per process only
+    fcntl = None
+
+LANE_EMBED, LANE_VISION = "embed", "vision"
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+DEFAULT_TENANT = "default"
+
+metrics.describe("ollama_queue_depth", "Model calls waiting for a lane slot")
+metrics.describe("ollama_inflight", "Model calls currently holding a lane slot")
+metrics.describe("ollama_queue_rejections_total", "Model calls rejected because a lane queue was full or too slow")
+
+# Who is asking, set once per HTTP request; calls outside a request run as interactive/default.
+_priority: ContextVar[int] = ContextVar("ollama_priority", default=INTERACTIVE)
+_tenant: ContextVar[str] = ContextVar("ollama_tenant", default=DEFAULT_TENANT)
+
+
+class QueueFullError(ModelUnavailableError):
+    pass
+
+
+class _Lane:
+    def __init__(self, name: str, limit: int, shared: bool = False):
+        self.name = name
+        self.limit = max(1, limit)
+        self.shared = shared
+        # Local grants: `limit` slots, or with shared slot files one turn to wait for a file.
+        self.turns = 1 if shared else self.limit
+        self.granted = 0
+        self.holding = 0  # shared slot files held by this process
+        self.slot_freed = threading.Event()
+        self.waiting = 0
+        # priority -> tenant -> waiters; tenants rotate to the back after each grant.
+        self.queues: Dict[int, "OrderedDict[str, Deque[threading.Event]]"] = {p: OrderedDict() for p in PRIORITY_NAMES}
+
+    def push(self, priority: int, tenant: str, waiter: threading.Event) -> None:
+        self.queues[priority].setdefault(tenant, deque()).append(waiter)
+        self.waiting += 1
+
+    def pop_next(self) -> Optional[threading.Event]:
+        for priority in sorted(self.queues):
+            tenants = self.queues[priority]
+            if tenants:
+                tenant, waiters = next(iter(tenants.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+                self.waiting -= 1
+                return waiter
+        return None
+
+    def remove(self, priority: int, tenant: str, waiter: threading.Event) -> None:
+        waiters = self.queues[priority].get(tenant)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self.queues[priority][tenant]
+            self.waiting -= 1
+
+    def depth(self, priority: int) -> int:
+        return sum(len(waiters) for waiters in self.queues[priority].values())
+
+    @property
+    def active(self) -> int:
+        return self.holding if self.shared else self.granted
+
+
+class OllamaScheduler:
+    """
+    Callers block in slot() until their lane has a free slot. Free slots go to the
+    highest priority first, then round-robin across the tenants waiting at that priority,
+    so one tenant's 200-page PDF cannot hold a lane against everyone else.
+
+    With `slot_dir`, the limit holds across every worker sharing the directory: a call
+    runs while it holds one of the lane's `limit` lock files (flock), which the kernel
+    drops if its worker dies. Each process then grants one turn per lane, in the order
+    above, and only the turn holder waits for a free file, so no slot is held while
+    waiting. Across processes interactive calls still go first: while one waits it holds
+    a shared lock on the lane's gate file, and batch turn holders only take a free file
+    when no worker holds that lock. Tenant round-robin stays per process.
+    """
+
+    def __init__(self, limits: Mapping[str, int] = OLLAMA_LANE_CONCURRENCY, max_queue: int = OLLAMA_MAX_QUEUE,
+                 queue_timeout: float = OLLAMA_QUEUE_TIMEOUT_SECONDS, clock=time.monotonic,
+                 slot_dir: str = OLLAMA_SLOT_DIR):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.slot_dir = slot_dir if fcntl is not None else ""
+        if self.slot_dir:
+            os.makedirs(self.slot_dir, exist_ok=True)
+        self._limits = dict(limits)
+        self.reset()
+
+    def reset(self) -> None:
+        """Fresh lanes and lock; a worker forked from the preloaded master starts with these."""
+        self._lanes = {name: _Lane(name, limit, bool(self.slot_dir)) for name, limit in self._limits.items()}
+        self._lock = threading.Lock()
+        for lane in self._lanes.values():
+            self._update_gauges(lane)
+
+    @contextmanager
+    def slot(self, lane: str, priority: Optional[int] = None, tenant: Optional[str] = None) -> Iterator[None]:
+        """Holds one slot of `lane` for the duration of a model call."""
+        token = self.acquire(lane, priority, tenant)
+        try:
+            yield
+        finally:
+            self.release(lane, token)
+
+    def acquire(self, lane: str, priority: Optional[int] = None, tenant: Optional[str] = None) -> Optional[IO]:
+        """Blocks until admitted; returns the cross-process slot handle to pass to release()."""
+        start = self.clock()
+        priority = _priority.get() if priority is None else priority
+        tenant = _tenant.get() if tenant is None else tenant
+        self._acquire_local(lane, priority, tenant)
+        if not self.slot_dir:
+            return None
+        state = self._lanes[lane]
+        try:
+            handle = self._acquire_global(lane, priority, start)
+        finally:
+            with self._lock:
+                self._end_grant(state)  # the turn goes to the next caller either way
+                self._update_gauges(state)
+        with self._lock:
+            state.holding += 1
+            self._update_gauges(state)
+        return handle
+
+    def _acquire_global(self, lane: str, priority: int, start: float) -> IO:
+        """Waits, as this process's turn holder, for one of the lane's slot files."""
+        state = self._lanes[lane]
+        gate = open(os.path.join(self.slot_dir, f"{lane}.interactive.lock"), "a")
+        try:
+            if priority == INTERACTIVE:
+                fcntl.flock(gate, fcntl.LOCK_SH)
+            while True:
+                state.slot_freed.clear()
+                if priority == INTERACTIVE or self._no_interactive_waiting(gate):
+                    for i in range(state.limit):
+                        handle = open(os.path.join(self.slot_dir, f"{lane}.{i}.lock"), "a")
+                        try:
+                            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                            return handle
+                        except BlockingIOError:
+                            handle.close()
+                remaining = self.queue_timeout - (self.clock() - start)
+                if remaining <= 0:
+                    metrics.inc("ollama_queue_rejections_total", {"lane": lane, "reason": "timeout"})
+                    raise QueueFullError(lane, f"no slot within {self.queue_timeout:g}s", self.queue_timeout)
+                # flock cannot time out, so another worker's release is seen on the next poll;
+                # a release in this process wakes the wait right away.
+                state.slot_freed.wait(min(OLLAMA_SLOT_POLL_SECONDS, remaining))
+        finally:
+            gate.close()
+
+    @staticmethod
+    def _no_interactive_waiting(gate: IO) -> bool:
+        try:
+            fcntl.flock(gate, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        fcntl.flock(gate, fcntl.LOCK_UN)
+        return True
+
+    def _acquire_local(self, lane: str, priority: int, tenant: str) -> None:
+        labels = {"lane": lane, "priority": PRIORITY_NAMES[priority]}
+        start = self.clock()
+        with self._lock:
+            state = self._lanes[lane]
+            if state.granted < state.turns and state.waiting == 0:
+                state.granted += 1
+                self._update_gauges(state)
+                metrics.observe("ollama_queue_wait_seconds", 0.0, labels)
+                return
+            if state.waiting >= self.max_queue:
+                metrics.inc("ollama_queue_rejections_total", {"lane": lane, "reason": "full"})
+                raise QueueFullError(lane, "queue full", self.queue_timeout)
+            waiter = threading.Event()
+            state.push(priority, tenant, waiter)
+            self._update_gauges(state)
+
+        granted = waiter.wait(self.queue_timeout)
+        if not granted:
+            with self._lock:
+                # The slot may have been handed over between the timeout and taking the lock.
+                granted = waiter.is_set()
+                if not granted:
+                    state.remove(priority, tenant, waiter)
+                    self._update_gauges(state)
+            if not granted:
+                metrics.inc("ollama_queue_rejections_total", {"lane": lane, "reason": "timeout"})
+                raise QueueFullError(lane, f"no slot within {self.queue_timeout:g}s", self.queue_timeout)
+        metrics.observe("ollama_queue_wait_seconds", self.clock() - start, labels)
+
+    def release(self, lane: str, token: Optional[IO] = None) -> None:
+        if token is not None:
+            token.close()  # closing the file drops its flock
+        with self._lock:
+            state = self._lanes[lane]
+            if state.shared:
+                state.holding -= 1
+                state.slot_freed.set()
+            else:
+                self._end_grant(state)
+            self._update_gauges(state)
+
+    @staticmethod
+    def _end_grant(state: _Lane) -> None:
+        """Hands a finished grant (slot or turn) to the next waiter; caller holds the lock."""
+        state.granted -= 1
+        while state.granted < state.turns:
+            waiter = state.pop_next()
+            if waiter is None:
+                break
+            state.granted += 1
+            waiter.set()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: {"active": lane.active, "limit": lane.limit,
+                           **{f"waiting_{PRIORITY_NAMES[p]}": lane.depth(p) for p in PRIORITY_NAMES}}
+                    for name, lane in self._lanes.items()}
+
+    def _update_gauges(self, lane: _Lane) -> None:
+        metrics.set_gauge("ollama_inflight", lane.active, {"lane": lane.name})
+        for priority, name in PRIORITY_NAMES.items():
+            metrics.set_gauge("ollama_queue_depth", lane.depth(priority), {"lane": lane.name, "priority": name})
+
+
+# Shared by every Ollama client in the process.
+scheduler = OllamaScheduler()
+
+
+def start_request_scheduling(priority: int = INTERACTIVE, tenant: str = DEFAULT_TENANT) -> None:
+    _priority.set(priority)
+    _tenant.set(tenant or DEFAULT_TENANT)
+
+
+def current_tenant() -> str:
+    return _tenant.get()
@@ -1,19 +1,42 @@
-from typing import Dict, Any, Union, BinaryIO
+from typing import Dict, Any, Union, BinaryIO, Iterable, Tuple, List, Optional
+import os
+import queue
+import tempfile
+import threading
 import cv2 as cv
 import numpy as np
-import tempfile
-import os
 import fitz
-from app.config import PDF_RENDER_SCALE, BLUR_RADIUS
+from app.config import (
+    PDF_RENDER_SCALE,
+    BLUR_RADIUS,
+    UPLOAD_DIR,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_STREAM_BATCH_SEGMENTS,
+    AUDIO_STREAM_QUEUE_SIZE,
+    AUDIO_STREAM_PUT_TIMEOUT_SECONDS,
+    VECTOR_STORE_ENABLED,
+    INCLUDE_RAW_VECTOR,
+    VISION_INPUT_MAX_SIDE
+)
 from app.core.scanner import Scanner
 from app.core.embedder import Embedder
 from app.core.privacy import PrivacyEngine
 from app.core.vision import VisionEngine
+from app.core.metrics import span, count_error
+from app.core.circuit_breaker import get_degraded
+from app.core.vector_store import VectorStore
 from app.processors.audio import AudioProcessor
+from app.processors.audio_redaction import AudioRedactor
 from app.processors.text import TextProcessor
 from app.processors.form import FormProcessor
+from app.processors.dataset import DatasetProcessor
 from app.processors.document_blur import DocumentProcessorBlur
 from app.processors.face_blur import FaceDetection
+from app.processors.batch_blur import BatchFaceBlur
+from app.processors.video_blur import VideoFaceBlur
+from app.utils.vector_codec import encode_vector
+from app.utils.vision_payload import VisionPayload, prepare_vision_payload
+from app.utils.audio_tools import decode_to_pcm_file, open_pcm, probe_duration, write_wav
 
 
 class SecurePipeline:
@@ -23,6 +46,7 @@ class SecurePipeline:
         self.privacy_engine = PrivacyEngine()
         self.vision_engine = VisionEngine()
         self.audio_proc = AudioProcessor()
+        self.audio_redactor = AudioRedactor()
         self.text_proc = TextProcessor()
         self.form_proc = FormProcessor()
         self.doc_proc = DocumentProcessorBlur(
@@ -31,78 +55,364 @@ class SecurePipeline:
             blur_radius=BLUR_RADIUS
         )
 
+        self.dataset_proc = DatasetProcessor(self.scanner, self.embedder)
+        self.vector_store = VectorStore() if VECTOR_STORE_ENABLED else None
+
         self.face_proc = FaceDetection()
+        self.batch_blur = BatchFaceBlur()
+        self.video_proc = VideoFaceBlur()
+
+    def is_ready(self) -> bool:
+        """True once every locally hosted model (GLiNER, Whisper, YuNet) is loaded."""
+        return all([
+            getattr(self.scanner, "ner_model", None) is not None,
+            getattr(self.audio_proc, "model", None) is not None,
+            getattr(self.face_proc, "detector", None) is not None,
+        ])
 
-    def _apply_standard_security(self, raw_text: str, epsilon: float) -> Dict[str, Any]:
-        """The 'Universal' Security Wrapper"""
+    def start_worker(self) -> None:
+        """Loads what a preloading gunicorn master must not create: Whisper and vector-store handles."""
+        self.audio_proc.load_default_model()
+        if self.vector_store is not None:
+            self.vector_store.reopen()
+
+    def _apply_standard_security(self, raw_text: str, epsilon: float,
+                                 findings: Optional[List[Dict]] = None,
+                                 labels: Optional[List[str]] = None, source: str = "text",
+                                 chunk_vectors: bool = False) -> Dict[str, Any]:
+        """
+        The 'Universal' Security Wrapper; pass findings to skip a scan already done upstream.
+        The safe vector is also appended to the vector store, tagged with `source`.
+        With chunk_vectors, the noised per-chunk vectors of the pooled embedding are returned too.
+        """
         self.privacy_engine.epsilon = epsilon
-        findings = self.scanner.scan(raw_text)
-        safe_text = self.scanner.redact(raw_text, findings)
-        boomerang_map = self.scanner.create_boomerang_map(findings)
-        raw_vector = self.embedder.get_vector(safe_text)
-        safe_vector = self.privacy_engine.add_noise(raw_vector)
-        return {
+        if findings is None:
+            with span("scan"):
+                findings = self.scanner.scan(raw_text, labels=labels)
+        with span("redact"):
+            safe_text = self.scanner.redact(raw_text, findings)
+            boomerang_map = self.scanner.create_boomerang_map(findings)
+        chunks = None
+        with span("embed"):
+            if chunk_vectors:
+                raw_vector, chunks = self.embedder.get_chunked_vectors(safe_text)
+            else:
+                raw_vector = self.embedder.get_vector(safe_text)
+        with span("privacy_noise"):
+            safe_vector = self.privacy_engine.add_noise(raw_vector)
+            if chunks is not None:
+                # Offsets refer to safe_content; each chunk vector gets its own noise draw.
+                chunks = [{**c, "vector": encode_vector(self.privacy_engine.add_noise(c["vector"]))} for c in chunks]
+        # A zero raw vector is the embedder's degraded fallback; noise alone is not worth storing.
+        vector_id = self._store_vector(safe_vector, source, safe_text) if np.any(raw_vector) else None
+        # Vectors go out in the encoding the client negotiated (plain float list by default).
+        result = {
             "safe_content": safe_text,
             "boomerang_map": boomerang_map,
             "audit_log": findings,
-            "safe_vector": safe_vector.tolist(),
+            "safe_vector": encode_vector(safe_vector),
             "full_vector_shape": safe_vector.shape,
-            "raw_vector": raw_vector.tolist()
+            "vector_id": vector_id
         }
+        if INCLUDE_RAW_VECTOR:
+            result["raw_vector"] = encode_vector(raw_vector)
+        if chunks is not None:
+            result["chunk_vectors"] = chunks
+        degraded = get_degraded()
+        if degraded:
+            result["degraded"] = degraded
+        return result
+
+    def _store_vector(self, safe_vector: np.ndarray, source: str, safe_text: str) -> Optional[int]:
+        # A full disk must not fail the redaction itself.
+        store = getattr(self, "vector_store", None)
+        if store is None:
+            return None
+        try:
+            with span("vector_store"):
+                return store.add(safe_vector, source, safe_text)
+        except (OSError, ValueError) as e:
+            print(f"[VECTOR STORE ERROR]: {e}")
+            count_error("vector_store")
+            return None
+
+    def run_search_pipeline(self, top_k: int, text: Optional[str] = None,
+                            vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Nearest stored safe vectors. A text query is redacted and embedded first, so it
+        lands in the same space as the stored (redacted) content.
+        """
+        if self.vector_store is None:
+            raise RuntimeError("Vector store is disabled")
+        if vector is None:
+            with span("scan"):
+                findings = self.scanner.scan(text)
+            with span("embed"):
+                vector = self.embedder.get_vector(self.scanner.redact(text, findings))
+        with span("vector_search"):
+            return self.vector_store.search(vector, top_k)
 
     def run_document_pipeline(self, temp_path: str, epsilon: float) -> Dict[str, Any]:
         """Processes all pages and returns a consistent response"""
-        doc_result = self.doc_proc.process(temp_path, epsilon)
+        with span("document_blur"):
+            doc_result = self.doc_proc.process(temp_path, epsilon)
 
-        doc = fitz.open(doc_result.get('safe_pdf_path'))
+        # The blurred pages were already prepared for the vision model; no re-render of the PDF.
+        page_payloads = doc_result.pop("page_payloads", None)
+        if page_payloads is None:
+            page_payloads = self._render_vision_payloads(doc_result.get('safe_pdf_path'))
+        # Pages summarized by the combined PII call need no second vision call.
+        page_descriptions = doc_result.pop("page_descriptions", None) or [None] * len(page_payloads)
         all_descriptions = []
-        try:
-            for page in doc:
-                pix = page.get_pixmap()
-                all_descriptions.append(self.vision_engine.describe_pdf_content(pix.tobytes()))
-        finally:
-            doc.close()
+        for payload, description in zip(page_payloads, page_descriptions):
+            if description is None:
+                with span("vision_describe"):
+                    description = self.vision_engine.describe_pdf_content(payload, blurred=True)
+            all_descriptions.append(description)
 
         full_description = "\n".join(all_descriptions)
-        security = self._apply_standard_security(full_description, epsilon)
+        security = self._apply_standard_security(full_description, epsilon, source="document")
 
         return {**doc_result, **security,"description": full_description}
 
+    def _render_vision_payloads(self, pdf_path: str) -> List[VisionPayload]:
+        doc = fitz.open(pdf_path)
+        try:
+            payloads = []
+            for page in doc:
+                zoom = VISION_INPUT_MAX_SIDE / max(page.rect.width, page.rect.height)
+                payloads.append(prepare_vision_payload(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))))
+            return payloads
+        finally:
+            doc.close()
+
     def run_image_pipeline(self, file_obj: BinaryIO, epsilon: float) -> Dict[str, Any]:
         """Standardizes image response"""
-        file_bytes = file_obj.read()
-        nparr = np.frombuffer(file_bytes, np.uint8)
-        img = cv.imdecode(nparr, cv.IMREAD_COLOR)
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            cv.imwrite(tmp.name, img)
-            blurred_img = self.face_proc.blur_faces(tmp.name)
-            os.remove(tmp.name)
+        with span("image_decode"):
+            file_bytes = file_obj.read()
+            nparr = np.frombuffer(file_bytes, np.uint8)
+            img = cv.imdecode(nparr, cv.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode uploaded image")
+        with span("face_blur"):
+            blurred_img = self.face_proc.blur_array(img)
 
-        _, buffer = cv.imencode('.png', blurred_img)
-        description = self.vision_engine.describe_image(buffer.tobytes())
-        security = self._apply_standard_security(description, epsilon)
+        with span("image_encode"):
+            _, buffer = cv.imencode('.png', blurred_img)
+            png_bytes = buffer.tobytes()
+            # The model gets a downscaled JPEG of the pixels, not the full-resolution PNG.
+            payload = prepare_vision_payload(blurred_img)
+        with span("vision_describe"):
+            description = self.vision_engine.describe_image(payload, blurred=True)
+        security = self._apply_standard_security(description, epsilon, source="image")
 
-        return {"blurred_image_bytes": buffer.tobytes(), "description": description, **security}
+        return {"blurred_image_bytes": png_bytes, "description": description, **security}
 
-    def run_audio_pipeline(self, file_obj: BinaryIO, epsilon: float):
+    def run_image_batch_pipeline(self, images: Iterable[Tuple[str, Optional[bytes]]], output: BinaryIO) -> Dict[str, Any]:
+        """Blurs faces in many images and streams them into a zip on `output`"""
+        manifest = self.batch_blur.process(images, output)
+        failed = sum(1 for entry in manifest if entry.get("status") != "ok")
+        return {
+            "total": len(manifest),
+            "failed": failed,
+            "faces": sum(entry.get("faces", 0) for entry in manifest),
+        }
+
+    def run_video_pipeline(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Blurs faces in a video file, writing the result to output_path"""
+        return self.video_proc.process(input_path, output_path)
+
+    def _choose_whisper_size(self, stream: BinaryIO, model_size: Optional[str]) -> str:
+        # Only "auto" needs the duration; explicit sizes skip the header probe.
+        duration = probe_duration(stream) if model_size == "auto" else None
+        return self.audio_proc.choose_model_size(model_size, duration)
+
+    def run_audio_pipeline(self, file_obj: BinaryIO, epsilon: float, model_size: Optional[str] = None):
         """Standardizes audio response"""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            tmp.write(file_obj.read())
-            tmp_path = tmp.name
+        # Werkzeug uploads are spooled file objects; Whisper decodes them in place.
+        stream = getattr(file_obj, "stream", file_obj)
+        size = self._choose_whisper_size(stream, model_size)
+        with span("transcribe"), self.audio_proc.transcribing():
+            raw_text = self.audio_proc.extract_text(stream, model_size=size)
+
+        return {**self._apply_standard_security(raw_text, epsilon, source="audio"), "whisper_model": size}
+
+    def run_audio_stream_pipeline(self, file_obj: BinaryIO, epsilon: float,
+                                  model_size: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Scans transcript batches while Whisper keeps decoding (VAD-filtered),
+        so total latency approaches transcription time. Adds per-segment timestamps and findings.
+        """
+        stream = getattr(file_obj, "stream", file_obj)
+        size = self._choose_whisper_size(stream, model_size)
+        segment_queue: "queue.Queue" = queue.Queue(maxsize=AUDIO_STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def put(item) -> bool:
+            # Never block for good on a full queue: the consumer may have given up.
+            while not stop.is_set():
+                try:
+                    segment_queue.put(item, timeout=AUDIO_STREAM_PUT_TIMEOUT_SECONDS)
+                    return True
+                except queue.Full:
+                    pass
+            return False
 
+        def transcribe():
+            try:
+                with self.audio_proc.transcribing():
+                    for segment in self.audio_proc.stream_segments(stream, model_size=size):
+                        if not put(segment):
+                            break
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                put(None)
+
+        producer = threading.Thread(target=transcribe, daemon=True)
+        producer.start()
+
+        segments: List[Dict[str, Any]] = []
+        findings: List[Dict] = []
+        offset = 0
+        finished = False
         try:
-            raw_text = self.audio_proc.extract_text(tmp_path)
+            with span("transcribe_and_scan"):
+                while not finished:
+                    # Block for one segment, then take whatever else is already decoded.
+                    batch = [segment_queue.get()]
+                    while batch[-1] is not None and len(batch) < AUDIO_STREAM_BATCH_SEGMENTS:
+                        try:
+                            batch.append(segment_queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    if batch[-1] is None:
+                        finished = True
+                        batch.pop()
+                    if not batch:
+                        continue
+
+                    batch_offset = offset
+                    for seg in batch:
+                        segments.append({"start": round(seg.start, 2), "end": round(seg.end, 2),
+                                         "text": seg.text, "offset": offset})
+                        offset += len(seg.text) + 1
+                    with span("scan"):
+                        for f in self.scanner.scan(" ".join(seg.text for seg in batch)):
+                            f["start"] += batch_offset
+                            f["end"] += batch_offset
+                            findings.append(f)
         finally:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+            # On a scan error the producer must not stay blocked on the queue holding Whisper.
+            stop.set()
+            while True:
+                try:
+                    segment_queue.get_nowait()
+                except queue.Empty:
+                    break
+            producer.join()
+        if errors:
+            raise errors[0]
+
+        raw_text = " ".join(seg["text"] for seg in segments)
+        security = self._apply_standard_security(raw_text, epsilon, findings=findings, source="audio")
+        entity_map = security["boomerang_map"]
+
+        for seg in segments:
+            seg_start = seg.pop("offset")
+            seg_end = seg_start + len(seg["text"])
+            local = [
+                {**f, "start": f["start"] - seg_start, "end": min(f["end"], seg_end) - seg_start}
+                for f in findings if seg_start <= f["start"] < seg_end
+            ]
+            seg["findings"] = local
+            seg["safe_text"] = self.scanner.redact(seg["text"], local, entity_map)
 
-        return self._apply_standard_security(raw_text, epsilon)
+        return {**security, "segments": segments, "whisper_model": size}
 
-    def run_text_pipeline(self, text: str, epsilon: float):
+    def run_audio_redaction_pipeline(self, file_obj: BinaryIO, epsilon: float, output: BinaryIO,
+                                     mode: Optional[str] = None,
+                                     model_size: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Writes a WAV with every PII span muted or bleeped to `output`.
+        The decoded PCM lives in a memory-mapped temp file, so hour-long inputs stay out of RAM.
+        """
+        if mode and mode not in AudioRedactor.MODES:
+            raise ValueError(f"Unknown redaction mode: {mode}")
+        stream = getattr(file_obj, "stream", file_obj)
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(suffix=".pcm", dir=UPLOAD_DIR) as pcm_file:
+            with span("audio_decode"):
+                n_samples = decode_to_pcm_file(stream, pcm_file.name)
+            if n_samples == 0:
+                raise ValueError("Uploaded audio contains no samples")
+            pcm = open_pcm(pcm_file.name, n_samples, writable=True)
+
+            size = self.audio_proc.choose_model_size(model_size, n_samples / AUDIO_SAMPLE_RATE)
+            with span("transcribe"), self.audio_proc.transcribing():
+                segments = self.audio_proc.transcribe_pcm(pcm, word_timestamps=True, model_size=size)
+            raw_text = " ".join(seg["text"] for seg in segments)
+            security = self._apply_standard_security(raw_text, epsilon, source="audio")
+
+            with span("audio_redact"):
+                # Exactly the spans replaced in safe_text, including repeats of a found value.
+                replaced = self.scanner.redaction_spans(raw_text, security["audit_log"])
+                ranges = self.audio_redactor.redact(pcm, segments, replaced, mode)
+                write_wav(pcm, output)
+            del pcm
+
+        return {
+            **security,
+            "duration_seconds": round(n_samples / AUDIO_SAMPLE_RATE, 2),
+            "redacted_ranges": [{"start": round(s, 2), "end": round(e, 2)} for s, e in ranges],
+            "whisper_model": size,
+        }
+
+    def run_dataset_pipeline(self, source: BinaryIO, output: BinaryIO, fmt: str, epsilon: float,
+                             columns: Optional[List[str]] = None, skip_columns: Iterable[str] = (),
+                             embed_column: Optional[str] = None,
+                             labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Redacts a CSV/JSONL/Parquet dataset batch by batch into `output` (same format)"""
+        with span("dataset"):
+            return self.dataset_proc.process(
+                source, output, fmt, epsilon,
+                columns=columns, skip_columns=tuple(skip_columns),
+                embed_column=embed_column, labels=labels
+            )
+
+    def run_text_pipeline(self, text: str, epsilon: float, labels: Optional[List[str]] = None,
+                          chunk_vectors: bool = False):
         """Standardizes text response"""
-        return self._apply_standard_security(text, epsilon)
+        return self._apply_standard_security(text, epsilon, labels=labels, chunk_vectors=chunk_vectors)
+
+    def run_form_pipeline(self, json_data: Dict, epsilon: float, labels: Optional[List[str]] = None):
+        """
+        Standardizes form response. Field values are scanned in one batched pass and
+        findings are mapped back to their field; `fields` holds per-field redactions.
+        """
+        keys = list(json_data.keys())
+        values = [str(v) for v in json_data.values()]
+        with span("scan"):
+            per_field = self.scanner.scan_many(values, labels=labels)
 
-    def run_form_pipeline(self, json_data: Dict, epsilon: float):
-        """Standardizes form response"""
-        flattened = ". ".join([f"{k}: {v}" for k, v in json_data.items()])
-        return self._apply_standard_security(flattened, epsilon)
\ No newline at end of file
+        parts: List[str] = []
+        findings: List[Dict] = []
+        offset = 0
+        for key, value, field_findings in zip(keys, values, per_field):
+            prefix = f"{key}: "
+            for f in field_findings:
+                f["field"] = key
+                findings.append({**f, "start": f["start"] + offset + len(prefix),
+                                 "end": f["end"] + offset + len(prefix)})
+            parts.append(prefix + value)
+            offset += len(prefix) + len(value) + 2  # ". " separator
+
+        flattened = ". ".join(parts)
+        security = self._apply_standard_security(flattened, epsilon, findings=findings, source="form")
+        entity_map = security.get("boomerang_map") or {}
+        fields = {
+            key: {"safe_value": self.scanner.redact(value, field_findings, entity_map), "findings": field_findings}
+            for key, value, field_findings in zip(keys, values, per_field)
+        }
+        return {**security, "fields": fields}
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""Cheap shape checks that decide whether a value needs the NER model at all."""
+
+import re
+from typing import Optional, Sequence
+
+from app.config import NER_PREFILTER_RULES, NER_PREFILTER_MAX_CHARS
+from app.core.metrics import metrics
+
+_BOOLEAN_VALUES = {"true", "false", "yes", "no", "y", "n", "null", "none", "nan", "n/a"}
+_NUMERIC_RE = re.compile(r"^[+-]?[$€£]?(\d{1,3}([,\s]\d{3})+|\d+)?([.,]\d+)?%?$")
+_UUID_RE = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+# IP addresses have no letters but are an NER label with no regex counterpart.
+_IPV4_RE = re.compile(r"^\d{1,3}(\.\d{1,3}){3}$")
+
+metrics.describe(
+    "ner_prefilter_total",
+    "NER pre-filter decisions per value: decision=ner (model runs) or the rule that skipped it "
+    "(empty, boolean, numeric, uuid, iso_date, no_letters); skipped values still get the regex scan",
+)
+
+
+def classify_value(text: str, rules: Sequence[str] = NER_PREFILTER_RULES,
+                   max_chars: int = NER_PREFILTER_MAX_CHARS) -> Optional[str]:
+    """Returns the rule that makes NER unnecessary for this value, or None if the model should run."""
+    value = text.strip()
+    if "empty" in rules and not any(c.isalnum() for c in value):
+        return "empty"
+    if len(value) > max_chars:
+        return None
+    if "boolean" in rules and value.lower() in _BOOLEAN_VALUES:
+        return "boolean"
+    if "numeric" in rules and _NUMERIC_RE.match(value) and any(c.isdigit() for c in value):
+        return "numeric"
+    if "uuid" in rules and _UUID_RE.match(value):
+        return "uuid"
+    if "iso_date" in rules and _ISO_DATE_RE.match(value):
+        return "iso_date"
+    if "no_letters" in rules and not any(c.isalpha() for c in value) and not _IPV4_RE.match(value):
+        return "no_letters"
+    return None
+
+
+def needs_ner(text: str) -> bool:
+    """classify_value plus the skip-rate counters."""
+    rule = classify_value(text)
+    metrics.inc("ner_prefilter_total", {"decision": rule or "ner"})
+    if rule:
+        metrics.inc("ner_prefilter_skipped_chars_total", value=len(text))
+    return rule is None
@@ -1,7 +1,10 @@
 import re
 import os
+import bisect
+import threading
+from collections import OrderedDict
 from gliner import GLiNER
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from app.config import (
     NER_MODEL_NAME,
     NER_LABELS,
@@ -9,24 +12,75 @@ from app.config import (
     PII_REGEX_PATTERNS,
     DATA_DIR,
     GLINER_LOCAL_DIR,
+    GLINER_ONNX_DIR,
+    NER_RUNTIME,
+    NER_ONNX_MODEL_FILE,
     SCANNER_CHUNK_SIZE,
-    SCANNER_CHUNK_OVERLAP
+    SCANNER_CHUNK_OVERLAP,
+    NER_LABEL_CACHE_SIZE,
+    NER_MICRO_BATCHING,
+    KEYWORD_GATE_ENABLED
 )
+from app.core.metrics import count_model_call, count_cache_hit
+from app.core.ner_batcher import NERMicroBatcher
+from app.core.prefilter import needs_ner
+from app.core.keyword_gate import KeywordGate
+
+
+LabelKey = Tuple[str, ...]
+# Joins texts for the combined regex pass; NUL is neither \w nor \s, so most patterns stop at it.
+_JOIN_SEPARATOR = "\x00"
+
+
+def normalize_labels(labels: Sequence[str]) -> LabelKey:
+    """Strips, lower-cases and de-duplicates labels, keeping their order."""
+    seen = OrderedDict()
+    for label in labels:
+        label = str(label).strip().lower()
+        if label:
+            seen[label] = None
+    return tuple(seen)
 
 
 class Scanner:
     _model_instance = None
+    # Shared like the model: label set -> precomputed label embeddings (None for uni-encoders).
+    _label_cache: "OrderedDict[LabelKey, Any]" = OrderedDict()
+    _label_lock = threading.Lock()
+    _batcher = None  # shared NERMicroBatcher when NER_MICRO_BATCHING is on
+    batcher = None
+    keyword_gate = KeywordGate() if KEYWORD_GATE_ENABLED else None
 
     def __init__(self):
         self._load_ner_model()
         self.labels = NER_LABELS
         self.threshold = NER_THRESHOLD
+        self.batcher = None
+        if NER_MICRO_BATCHING:
+            if Scanner._batcher is None or Scanner._batcher.model is not self.ner_model:
+                Scanner._batcher = NERMicroBatcher(self.ner_model, self.threshold)
+            self.batcher = Scanner._batcher
 
     def _load_ner_model(self):
         if Scanner._model_instance is not None:
+            count_cache_hit("ner_model")
             self.ner_model = Scanner._model_instance
             return
 
+        onnx_path = os.path.join(DATA_DIR, "models", GLINER_ONNX_DIR)
+        if NER_RUNTIME == "onnx":
+            if os.path.exists(os.path.join(onnx_path, NER_ONNX_MODEL_FILE)):
+                print(f" [Scanner] Loading GLiNER ONNX model ({NER_ONNX_MODEL_FILE})...")
+                Scanner._model_instance = GLiNER.from_pretrained(
+                    onnx_path,
+                    load_onnx_model=True,
+                    onnx_model_file=NER_ONNX_MODEL_FILE,
+                    local_files_only=True
+                )
+                self.ner_model = Scanner._model_instance
+                return
+            print(" [Scanner] ONNX export not found (run download_models.py --onnx). Using PyTorch.")
+
         print(f" [Scanner] Loading GLiNER model ({NER_MODEL_NAME})...")
         local_path = os.path.join(DATA_DIR, "models", GLINER_LOCAL_DIR)
 
@@ -38,29 +92,77 @@ class Scanner:
 
         self.ner_model = Scanner._model_instance
 
-    def scan(self, text: str, chunk_size: int = SCANNER_CHUNK_SIZE, overlap: int = SCANNER_CHUNK_OVERLAP) -> List[Dict]:
-        words = text.split()
-        all_findings = []
+    def _supports_label_embeddings(self) -> bool:
+        # Only bi-encoder GLiNER models encode labels separately from the text.
+        config = getattr(self.ner_model, "config", None)
+        return isinstance(getattr(config, "labels_encoder", None), str) \
+            and hasattr(self.ner_model, "predict_with_embeds")
 
-        if len(words) <= chunk_size:
-            all_findings.extend(self._run_model_on_text(text))
-        else:
+    def label_encoding(self, labels: Optional[Sequence[str]] = None) -> Tuple[List[str], Any]:
+        """
+        Returns (normalized labels, cached label embeddings) for a label set.
+        Embeddings are computed once per set; uni-encoder models get None and
+        only reuse the normalized label list.
+        """
+        key = normalize_labels(labels if labels else self.labels)
+        with Scanner._label_lock:
+            if key in Scanner._label_cache:
+                Scanner._label_cache.move_to_end(key)
+                count_cache_hit("ner_labels")
+                return list(key), Scanner._label_cache[key]
+
+        embeddings = None
+        if self._supports_label_embeddings():
+            count_model_call("gliner_labels")
+            embeddings = self.ner_model.encode_labels(list(key))
+
+        with Scanner._label_lock:
+            Scanner._label_cache[key] = embeddings
+            while len(Scanner._label_cache) > NER_LABEL_CACHE_SIZE:
+                Scanner._label_cache.popitem(last=False)
+        return list(key), embeddings
+
+    def scan(self, text: str, chunk_size: int = SCANNER_CHUNK_SIZE, overlap: int = SCANNER_CHUNK_OVERLAP,
+             labels: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Pass labels for a custom (e.g. per-tenant) entity set; defaults to NER_LABELS."""
+        return self.scan_many([text], chunk_size, overlap, labels)[0]
+
+    def scan_many(self, texts: Sequence[str], chunk_size: int = SCANNER_CHUNK_SIZE,
+                  overlap: int = SCANNER_CHUNK_OVERLAP,
+                  labels: Optional[Sequence[str]] = None) -> List[List[Dict]]:
+        """
+        Scans several texts (e.g. form fields) with one batched GLiNER pass and one regex
+        pass over the joined texts. Returns findings per text, offsets relative to that text.
+        Numeric/structured values (see prefilter.classify_value) only get the regex pass.
+        """
+        encoding = self.label_encoding(labels)
+        chunk_texts: List[str] = []
+        owners: List[Tuple[int, int, bool]] = []  # (text index, char offset, chunked)
+        for idx, text in enumerate(texts):
+            if not needs_ner(text):
+                continue
+            words = text.split()
+            if len(words) <= chunk_size:
+                chunk_texts.append(text)
+                owners.append((idx, 0, False))
+                continue
             for i in range(0, len(words), chunk_size - overlap):
-                chunk_words = words[i: i + chunk_size]
-                chunk_text = " ".join(chunk_words)
-                start_char_offset = len(" ".join(words[:i])) + (1 if i > 0 else 0)
+                chunk_texts.append(" ".join(words[i: i + chunk_size]))
+                owners.append((idx, len(" ".join(words[:i])) + (1 if i > 0 else 0), True))
 
-                chunk_findings = self._run_model_on_text(chunk_text)
-                for f in chunk_findings:
+        per_text: List[List[Dict]] = [[] for _ in texts]
+        for (idx, start_char_offset, chunked), chunk_findings in zip(owners, self._run_model_on_chunks(chunk_texts, encoding)):
+            for f in chunk_findings:
+                if chunked:
                     f['start'] += start_char_offset
                     f['end'] += start_char_offset
                     f['source'] = "GLiNER"
-                    all_findings.append(f)
+                per_text[idx].append(f)
 
-        secret_findings = self._scan_for_secrets(text)
-        all_findings.extend(secret_findings)
+        for idx, secret_findings in enumerate(self._scan_many_for_secrets(texts)):
+            per_text[idx].extend(secret_findings)
 
-        return self._deduplicate_findings(all_findings)
+        return [self._deduplicate_findings(findings) for findings in per_text]
 
     def _deduplicate_findings(self, findings: List[Dict]) -> List[Dict]:
         if not findings: return []
@@ -81,17 +183,56 @@ class Scanner:
             unique.append(current)
         return unique
 
-    def _run_model_on_text(self, text: str) -> List[Dict]:
+    def _run_model_on_chunks(self, texts: List[str], encoding: Tuple[List[str], Any]) -> List[List[Dict]]:
+        """
+        Several chunks run as one GLiNER batch; with micro-batching they are all queued
+        at once so they can also share forward passes with other requests.
+        """
+        if self.batcher is None:
+            if len(texts) == 1:
+                return [self._run_model_on_text(texts[0], encoding)]
+            return self._run_model_batch(texts, encoding)
+        futures = [self.batcher.submit(t, *encoding) if t.strip() else None for t in texts]
+        return [self._to_findings(f.result()) if f is not None else [] for f in futures]
+
+    def _run_model_batch(self, texts: List[str], encoding: Tuple[List[str], Any]) -> List[List[Dict]]:
+        results: List[List[Dict]] = [[] for _ in texts]
+        indices = [i for i, t in enumerate(texts) if t.strip()]
+        if not indices:
+            return results
+        labels, embeddings = encoding
+        batch = [texts[i] for i in indices]
+        count_model_call("gliner")
+        if embeddings is not None:
+            entities = self.ner_model.batch_predict_with_embeds(batch, embeddings, labels, threshold=self.threshold)
+        else:
+            entities = self.ner_model.batch_predict_entities(batch, labels, threshold=self.threshold)
+        for i, text_entities in zip(indices, entities):
+            results[i] = self._to_findings(text_entities)
+        return results
+
+    def _run_model_on_text(self, text: str, encoding: Optional[Tuple[List[str], Any]] = None) -> List[Dict]:
         if not text.strip(): return []
-        entities = self.ner_model.predict_entities(text, self.labels, threshold=self.threshold)
+        labels, embeddings = encoding or self.label_encoding()
+        count_model_call("gliner")
+        if embeddings is not None:
+            entities = self.ner_model.predict_with_embeds(text, embeddings, labels, threshold=self.threshold)
+        else:
+            entities = self.ner_model.predict_entities(text, labels, threshold=self.threshold)
+        return self._to_findings(entities)
+
+    @staticmethod
+    def _to_findings(entities: List[Dict]) -> List[Dict]:
         return [{
             "text": e["text"], "label": e["label"], "score": float(e["score"]),
             "start": e["start"], "end": e["end"]
         } for e in entities]
 
     def _scan_for_secrets(self, text: str) -> List[Dict]:
+        # The keyword gate drops regex families whose anchor keywords do not occur in the text.
+        patterns = self.keyword_gate.select(text) if self.keyword_gate else PII_REGEX_PATTERNS
         findings = []
-        for pattern, label in PII_REGEX_PATTERNS:
+        for pattern, label in patterns:
             for match in re.finditer(pattern, text):
                 findings.append({
                     "text": match.group(),
@@ -103,6 +244,37 @@ class Scanner:
                 })
         return findings
 
+    def _scan_many_for_secrets(self, texts: Sequence[str]) -> List[List[Dict]]:
+        """
+        One regex pass over all texts joined by a separator. A match that touches a
+        separator could differ from scanning that text alone, so every text it spans
+        is rescanned on its own instead.
+        """
+        if len(texts) <= 1:
+            return [self._scan_for_secrets(t) for t in texts]
+
+        starts, pos = [], 0
+        for text in texts:
+            starts.append(pos)
+            pos += len(text) + len(_JOIN_SEPARATOR)
+        joined = _JOIN_SEPARATOR.join(texts)
+
+        per_text: List[List[Dict]] = [[] for _ in texts]
+        rescan = set()
+        for f in self._scan_for_secrets(joined):
+            first = bisect.bisect_right(starts, f['start']) - 1
+            last = bisect.bisect_right(starts, max(f['start'], f['end'] - 1)) - 1
+            if first != last or f['end'] > starts[first] + len(texts[first]):
+                rescan.update(range(first, last + 1))
+                continue
+            f['start'] -= starts[first]
+            f['end'] -= starts[first]
+            per_text[first].append(f)
+
+        for idx in rescan:
+            per_text[idx] = self._scan_for_secrets(texts[idx])
+        return per_text
+
     def create_boomerang_map(self, findings: List[Dict]) -> Dict[str, str]:
         entity_map = {}
         counts = {}
@@ -131,10 +303,24 @@ class Scanner:
             text = text.replace(tag, original)
         return text
 
-    def redact(self, text: str, findings: List[Dict]) -> str:
-        if not findings: return text
+    def redact(self, text: str, findings: List[Dict], entity_map: Optional[Dict[str, str]] = None) -> str:
+        """Pass a shared entity_map to keep tags consistent across separately redacted pieces."""
+        if not findings and not entity_map: return text
 
-        entity_map = self.create_boomerang_map(findings)
+        safe_text = text
+        for r in reversed(self.redaction_spans(text, findings, entity_map)):
+            safe_text = safe_text[:r['start']] + r['replacement'] + safe_text[r['end']:]
+
+        return safe_text
+
+    def redaction_spans(self, text: str, findings: List[Dict],
+                        entity_map: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Every span redact() replaces ({"start", "end", "replacement"}, sorted): the findings plus
+        later whole-word occurrences of already found values.
+        """
+        if entity_map is None:
+            entity_map = self.create_boomerang_map(findings)
         replacements = []
         for f in findings:
             tag = entity_map.get(f['text'])
@@ -175,8 +361,4 @@ class Scanner:
                     non_overlapping.append(r)
                     last_end = r['end']
 
-        safe_text = text
-        for r in reversed(non_overlapping):
-            safe_text = safe_text[:r['start']] + r['replacement'] + safe_text[r['end']:]
-
-        return safe_text
\ No newline at end of file
+        return non_overlapping
\ No newline at end of file
@@ -0,0 +1,532 @@
+"""
+Append-only, memory-mapped store for the DP-noised safe vectors, with IVF or HNSW search.
+
+Layout of VECTOR_STORE_DIR:
+    CURRENT               name of the live generation directory (swapped atomically by compact())
+    gen-<n>/vectors.bin   L2-normalized rows (float16 or float32); written last, so its size is the row count
+    gen-<n>/ids.bin       int64 id per row (ids survive compaction)
+    gen-<n>/meta.jsonl    {"source", "text", "created"} per row, byte offsets in meta.idx (uint64)
+    gen-<n>/deleted.bin   int64 ids of tombstoned rows, dropped by the next compaction
+    gen-<n>/ivf.npz or hnsw.bin  index over the first `indexed` rows; newer rows are scanned brute force
+"""
+
+from __future__ import annotations
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    EMBED_DIMENSION,
+    VECTOR_STORE_DIR,
+    VECTOR_STORE_DTYPE,
+    VECTOR_STORE_INDEX,
+    VECTOR_STORE_MAX_TEXT_CHARS,
+    VECTOR_IVF_TRAIN_MIN,
+    VECTOR_IVF_MAX_LISTS,
+    VECTOR_IVF_TRAIN_SAMPLE,
+    VECTOR_IVF_NPROBE,
+    VECTOR_IVF_REBUILD_TAIL,
+    VECTOR_HNSW_M,
+    VECTOR_HNSW_EF_CONSTRUCTION,
+    VECTOR_HNSW_EF_SEARCH
+)
+from app.core.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking on Windows; a single worker is still safe
+    fcntl = None
+
+try:
+    import hnswlib
+except ImportError:  # HNSW is optional; the NumPy IVF index needs nothing extra
+    hnswlib = None
+
+_SCAN_CHUNK_ROWS = 65536
+_META_READ_BYTES = 4096
+_KMEANS_ITERATIONS = 10
+
+metrics.describe("vector_store_rows", "Rows in the vector store (including tombstoned ones)")
+metrics.describe("vector_search_rows_scored_total", "Stored vectors scored by /search (index candidates plus unindexed tail)")
+
+
+def normalize(vector) -> Optional[np.ndarray]:
+    """Unit-length float32 copy, or None for an all-zero vector (nothing to rank by)."""
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0 or not math.isfinite(norm):
+        return None
+    return vector / norm
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+def train_ivf(matrix: np.ndarray, n_lists: int, sample: int = VECTOR_IVF_TRAIN_SAMPLE,
+              iterations: int = _KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids over a random sample of the (normalized) rows."""
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    picked = np.sort(rng.choice(n, size=min(n, sample), replace=False))
+    data = np.asarray(matrix[picked], dtype=np.float32)
+    n_lists = min(n_lists, len(data))
+    centroids = data[rng.choice(len(data), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Empty lists are reseeded from random rows instead of collapsing.
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+def assign_lists(matrix: np.ndarray, centroids: np.ndarray, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """Nearest centroid for rows [start, stop), in chunks so the memmap is never fully loaded."""
+    stop = matrix.shape[0] if stop is None else stop
+    assign = np.empty(stop - start, dtype=np.int32)
+    for lo in range(start, stop, _SCAN_CHUNK_ROWS):
+        hi = min(stop, lo + _SCAN_CHUNK_ROWS)
+        block = np.asarray(matrix[lo:hi], dtype=np.float32)
+        assign[lo - start:hi - start] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def _read_line(fd: int, offset: int) -> bytes:
+    """One JSONL record via pread: no shared file position, so safe across threads and processes."""
+    chunks = []
+    while True:
+        chunk = os.pread(fd, _META_READ_BYTES, offset)
+        end = chunk.find(b"\n")
+        if end >= 0 or not chunk:
+            chunks.append(chunk if end < 0 else chunk[:end])
+            return b"".join(chunks)
+        chunks.append(chunk)
+        offset += len(chunk)
+
+
+class VectorStore:
+    """
+    Every pipeline appends its safe vector here; search() ranks by cosine similarity.
+    Gunicorn workers share one directory: appends, deletes and compaction hold an
+    exclusive file lock, and readers pick up new rows and indexes from file sizes/mtimes.
+    Indexes are built in a background thread once VECTOR_IVF_TRAIN_MIN rows exist.
+    """
+
+    def __init__(self, directory: str = VECTOR_STORE_DIR, dim: int = EMBED_DIMENSION,
+                 dtype: str = VECTOR_STORE_DTYPE, index: str = VECTOR_STORE_INDEX,
+                 train_min: int = VECTOR_IVF_TRAIN_MIN, rebuild_tail: int = VECTOR_IVF_REBUILD_TAIL):
+        if index == "hnsw" and hnswlib is None:
+            print("[VECTOR STORE] hnswlib not installed, falling back to the IVF index")
+            index = "ivf"
+        if index not in ("ivf", "hnsw"):
+            raise ValueError(f"Unknown vector index: {index}")
+        self.directory = directory
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.index_kind = index
+        self.train_min = train_min
+        self.rebuild_tail = rebuild_tail
+        self._row_bytes = self.dim * self.dtype.itemsize
+        self._lock = threading.RLock()
+        self._build_thread: Optional[threading.Thread] = None
+        self._meta_handle = None
+        os.makedirs(directory, exist_ok=True)
+        with self._file_lock():
+            if not os.path.exists(self._current_file):
+                os.makedirs(os.path.join(directory, "gen-0"), exist_ok=True)
+                self._write_current("gen-0")
+            self._open()
+
+    # --- files and locking ---
+
+    @property
+    def _current_file(self) -> str:
+        return os.path.join(self.directory, "CURRENT")
+
+    def _read_current(self) -> str:
+        with open(self._current_file) as f:
+            return f.read().strip()
+
+    def _write_current(self, generation: str) -> None:
+        tmp = self._current_file + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(generation)
+        os.replace(tmp, self._current_file)
+
+    def _path(self, name: str, generation: Optional[str] = None) -> str:
+        return os.path.join(self.directory, generation or self.generation, name)
+
+    @contextmanager
+    def _file_lock(self, name: str = ".lock", blocking: bool = True):
+        """Exclusive inter-process lock; yields False when non-blocking and already held."""
+        with open(os.path.join(self.directory, name), "a") as handle:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _memmap(self, name: str, dtype, shape) -> np.ndarray:
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _open(self) -> None:
+        """Maps the live generation from scratch (start-up and after a compaction)."""
+        self.generation = self._read_current()
+        for name in ("vectors.bin", "ids.bin", "meta.jsonl", "meta.idx", "deleted.bin"):
+            open(self._path(name), "ab").close()
+        # Kept open so results stay readable even if a compaction unlinks this generation.
+        # The previous handle is not closed here: a search may still be reading through it,
+        # and it is closed once the last reference goes away.
+        self._meta_handle = open(self._path("meta.jsonl"), "rb")
+        self._vectors_size = -1
+        self._deleted_size = -1
+        self._index_mtime = None
+        self._index: Optional[Dict[str, Any]] = None
+        self.indexed = 0
+        self._refresh_rows()
+        self._refresh_index()
+
+    def _refresh_rows(self) -> None:
+        size = os.path.getsize(self._path("vectors.bin"))
+        if size != self._vectors_size:
+            self._vectors_size = size
+            self.count = size // self._row_bytes
+            self.vectors = self._memmap("vectors.bin", self.dtype, (self.count, self.dim))
+            self.ids = self._memmap("ids.bin", np.int64, (self.count,))
+            self.meta_offsets = self._memmap("meta.idx", np.uint64, (self.count,))
+            self._deleted_size = -1
+            metrics.set_gauge("vector_store_rows", self.count)
+        deleted_size = os.path.getsize(self._path("deleted.bin"))
+        if deleted_size != self._deleted_size:
+            self._deleted_size = deleted_size
+            self.deleted = np.zeros(self.count, dtype=bool)
+            deleted_ids = np.fromfile(self._path("deleted.bin"), dtype=np.int64)
+            if len(deleted_ids) and self.count:
+                rows = np.searchsorted(self.ids, deleted_ids)
+                valid = rows < self.count
+                rows, deleted_ids = rows[valid], deleted_ids[valid]
+                self.deleted[rows[self.ids[rows] == deleted_ids]] = True
+            self.n_deleted = int(self.deleted.sum())
+
+    def _refresh_index(self) -> None:
+        marker = self._path("ivf.npz" if self.index_kind == "ivf" else "hnsw.json")
+        try:
+            mtime = os.stat(marker).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+        self._index_mtime = mtime
+        if self.index_kind == "ivf":
+            with np.load(marker) as data:
+                index = {key: data[key] for key in data.files}
+            indexed = int(index["indexed"])
+        else:
+            with open(marker) as f:
+                indexed = json.load(f)["indexed"]
+            graph = hnswlib.Index(space="ip", dim=self.dim)
+            graph.load_index(self._path("hnsw.bin"), max_elements=indexed)
+            graph.set_ef(VECTOR_HNSW_EF_SEARCH)
+            index = {"graph": graph}
+        self._index, self.indexed = index, min(indexed, self.count)
+
+    def reopen(self) -> None:
+        """New lock, file handle and maps; a worker forked from the preloaded master calls this."""
+        self._lock = threading.RLock()
+        self._build_thread = None
+        inherited = self._meta_handle
+        with self._lock:
+            self._open()
+        if inherited is not None:
+            inherited.close()  # nothing in this process can be reading through it yet
+
+    def refresh(self) -> None:
+        """Picks up rows, tombstones, indexes and compactions written by other workers."""
+        with self._lock:
+            if self._read_current() != self.generation:
+                self._open()
+                return
+            self._refresh_rows()
+            self._refresh_index()
+
+    # --- writes ---
+
+    def add(self, vector, source: str, text: str = "") -> Optional[int]:
+        """Appends one vector with its (already redacted) text; returns its id, or None for a zero vector."""
+        unit = normalize(vector)
+        if unit is None:
+            return None
+        if unit.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dimensional vector, got {unit.shape[0]}")
+        record = json.dumps({
+            "source": source,
+            "text": (text or "")[:VECTOR_STORE_MAX_TEXT_CHARS],
+            "created": round(time.time(), 3),
+        }, ensure_ascii=False).encode("utf-8") + b"\n"
+
+        with self._lock, self._file_lock():
+            if self._read_current() != self.generation:
+                self._open()
+            # Other workers append too: the files, not this process's view, give the row count.
+            count = os.path.getsize(self._path("vectors.bin")) // self._row_bytes
+            # Drop whatever a crashed append left past the last complete row.
+            for name, width in (("vectors.bin", self._row_bytes), ("ids.bin", 8), ("meta.idx", 8)):
+                if os.path.getsize(self._path(name)) != count * width:
+                    os.truncate(self._path(name), count * width)
+            vector_id = self._next_id(count)
+            with open(self._path("meta.jsonl"), "ab") as f:
+                offset = f.tell()
+                f.write(record)
+            with open(self._path("meta.idx"), "ab") as f:
+                f.write(np.uint64(offset).tobytes())
+            with open(self._path("ids.bin"), "ab") as f:
+                f.write(np.int64(vector_id).tobytes())
+            with open(self._path("vectors.bin"), "ab") as f:
+                f.write(unit.astype(self.dtype).tobytes())
+
+        metrics.inc("vector_store_added_total", {"source": source})
+        self.refresh()
+        self._maybe_build()
+        return vector_id
+
+    def _next_id(self, count: int) -> int:
+        try:
+            with open(self._path("id_base")) as f:
+                base = int(f.read())
+        except FileNotFoundError:
+            base = 0
+        if count == 0:
+            return base
+        last = np.fromfile(self._path("ids.bin"), dtype=np.int64, count=1, offset=(count - 1) * 8)
+        return max(base, int(last[0]) + 1)
+
+    def delete(self, ids: Iterable[int]) -> int:
+        """Tombstones ids; they stop appearing in results now and are dropped by compact()."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            return 0
+        with self._lock, self._file_lock():
+            if self._read_current() != self.generation:
+                self._open()
+            with open(self._path("deleted.bin"), "ab") as f:
+                f.write(ids.tobytes())
+        before = self.n_deleted
+        self.refresh()
+        return self.n_deleted - before
+
+    # --- search ---
+
+    def search(self, vector, top_k: int = 10, nprobe: int = VECTOR_IVF_NPROBE) -> List[Dict[str, Any]]:
+        """Top-k stored vectors by cosine similarity: [{"id", "score", "source", "text", "created"}]."""
+        query = normalize(vector)
+        if query is None or top_k <= 0:
+            return []
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dimensional vector, got {query.shape[0]}")
+        with self._lock:
+            self.refresh()
+            # One consistent view: a concurrent refresh or compaction swaps these attributes.
+            vectors, deleted, index = self.vectors, self.deleted, self._index
+            ids, meta_offsets, meta_handle = self.ids, self.meta_offsets, self._meta_handle
+            count, indexed = self.count, (self.indexed if self._index is not None else 0)
+            fetch = top_k + self.n_deleted
+
+        parts: List[Tuple[np.ndarray, np.ndarray]] = []
+        if indexed:
+            parts.append(self._search_index(index, vectors, query, fetch, nprobe, indexed))
+        scored = sum(len(rows) for rows, _ in parts) + (count - indexed)
+        for lo in range(indexed, count, _SCAN_CHUNK_ROWS):
+            hi = min(count, lo + _SCAN_CHUNK_ROWS)
+            scores = np.asarray(vectors[lo:hi], dtype=np.float32) @ query
+            parts.append(_top_k(np.arange(lo, hi), scores, fetch))
+        metrics.inc("vector_search_rows_scored_total", value=scored)
+        if not parts:
+            return []
+
+        rows = np.concatenate([r for r, _ in parts])
+        scores = np.concatenate([s for _, s in parts])
+        live = ~deleted[rows]
+        rows, scores = _top_k(rows[live], scores[live], top_k)
+        return [
+            {"id": int(ids[row]), "score": round(float(score), 6),
+             **json.loads(_read_line(meta_handle.fileno(), int(meta_offsets[row])))}
+            for row, score in zip(rows, scores)
+        ]
+
+    def _search_index(self, index: Dict[str, Any], vectors: np.ndarray, query: np.ndarray,
+                      fetch: int, nprobe: int, indexed: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.index_kind == "hnsw":
+            graph = index["graph"]
+            k = min(fetch, indexed)
+            graph.set_ef(max(VECTOR_HNSW_EF_SEARCH, k))
+            labels, distances = graph.knn_query(query, k=k)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+
+        centroids, order, offsets = index["centroids"], index["order"], index["offsets"]
+        probe = _top_k(np.arange(len(centroids)), centroids @ query, min(nprobe, len(centroids)))[0]
+        rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+        rows.sort()  # ascending rows keep memmap reads sequential
+        return _top_k(rows, np.asarray(vectors[rows], dtype=np.float32) @ query, fetch)
+
+    # --- index maintenance ---
+
+    def _maybe_build(self) -> None:
+        with self._lock:
+            unindexed = self.count - (self.indexed if self._index is not None else 0)
+            due = self.count >= self.train_min and (
+                self._index is None or unindexed >= self.rebuild_tail
+            )
+            if not due or (self._build_thread is not None and self._build_thread.is_alive()):
+                return
+            self._build_thread = threading.Thread(target=self.build_index, name="vector-index", daemon=True)
+            self._build_thread.start()
+
+    def build_index(self, retrain: bool = False) -> bool:
+        """
+        Indexes every current row. IVF keeps the trained centroids and only assigns new rows
+        unless `retrain` is set or the store has grown 4x since training. Returns False if
+        another worker is already building.
+        """
+        with self._file_lock(".index.lock", blocking=False) as acquired:
+            if not acquired:
+                return False
+            with self._lock:
+                self.refresh()
+                generation, vectors, count = self.generation, self.vectors, self.count
+                index, indexed = self._index, self.indexed
+            if count == 0:
+                return False
+            if self.index_kind == "ivf":
+                self._build_ivf(generation, vectors, count, index, indexed, retrain)
+            else:
+                self._build_hnsw(generation, vectors, count, indexed if index is not None and not retrain else 0)
+            metrics.inc("vector_index_builds_total", {"index": self.index_kind})
+        self.refresh()
+        return True
+
+    def _build_ivf(self, generation: str, vectors: np.ndarray, count: int,
+                   index: Optional[Dict[str, Any]], indexed: int, retrain: bool) -> None:
+        if index is None or retrain or count >= 4 * int(index["trained"]):
+            n_lists = min(VECTOR_IVF_MAX_LISTS, max(1, int(4 * math.sqrt(count))))
+            centroids = train_ivf(vectors[:count], n_lists)
+            trained = count
+            assign = assign_lists(vectors, centroids, 0, count)
+        else:
+            centroids, trained = index["centroids"], int(index["trained"])
+            assign = np.empty(count, dtype=np.int32)
+            lists = np.repeat(np.arange(len(centroids), dtype=np.int32), np.diff(index["offsets"]))
+            assign[index["order"]] = lists
+            assign[indexed:] = assign_lists(vectors, centroids, indexed, count)
+
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))]).astype(np.int64)
+        tmp = self._path("ivf.npz.tmp", generation)
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=centroids, order=order, offsets=offsets,
+                     indexed=np.int64(count), trained=np.int64(trained))
+        os.replace(tmp, self._path("ivf.npz", generation))
+
+    def _build_hnsw(self, generation: str, vectors: np.ndarray, count: int, indexed: int) -> None:
+        graph = hnswlib.Index(space="ip", dim=self.dim)
+        if indexed:
+            # Load a private copy; the one serving searches is never mutated.
+            graph.load_index(self._path("hnsw.bin", generation), max_elements=count)
+        else:
+            graph.init_index(max_elements=count, ef_construction=VECTOR_HNSW_EF_CONSTRUCTION, M=VECTOR_HNSW_M)
+        for lo in range(indexed, count, _SCAN_CHUNK_ROWS):
+            hi = min(count, lo + _SCAN_CHUNK_ROWS)
+            graph.add_items(np.asarray(vectors[lo:hi], dtype=np.float32), np.arange(lo, hi))
+        graph.save_index(self._path("hnsw.bin.tmp", generation))
+        os.replace(self._path("hnsw.bin.tmp", generation), self._path("hnsw.bin", generation))
+        tmp = self._path("hnsw.json.tmp", generation)
+        with open(tmp, "w") as f:
+            json.dump({"indexed": count}, f)
+        os.replace(tmp, self._path("hnsw.json", generation))
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrites the store without tombstoned rows into a new generation and rebuilds the index.
+        Appends from other workers wait on the lock while rows are copied.
+        """
+        with self._lock, self._file_lock():
+            self.refresh()
+            old = self.generation
+            new = f"gen-{int(old.split('-')[1]) + 1}"
+            shutil.rmtree(self._path("", new), ignore_errors=True)  # leftover of a failed compaction
+            os.makedirs(self._path("", new))
+            live = np.flatnonzero(~self.deleted)
+
+            with open(self._path("vectors.bin", new), "wb") as vec_out, \
+                    open(self._path("ids.bin", new), "wb") as ids_out, \
+                    open(self._path("meta.idx", new), "wb") as idx_out, \
+                    open(self._path("meta.jsonl", new), "wb") as meta_out, \
+                    open(self._path("meta.jsonl"), "rb") as meta_in:
+                for lo in range(0, len(live), _SCAN_CHUNK_ROWS):
+                    rows = live[lo:lo + _SCAN_CHUNK_ROWS]
+                    vec_out.write(np.ascontiguousarray(self.vectors[rows]).tobytes())
+                    ids_out.write(np.ascontiguousarray(self.ids[rows]).tobytes())
+                    offsets = np.empty(len(rows), dtype=np.uint64)
+                    for i, row in enumerate(rows):
+                        offsets[i] = meta_out.tell()
+                        meta_in.seek(int(self.meta_offsets[row]))
+                        meta_out.write(meta_in.readline())
+                    idx_out.write(offsets.tobytes())
+            with open(self._path("id_base", new), "w") as f:
+                f.write(str(self._next_id(self.count)))
+
+            removed = self.count - len(live)
+            self._write_current(new)
+            self._open()
+            shutil.rmtree(self._path("", old), ignore_errors=True)
+
+        if self.count >= self.train_min:
+            self.build_index(retrain=True)
+        metrics.inc("vector_store_compactions_total")
+        return {"rows": self.count, "removed": removed}
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        return {
+            "rows": self.count,
+            "deleted": self.n_deleted,
+            "indexed": self.indexed if self._index is not None else 0,
+            "index": self.index_kind,
+            "generation": self.generation,
+        }
+
+
+if __name__ == "__main__":
+    # poetry run python -m app.core.vector_store [stats|compact|build]
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = VectorStore()
+    if command == "compact":
+        print(store.compact())
+    elif command == "build":
+        store.build_index(retrain=True)
+    print(store.stats())
@@ -1,48 +1,102 @@
 import base64
+import os
+from pathlib import Path
+from typing import Optional
 import requests
 from app.config import OLLAMA_BASE_URL, VISION_MODEL, TIMEOUT_SECONDS, VISION_ANALYSIS_PROMPT, \
-    VISION_PDF_ANALYSIS_PROMPT
+    VISION_PDF_ANALYSIS_PROMPT, OLLAMA_CONNECT_TIMEOUT_SECONDS, OLLAMA_FAILURE_MODE, VISION_CACHE_ENABLED
+from app.core.metrics import count_model_call, count_error
+from app.core.circuit_breaker import CircuitOpenError, ModelUnavailableError, get_breaker, mark_degraded
+from app.core.ollama_scheduler import LANE_VISION, current_tenant, scheduler
+from app.core.vision_cache import VisionCache
+from app.utils.vision_payload import ImageSource, prepare_vision_payload
+
+# Shared by every VisionEngine in the process.
+_description_cache = VisionCache() if VISION_CACHE_ENABLED else None
 
 
 class VisionEngine:
-    def __init__(self):
+    def __init__(self, cache: Optional[VisionCache] = None):
         self.url = f"{OLLAMA_BASE_URL}/api/generate"
         self.model = VISION_MODEL
+        self.breaker = get_breaker("vision")
+        self.scheduler = scheduler
+        self.cache = cache if cache is not None else _description_cache
 
-    def describe_image(self, image_bytes: bytes) -> str:
-        """Uses the Ollama Vision Model to describe the visual content."""
-        img_b64 = base64.b64encode(image_bytes).decode("utf-8")
+    def describe_image(self, image: ImageSource, blurred: bool = False) -> str:
+        """
+        Uses the Ollama Vision Model to describe the visual content.
+        Accepts encoded bytes, pixels or a prepared VisionPayload.
+        Pass blurred=True for already-redacted images; only those use the description cache.
+        """
+        return self._describe(image, VISION_ANALYSIS_PROMPT, "Error generating image description.", blurred)
 
-        payload = {
-            "model": self.model,
-            "prompt": VISION_ANALYSIS_PROMPT,
-            "images": [img_b64],
-            "stream": False
-        }
+    def describe_pdf_content(self, image: ImageSource, blurred: bool = False) -> str:
+        """Uses the Ollama Vision Model to describe the content of the pdf. Pages only hit the cache exactly."""
+        return self._describe(image, VISION_PDF_ANALYSIS_PROMPT, "Error generating PDF description.", blurred,
+                              fuzzy=False)
 
+    def _describe(self, image: ImageSource, prompt: str, fallback: str, blurred: bool, fuzzy: bool = True) -> str:
         try:
-            response = requests.post(self.url, json=payload, timeout=TIMEOUT_SECONDS)
-            response.raise_for_status()
-            return response.json().get("response", "No description generated.")
-        except Exception as e:
-            print(f"[VISION ERROR]: {e}")
-            return "Error generating image description."
+            prepared = prepare_vision_payload(image)
+            image_b64, pixels = prepared.data, prepared.image
+        except ValueError as e:
+            # Encoded formats OpenCV cannot decode are passed through for the model to handle.
+            raw = _raw_bytes(image)
+            if raw is None:
+                return self._fallback(e, fallback)
+            image_b64, pixels = base64.b64encode(raw).decode("utf-8"), None
 
-    def describe_pdf_content(self, image_bytes: bytes) -> str:
-        """Uses the Ollama Vision Model to describe the content of the pdf."""
-        img_b64 = base64.b64encode(image_bytes).decode("utf-8")
+        key = None
+        if blurred and self.cache is not None and pixels is not None:
+            key = self.cache.key(pixels, self.model, prompt, current_tenant())
+        if key is not None:
+            cached = self.cache.get(key, fuzzy)
+            if cached is not None:
+                return cached
 
         payload = {
             "model": self.model,
-            "prompt": VISION_PDF_ANALYSIS_PROMPT,
-            "images": [img_b64],
+            "prompt": prompt,
+            "images": [image_b64],
             "stream": False
         }
-
         try:
-            response = requests.post(self.url, json=payload, timeout=TIMEOUT_SECONDS)
-            response.raise_for_status()
-            return response.json().get("response", "No description generated.")
+            description = self._generate(payload)
         except Exception as e:
-            print(f"[VISION ERROR]: {e}")
-            return "Error generating PDF description."
\ No newline at end of file
+            return self._fallback(e, fallback)
+        if key is not None:
+            self.cache.put(key, description)
+        return description
+
+    def _generate(self, payload: dict) -> str:
+        """One /api/generate call in the vision lane, behind the vision circuit breaker."""
+        with self.scheduler.slot(LANE_VISION), self.breaker.guard():
+            count_model_call(self.model)
+            response = requests.post(self.url, json=payload,
+                                     timeout=(OLLAMA_CONNECT_TIMEOUT_SECONDS, TIMEOUT_SECONDS))
+            response.raise_for_status()
+        return response.json().get("response", "No description generated.")
+
+    def _fallback(self, error: Exception, fallback: str) -> str:
+        if not isinstance(error, CircuitOpenError):
+            print(f"[VISION ERROR]: {error}")
+        count_error("vision")
+        if OLLAMA_FAILURE_MODE == "fail":
+            if isinstance(error, ModelUnavailableError):
+                raise error
+            raise ModelUnavailableError("vision", str(error), self.breaker.retry_after()) from error
+        mark_degraded("vision")
+        return fallback
+
+
+def _raw_bytes(image: ImageSource) -> Optional[bytes]:
+    """The encoded file behind `image`, or None for pixels that could not be encoded."""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, (str, Path, os.PathLike)):
+        try:
+            return Path(image).read_bytes()
+        except OSError:
+            return None
+    return None
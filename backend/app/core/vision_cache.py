@@ -0,0 +1,115 @@
+"""Near-duplicate cache for vision model descriptions, keyed by perceptual hashes."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Union
+
+import cv2 as cv
+import numpy as np
+
+from app.config import VISION_CACHE_MAX_ENTRIES, VISION_CACHE_MAX_DISTANCE
+from app.core.metrics import metrics, count_cache_hit
+
+ImageLike = Union[bytes, np.ndarray]
+
+_PHASH_SIZE = 32
+_PHASH_BITS = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).reshape(-1)).tobytes(), "big")
+
+
+def _grayscale(image: ImageLike) -> Optional[np.ndarray]:
+    if isinstance(image, np.ndarray):
+        if image.ndim == 3:
+            return cv.cvtColor(image, cv.COLOR_BGR2GRAY if image.shape[2] == 3 else cv.COLOR_BGRA2GRAY)
+        return image
+    return cv.imdecode(np.frombuffer(image, np.uint8), cv.IMREAD_REDUCED_GRAYSCALE_2)
+
+
+def phash(gray: np.ndarray) -> int:
+    """64-bit DCT hash: low-frequency 8x8 block of a 32x32 thumbnail against its median."""
+    thumb = cv.resize(gray, (_PHASH_SIZE, _PHASH_SIZE), interpolation=cv.INTER_AREA).astype(np.float64)
+    low = (_DCT @ thumb @ _DCT.T)[:_PHASH_BITS, :_PHASH_BITS]
+    return _bits_to_int(low > np.median(low.reshape(-1)[1:]))
+
+
+def dhash(gray: np.ndarray) -> int:
+    """64-bit gradient hash: sign of horizontal differences on a 9x8 thumbnail."""
+    thumb = cv.resize(gray, (9, 8), interpolation=cv.INTER_AREA).astype(np.int16)
+    return _bits_to_int(thumb[:, 1:] > thumb[:, :-1])
+
+
+class CacheKey(NamedTuple):
+    scope: str  # tenant + model + prompt digest; only entries with the same scope are compared
+    phash: int
+    dhash: int
+    digest: str  # of the exact pixels
+
+
+class VisionCache:
+    """
+    LRU of descriptions. get() first tries the exact key (same pixels), then, if fuzzy and
+    `max_distance` > 0, scans entries of the same scope for one whose pHash and dHash are
+    both within `max_distance` bits.
+    """
+
+    def __init__(self, max_entries: int = VISION_CACHE_MAX_ENTRIES, max_distance: int = VISION_CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[CacheKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, image: ImageLike, model: str, prompt: str, tenant: str = "") -> Optional[CacheKey]:
+        """None if the image cannot be decoded (the call then simply bypasses the cache)."""
+        gray = _grayscale(image)
+        if gray is None or gray.size == 0:
+            return None
+        scope = hashlib.sha1(f"{tenant}\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+        pixels = image if isinstance(image, np.ndarray) else gray
+        digest = hashlib.sha1(np.ascontiguousarray(pixels).tobytes()).hexdigest()
+        return CacheKey(scope, phash(gray), dhash(gray), digest)
+
+    def get(self, key: CacheKey, fuzzy: bool = True) -> Optional[str]:
+        with self._lock:
+            match = key if key in self._entries else None
+            if match is None and fuzzy and self.max_distance > 0:
+                for candidate in reversed(self._entries):
+                    if (candidate.scope == key.scope
+                            and (candidate.phash ^ key.phash).bit_count() <= self.max_distance
+                            and (candidate.dhash ^ key.dhash).bit_count() <= self.max_distance):
+                        match = candidate
+                        break
+            if match is None:
+                metrics.inc("vision_cache_lookups_total", {"result": "miss"})
+                return None
+            self._entries.move_to_end(match)
+            description = self._entries[match]
+        metrics.inc("vision_cache_lookups_total", {"result": "exact" if match == key else "near"})
+        count_cache_hit("vision_description")
+        return description
+
+    def put(self, key: CacheKey, description: str) -> None:
+        with self._lock:
+            self._entries[key] = description
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.inc("vision_cache_evictions_total")
+            metrics.set_gauge("vision_cache_entries", len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
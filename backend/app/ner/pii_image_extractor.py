@@ -1,8 +1,7 @@
-import base64
-import io
 from pathlib import Path
-from typing import Union, cast
+from typing import Sequence, Type, TypeVar, Union
 import os
+import re
 import requests
 from PIL import Image
 from pydantic import BaseModel, Field
@@ -12,14 +11,20 @@ from app.config import (
     OLLAMA_BASE_URL,
     VISION_MODEL,
     TIMEOUT_SECONDS,
+    OLLAMA_CONNECT_TIMEOUT_SECONDS,
+    OLLAMA_FAILURE_MODE,
     PII_TEST_DOCUMENT_IMAGE,
     PII_EXTRACTOR_SYSTEM_PROMPT,
-    PII_IMAGE_MAX_DIMENSION,
-    PII_IMAGE_QUALITY,
+    PII_EXTRACTOR_COMBINED_SYSTEM_PROMPT,
+    PII_SUMMARY_REDACTION,
     PII_MODEL_TEMPERATURE
 )
+from app.core.metrics import count_model_call, count_error
+from app.core.circuit_breaker import CircuitOpenError, ModelUnavailableError, get_breaker, mark_degraded
+from app.core.ollama_scheduler import LANE_VISION, scheduler
+from app.utils.vision_payload import VisionPayload, prepare_vision_payload
 
-ImageInput = Union[str, Path, Image.Image]
+ImageInput = Union[str, Path, Image.Image, VisionPayload]
 
 
 class PIIExtractionResult(BaseModel):
@@ -47,50 +52,54 @@ class PIIExtractionResult(BaseModel):
         return items
 
 
+class PIIExtractionWithSummary(PIIExtractionResult):
+    """Result of the combined call: the PII lists plus a summary meant to be PII-free."""
+    summary: str = ""
+
+    def redacted_summary(self, extra_values: Sequence[str] = ()) -> str:
+        """Summary with every extracted (and extra) value masked, in case the model repeated one."""
+        summary = self.summary
+        for value in sorted({v.strip() for v in [*self.tolist(), *extra_values] if v and v.strip()},
+                            key=len, reverse=True):
+            summary = re.sub(re.escape(value), PII_SUMMARY_REDACTION, summary, flags=re.IGNORECASE)
+        return summary
+
+
+ResultT = TypeVar("ResultT", bound=PIIExtractionResult)
+
+
 class PIIImageExtractor:
     def __init__(self, model_name=VISION_MODEL):
         self.model_name = model_name
         self.api_url = f"{OLLAMA_BASE_URL.rstrip('/')}/api/chat"
         self.system_prompt = PII_EXTRACTOR_SYSTEM_PROMPT
-
-    def _encode_resized_jpeg(self, img: Image.Image) -> str:
-        img.thumbnail((PII_IMAGE_MAX_DIMENSION, PII_IMAGE_MAX_DIMENSION), Image.Resampling.LANCZOS)
-
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-
-        buffer = io.BytesIO()
-        img.save(
-            buffer,
-            format="JPEG",
-            quality=PII_IMAGE_QUALITY,
-            optimize=True
-        )
-        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+        self.breaker = get_breaker("vision")
+        self.scheduler = scheduler
 
     def _encode_image(self, image_source: ImageInput) -> str:
-        if isinstance(image_source, Image.Image):
-            working = cast(Image.Image, image_source).copy()
-            try:
-                return self._encode_resized_jpeg(working)
-            finally:
-                working.close()
-
-        path_like = Path(image_source)
-        with Image.open(path_like) as opened:
-            return self._encode_resized_jpeg(opened)
+        """Base64 of the shared vision payload (downscaled to the model input, encoded once)."""
+        return prepare_vision_payload(image_source).data
 
     def extract_from_file(self, image_source: ImageInput) -> PIIExtractionResult:
+        return self._extract(image_source, PIIExtractionResult, self.system_prompt, "Extract PII. Return JSON.")
+
+    def extract_with_summary(self, image_source: ImageInput) -> PIIExtractionWithSummary:
+        """One call returning both the PII lists and a PII-free summary of the image."""
+        return self._extract(image_source, PIIExtractionWithSummary, PII_EXTRACTOR_COMBINED_SYSTEM_PROMPT,
+                             "Extract PII and summarize. Return JSON.")
+
+    def _extract(self, image_source: ImageInput, result_model: Type[ResultT], system_prompt: str,
+                 user_prompt: str) -> ResultT:
         try:
             base64_image = self._encode_image(image_source)
 
             payload = {
                 "model": self.model_name,
                 "messages": [
-                    {"role": "system", "content": self.system_prompt},
+                    {"role": "system", "content": system_prompt},
                     {
                         "role": "user",
-                        "content": "Extract PII. Return JSON.",
+                        "content": user_prompt,
                         "images": [base64_image]
                     },
                 ],
@@ -99,13 +108,16 @@ class PIIImageExtractor:
                 "format": "json"
             }
 
-            response = requests.post(self.api_url, json=payload, timeout=TIMEOUT_SECONDS)
-            response.raise_for_status()
+            with self.scheduler.slot(LANE_VISION), self.breaker.guard():
+                count_model_call(self.model_name)
+                response = requests.post(self.api_url, json=payload,
+                                         timeout=(OLLAMA_CONNECT_TIMEOUT_SECONDS, TIMEOUT_SECONDS))
+                response.raise_for_status()
 
             data = response.json()
             if "message" not in data or "content" not in data["message"]:
                 print("[PII Extractor] Warning: Unexpected API response format.")
-                return PIIExtractionResult()
+                return result_model()
 
             content = data["message"]["content"].strip()
 
@@ -119,13 +131,21 @@ class PIIImageExtractor:
 
             if not content:
                 print("[PII Extractor] Warning: Model returned empty content.")
-                return PIIExtractionResult()
+                return result_model()
 
-            return PIIExtractionResult.model_validate_json(content)
+            return result_model.model_validate_json(content)
 
         except Exception as e:
-            print(f"[PII Extractor] Error processing image: {e}")
-            return PIIExtractionResult()
+            if not isinstance(e, CircuitOpenError):
+                print(f"[PII Extractor] Error processing image: {e}")
+            count_error("pii_extractor")
+            if isinstance(e, (requests.RequestException, ModelUnavailableError)):
+                if OLLAMA_FAILURE_MODE == "fail":
+                    if isinstance(e, ModelUnavailableError):
+                        raise
+                    raise ModelUnavailableError("vision", str(e), self.breaker.retry_after()) from e
+                mark_degraded("vision")
+            return result_model()
 
 
 if __name__ == "__main__":
@@ -1,24 +1,147 @@
+import atexit
 import os
+import threading
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+
+import numpy as np
 from faster_whisper import WhisperModel
 from app.processors.base import BaseProcessor
-from app.config import DATA_DIR, WHISPER_MODEL_SIZE, WHISPER_DEVICE
+from app.config import (
+    DATA_DIR,
+    WHISPER_MODEL_SIZE,
+    WHISPER_DEVICE,
+    WHISPER_VAD_FILTER,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_TRANSCRIBE_WINDOW_SECONDS,
+    AUDIO_PARALLEL_WORKERS,
+    AUDIO_PARALLEL_MIN_SECONDS,
+    WORKER_DEFERRED_START
+)
+from app.processors.whisper_pool import WhisperModelPool, choose_model_size
+from app.utils.audio_tools import split_on_silence, to_float32
+from app.core.metrics import metrics, count_model_call
+
+
+def whisper_model_path(model_size: str) -> str:
+    return os.path.join(DATA_DIR, "models", f"whisper-{model_size}")
+
+
+def transcribe_window(model: WhisperModel, samples: np.ndarray, offset: float,
+                      word_timestamps: bool) -> List[Dict[str, Any]]:
+    """Transcribes one int16 window; segment and word times are shifted by offset seconds."""
+    segments, _ = model.transcribe(
+        to_float32(samples),
+        vad_filter=WHISPER_VAD_FILTER,
+        word_timestamps=word_timestamps
+    )
+    return [{
+        "start": seg.start + offset,
+        "end": seg.end + offset,
+        "text": seg.text,
+        "words": [
+            {"word": w.word, "start": w.start + offset, "end": w.end + offset}
+            for w in (seg.words or [])
+        ],
+    } for seg in segments]
+
 
 class AudioProcessor(BaseProcessor):
     def __init__(self):
-        model_path = os.path.join(DATA_DIR, "models", f"whisper-{WHISPER_MODEL_SIZE}")
-        print(f"Loading Whisper Audio Model ({WHISPER_MODEL_SIZE})...")
-        self.model = WhisperModel(
-            WHISPER_MODEL_SIZE,
+        # The configured default size is loaded eagerly and pinned; other sizes load on demand.
+        # CTranslate2 starts threads on load, so a preloading gunicorn master leaves it to the workers.
+        self.pool = WhisperModelPool(self._load_model, pinned=(WHISPER_MODEL_SIZE,),
+                                     parallel_loader=self._load_parallel)
+        self.model = None if WORKER_DEFERRED_START else self.pool.get(WHISPER_MODEL_SIZE)
+        atexit.register(self.pool.close)
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def load_default_model(self) -> None:
+        self.model = self.pool.get(WHISPER_MODEL_SIZE)
+
+    @staticmethod
+    def _load_model(model_size: str) -> WhisperModel:
+        return WhisperModel(
+            model_size,
             device=WHISPER_DEVICE,
             compute_type="int8",
-            download_root=model_path
+            download_root=whisper_model_path(model_size)
         )
 
-    def extract_text(self, file_path: str) -> str:
-        """Transcribe text from audio file using Whisper."""
+    @staticmethod
+    def _load_parallel(model_size: str) -> Any:
+        from app.processors.audio_parallel import ParallelTranscriber
+        return ParallelTranscriber(model_size=model_size)
+
+    def _get_model(self, model_size: Optional[str]) -> WhisperModel:
         if not self.model:
             raise RuntimeError("Whisper model not loaded")
-        segments, _ = self.model.transcribe(file_path)
+        if not model_size or model_size == WHISPER_MODEL_SIZE:
+            return self.model
+        return self.pool.get(model_size)
+
+    @contextmanager
+    def transcribing(self):
+        """Counts in-flight transcriptions; "auto" model selection downgrades as this grows."""
+        with self._active_lock:
+            self._active += 1
+            metrics.set_gauge("whisper_active_requests", self._active)
+        try:
+            yield
+        finally:
+            with self._active_lock:
+                self._active -= 1
+                metrics.set_gauge("whisper_active_requests", self._active)
+
+    def choose_model_size(self, requested: Optional[str], duration: Optional[float] = None) -> str:
+        return choose_model_size(requested, duration, self._active)
+
+    def extract_text(self, audio: Union[str, BinaryIO, np.ndarray], model_size: Optional[str] = None) -> str:
+        """
+        Transcribe text using Whisper.
+        Accepts a path, a seekable file-like object (e.g. an upload stream)
+        or 16 kHz mono float32 PCM; file-likes are decoded without a temp copy.
+        """
+        model = self._get_model(model_size)
+        count_model_call(f"whisper-{model_size or WHISPER_MODEL_SIZE}")
+        segments, _ = model.transcribe(audio)
         return " ".join([segment.text for segment in segments])
 
+    def stream_segments(self, audio: Union[str, BinaryIO, np.ndarray],
+                        vad_filter: bool = WHISPER_VAD_FILTER,
+                        word_timestamps: bool = False,
+                        model_size: Optional[str] = None) -> Iterator:
+        """
+        Yields Whisper segments as they are decoded.
+        Transcription is lazy: each segment is produced only when the iterator advances.
+        """
+        model = self._get_model(model_size)
+        count_model_call(f"whisper-{model_size or WHISPER_MODEL_SIZE}")
+        segments, _ = model.transcribe(audio, vad_filter=vad_filter, word_timestamps=word_timestamps)
+        return segments
+
+    def transcribe_pcm(self, pcm: np.ndarray, word_timestamps: bool = True,
+                       window_seconds: int = AUDIO_TRANSCRIBE_WINDOW_SECONDS,
+                       model_size: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Transcribes int16 PCM (typically memory-mapped) in windows cut at silence, so
+        only one window is ever converted to float32. Timestamps are absolute.
+        Long memory-mapped inputs go to the process pool when AUDIO_PARALLEL_WORKERS > 1.
+        """
+        model_size = model_size or WHISPER_MODEL_SIZE
+
+        duration = len(pcm) / AUDIO_SAMPLE_RATE
+        if AUDIO_PARALLEL_WORKERS > 1 and duration >= AUDIO_PARALLEL_MIN_SECONDS \
+                and isinstance(pcm, np.memmap) and pcm.filename:
+            # The pool workers load their own copy; this process does not need one of this size.
+            return self.pool.get_parallel(model_size).transcribe(pcm, word_timestamps)
+
+        model = self._get_model(model_size)
+        results: List[Dict[str, Any]] = []
+        for start, end in split_on_silence(pcm, window_seconds * AUDIO_SAMPLE_RATE):
+            count_model_call(f"whisper-{model_size}")
+            results.extend(transcribe_window(model, pcm[start:end], start / AUDIO_SAMPLE_RATE, word_timestamps))
+        return results
+
     def process(self, *args, **kwargs): pass
\ No newline at end of file
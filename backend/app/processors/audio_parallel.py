@@ -0,0 +1,124 @@
+"""Parallel Whisper transcription over silence-aligned windows in a process pool."""
+
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from app.config import (
+    WHISPER_MODEL_SIZE,
+    WHISPER_DEVICE,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_TRANSCRIBE_WINDOW_SECONDS,
+    AUDIO_PARALLEL_WORKERS,
+    AUDIO_PARALLEL_CPU_THREADS,
+    AUDIO_PARALLEL_NUM_WORKERS,
+    AUDIO_PARALLEL_MIN_WINDOW_SECONDS
+)
+from app.core.metrics import metrics, span, count_model_call
+from app.processors.audio import transcribe_window, whisper_model_path
+from app.utils.audio_tools import open_pcm, split_on_silence
+
+# One model per worker process, created by the pool initializer.
+_worker_model: Optional[WhisperModel] = None
+
+
+def _init_worker(model_size: str, cpu_threads: int, num_workers: int) -> None:
+    global _worker_model
+    # Counts are reported by the parent; a child writing <pid>.json would never be marked dead.
+    os.environ.pop("METRICS_MULTIPROC_DIR", None)
+    metrics.disable_multiprocess()
+    _worker_model = WhisperModel(
+        model_size,
+        device=WHISPER_DEVICE,
+        compute_type="int8",
+        cpu_threads=cpu_threads,
+        num_workers=num_workers,
+        download_root=whisper_model_path(model_size)
+    )
+
+
+def _transcribe_range(pcm_path: str, n_samples: int, start: int, end: int,
+                      word_timestamps: bool) -> List[Dict[str, Any]]:
+    # Workers map the shared PCM file themselves; only offsets cross the process boundary.
+    pcm = open_pcm(pcm_path, n_samples)
+    return transcribe_window(_worker_model, pcm[start:end], start / AUDIO_SAMPLE_RATE, word_timestamps)
+
+
+class ParallelTranscriber:
+    """
+    Splits long audio at silence into roughly equal windows (one or more per worker)
+    and transcribes them concurrently, stitching segments back in time order.
+    Worker processes start on first use; close() stops them once no transcription is running.
+    """
+
+    def __init__(self, workers: int = AUDIO_PARALLEL_WORKERS,
+                 cpu_threads: int = AUDIO_PARALLEL_CPU_THREADS,
+                 num_workers: int = AUDIO_PARALLEL_NUM_WORKERS,
+                 model_size: str = WHISPER_MODEL_SIZE):
+        self.workers = max(1, workers)
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.model_size = model_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._users = 0
+        self._closed = False
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the parent holds torch/CTranslate2 threads that must not be forked.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_size, self.cpu_threads, self.num_workers),
+            )
+        return self._pool
+
+    def window_samples(self, n_samples: int) -> int:
+        """Spreads the audio evenly over the workers, within the configured bounds."""
+        per_worker = n_samples // self.workers + 1
+        lower = AUDIO_PARALLEL_MIN_WINDOW_SECONDS * AUDIO_SAMPLE_RATE
+        upper = AUDIO_TRANSCRIBE_WINDOW_SECONDS * AUDIO_SAMPLE_RATE
+        return int(min(max(per_worker, lower), upper))
+
+    def transcribe(self, pcm: np.memmap, word_timestamps: bool = True) -> List[Dict[str, Any]]:
+        windows = split_on_silence(pcm, self.window_samples(len(pcm)))
+        with self._lock:
+            self._users += 1
+            pool = self._get_pool()
+        try:
+            with span("parallel_transcribe"):
+                futures = [
+                    pool.submit(_transcribe_range, str(pcm.filename), len(pcm), start, end, word_timestamps)
+                    for start, end in windows
+                ]
+                results: List[Dict[str, Any]] = []
+                for future in futures:
+                    count_model_call(f"whisper-{self.model_size}")
+                    results.extend(future.result())
+            return results
+        finally:
+            with self._lock:
+                self._users -= 1
+                if self._closed and not self._users:
+                    self._shutdown()
+
+    def close(self) -> None:
+        """Stops the worker processes now, or when the last running transcription finishes."""
+        with self._lock:
+            self._closed = True
+            if not self._users:
+                self._shutdown()
+
+    def _shutdown(self) -> None:
+        if self._pool is not None:
+            # Does not block: queued windows still finish, then the processes exit.
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,113 @@
+"""Maps scanner findings back to audio time ranges and mutes or bleeps them in place."""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import (
+    AUDIO_SAMPLE_RATE,
+    AUDIO_REDACTION_MODE,
+    AUDIO_REDACTION_PADDING_SECONDS,
+    AUDIO_BLEEP_FREQUENCY,
+    AUDIO_BLEEP_AMPLITUDE
+)
+
+TimeRange = Tuple[float, float]
+_CHUNK_SAMPLES = 1 << 18
+
+
+class AudioRedactor:
+    """
+    Uses Whisper word timestamps to turn character-level findings into time ranges,
+    then overwrites those ranges of an int16 PCM buffer (usually a np.memmap).
+    """
+
+    MODES = ("mute", "bleep")
+
+    def __init__(self, mode: str = AUDIO_REDACTION_MODE,
+                 padding: float = AUDIO_REDACTION_PADDING_SECONDS,
+                 sample_rate: int = AUDIO_SAMPLE_RATE):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown redaction mode: {mode}")
+        self.mode = mode
+        self.padding = padding
+        self.sample_rate = sample_rate
+
+    @staticmethod
+    def word_spans(segments: Sequence[Dict[str, Any]]) -> List[Tuple[int, int, float, float]]:
+        """
+        Locates every word in the transcript built as " ".join(segment texts).
+        Returns (char_start, char_end, time_start, time_end) tuples.
+        """
+        spans = []
+        offset = 0
+        for seg in segments:
+            text = seg["text"]
+            cursor = 0
+            for word in seg.get("words", []):
+                token = word["word"].strip()
+                pos = text.find(token, cursor) if token else -1
+                if pos < 0:
+                    continue
+                spans.append((offset + pos, offset + pos + len(token), word["start"], word["end"]))
+                cursor = pos + len(token)
+            offset += len(text) + 1
+        return spans
+
+    def time_ranges(self, segments: Sequence[Dict[str, Any]], findings: Sequence[Dict]) -> List[TimeRange]:
+        """Merged, padded time ranges covering every finding."""
+        spans = self.word_spans(segments)
+        seg_bounds = []
+        offset = 0
+        for seg in segments:
+            seg_bounds.append((offset, offset + len(seg["text"])))
+            offset += len(seg["text"]) + 1
+
+        ranges: List[TimeRange] = []
+        for f in findings:
+            hits = [(ts, te) for cs, ce, ts, te in spans if cs < f["end"] and ce > f["start"]]
+            if not hits:
+                # No word alignment (e.g. missing word timestamps): silence the whole segment.
+                hits = [(seg["start"], seg["end"]) for seg, (cs, ce) in zip(segments, seg_bounds)
+                        if cs <= f["start"] < ce]
+            if hits:
+                ranges.append((min(h[0] for h in hits) - self.padding, max(h[1] for h in hits) + self.padding))
+        return self.merge(ranges)
+
+    @staticmethod
+    def merge(ranges: List[TimeRange]) -> List[TimeRange]:
+        merged: List[TimeRange] = []
+        for start, end in sorted((max(0.0, s), e) for s, e in ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def apply(self, pcm: np.ndarray, ranges: Sequence[TimeRange], mode: Optional[str] = None) -> None:
+        """Overwrites each range in place, chunk by chunk, and flushes memory-mapped buffers."""
+        mode = mode or self.mode
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown redaction mode: {mode}")
+
+        peak = AUDIO_BLEEP_AMPLITUDE * np.iinfo(np.int16).max
+        for start_s, end_s in ranges:
+            start = max(0, int(start_s * self.sample_rate))
+            end = min(len(pcm), int(np.ceil(end_s * self.sample_rate)))
+            for i in range(start, end, _CHUNK_SAMPLES):
+                j = min(i + _CHUNK_SAMPLES, end)
+                if mode == "mute":
+                    pcm[i:j] = 0
+                else:
+                    t = np.arange(i, j, dtype=np.float64) / self.sample_rate
+                    pcm[i:j] = (peak * np.sin(2 * np.pi * AUDIO_BLEEP_FREQUENCY * t)).astype(np.int16)
+
+        if isinstance(pcm, np.memmap):
+            pcm.flush()
+
+    def redact(self, pcm: np.ndarray, segments: Sequence[Dict[str, Any]], findings: Sequence[Dict],
+               mode: Optional[str] = None) -> List[TimeRange]:
+        ranges = self.time_ranges(segments, findings)
+        self.apply(pcm, ranges, mode)
+        return ranges
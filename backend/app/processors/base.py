@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any
 import numpy as np
+from app.utils.vector_codec import EncodedVector, encode_vector
 
 
 class BaseProcessor(ABC):
@@ -12,10 +13,8 @@ class BaseProcessor(ABC):
     def process(self, input_data: Any, epsilon: float) -> Dict[str, Any]:
         pass
 
-    def format_vector(self, vector: np.ndarray) -> List[float]:
-        if vector is None:
-            return []
-        return vector.tolist()
+    def format_vector(self, vector: np.ndarray) -> EncodedVector:
+        return encode_vector(vector)
 
     def calculate_utility_score(self, original_vec: np.ndarray, noisy_vec: np.ndarray) -> float:
         """
@@ -0,0 +1,160 @@
+"""Parallel face blurring for photo dumps, streamed into a zip archive."""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import zipfile
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import PurePosixPath
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import cv2 as cv
+import numpy as np
+
+from app.config import BATCH_MAX_WORKERS, BATCH_MAX_IN_FLIGHT_PER_WORKER, BATCH_IMAGE_EXTENSIONS, \
+    BATCH_MAX_IMAGE_BYTES
+from app.core.metrics import span, count_error
+from app.processors.face_blur import FaceDetection
+
+MANIFEST_NAME = "manifest.json"
+# Formats OpenCV can re-encode under the original extension.
+_REENCODE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tif', '.tiff'}
+
+
+def iter_zip_images(archive: BinaryIO, max_bytes: int = BATCH_MAX_IMAGE_BYTES) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """
+    Yields (name, bytes) for every image member, one member in memory at a time.
+    Members over `max_bytes` uncompressed yield (name, None) without being read.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or os.path.basename(info.filename).startswith('.'):
+                continue
+            ext = os.path.splitext(info.filename)[1].lower().lstrip('.')
+            if ext not in BATCH_IMAGE_EXTENSIONS:
+                continue
+            # zipfile stops reading a member at its declared size, so the header cannot understate it.
+            yield info.filename, zf.read(info) if info.file_size <= max_bytes else None
+
+
+def _unique_name(name: str, used: Set[str]) -> str:
+    """
+    The file name part of `name` (no directories, `..` or leading `/`, so nothing can be
+    written outside the extraction folder), with `-2`, `-3`... added if already used;
+    zip tools often compare names case-insensitively.
+    """
+    name = PurePosixPath(name.replace("\\", "/")).name
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate.lower() in used:
+        n += 1
+        candidate = f"{base}-{n}{ext}"
+    used.add(candidate.lower())
+    return candidate
+
+
+class BatchFaceBlur:
+    """
+    Decodes, detects and blurs images on a thread pool.
+    cv.FaceDetectorYN is not thread-safe, so each worker thread owns one detector.
+    The pool lives as long as this object, so its threads and their detectors are
+    shared by every batch request instead of being rebuilt per request.
+    """
+
+    def __init__(self, max_workers: int = BATCH_MAX_WORKERS,
+                 detector_factory: Callable[[], FaceDetection] = FaceDetection):
+        self.max_workers = max(1, max_workers)
+        self.detector_factory = detector_factory
+        self._local = threading.local()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-blur")
+            return self._pool
+
+    def _detector(self) -> FaceDetection:
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = self.detector_factory()
+        return detector
+
+    def blur_one(self, name: str, data: bytes) -> Tuple[Optional[bytes], Dict[str, Any]]:
+        """Blurs a single encoded image; returns (encoded output, manifest entry)."""
+        entry: Dict[str, Any] = {"file": name}
+        img = cv.imdecode(np.frombuffer(data, np.uint8), cv.IMREAD_COLOR)
+        if img is None:
+            entry.update(status="error", error="Could not decode image")
+            return None, entry
+
+        detector = self._detector()
+        boxes = detector.detect(img)
+        blurred = detector.blur_boxes(img, boxes)
+
+        base, ext = os.path.splitext(name)
+        ext = ext.lower() if ext.lower() in _REENCODE_EXTENSIONS else '.png'
+        ok, buffer = cv.imencode(ext, blurred)
+        if not ok:
+            entry.update(status="error", error=f"Could not encode {ext}")
+            return None, entry
+
+        entry.update(
+            status="ok",
+            output=f"{base}{ext}",
+            faces=int(len(boxes)),
+            width=int(img.shape[1]),
+            height=int(img.shape[0]),
+        )
+        return buffer.tobytes(), entry
+
+    def _safe_blur_one(self, name: str, data: bytes) -> Tuple[Optional[bytes], Dict[str, Any]]:
+        try:
+            return self.blur_one(name, data)
+        except Exception as e:
+            print(f"[BatchFaceBlur] Error processing {name}: {e}")
+            count_error("batch_blur")
+            return None, {"file": name, "status": "error", "error": str(e)}
+
+    def process(self, images: Iterable[Tuple[str, Optional[bytes]]], output: BinaryIO) -> List[Dict[str, Any]]:
+        """
+        Writes blurred images into a zip on `output` as they finish, followed by
+        manifest.json. In-flight work is bounded so memory does not grow with the batch.
+        Outputs are stored flat under their file name; clashing names (a.png and a.PNG,
+        dir1/a.png and dir2/a.png, repeated uploads) get a numeric suffix.
+        """
+        manifest: List[Dict[str, Any]] = []
+        max_in_flight = self.max_workers * BATCH_MAX_IN_FLIGHT_PER_WORKER
+        pending: Set[Future] = set()
+        used_names = {MANIFEST_NAME.lower()}
+        pool = self._executor()
+
+        with span("batch_blur"), \
+                zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as out_zip:
+
+            def drain(return_when: str) -> None:
+                done, still_pending = wait(pending, return_when=return_when)
+                pending.intersection_update(still_pending)
+                for future in done:
+                    encoded, entry = future.result()
+                    if encoded is not None:
+                        entry["output"] = _unique_name(entry["output"], used_names)
+                        out_zip.writestr(entry["output"], encoded)
+                    manifest.append(entry)
+
+            for name, data in images:
+                if data is None:
+                    manifest.append({"file": name, "status": "error",
+                                     "error": "Image exceeds BATCH_MAX_IMAGE_BYTES"})
+                    continue
+                pending.add(pool.submit(self._safe_blur_one, name, data))
+                if len(pending) >= max_in_flight:
+                    drain(FIRST_COMPLETED)
+            if pending:
+                drain(ALL_COMPLETED)
+
+            out_zip.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+
+        return manifest
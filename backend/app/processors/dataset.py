@@ -0,0 +1,232 @@
+"""Streams CSV/JSONL/Parquet datasets through the scanner in fixed-size row batches."""
+
+from __future__ import annotations
+import csv
+import io
+import json
+import os
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import DATASET_FORMATS, DATASET_BATCH_ROWS
+from app.core.metrics import span
+from app.core.privacy import PrivacyEngine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = pq = None
+
+Row = Dict[str, Any]
+
+
+def detect_format(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    fmt = {"ndjson": "jsonl", "json": "jsonl", "pq": "parquet"}.get(ext, ext)
+    if fmt not in DATASET_FORMATS:
+        raise ValueError(f"Unsupported dataset format: {ext or 'unknown'}")
+    return fmt
+
+
+def _require_pyarrow() -> None:
+    if pq is None:
+        raise ValueError("Parquet support requires the 'pyarrow' package")
+
+
+def iter_batches(source: BinaryIO, fmt: str, batch_rows: int = DATASET_BATCH_ROWS) -> Iterator[List[Row]]:
+    """Yields lists of at most batch_rows rows; only one batch is decoded at a time."""
+    if fmt == "parquet":
+        _require_pyarrow()
+        for record_batch in pq.ParquetFile(source).iter_batches(batch_size=batch_rows):
+            yield record_batch.to_pylist()
+        return
+
+    text = io.TextIOWrapper(source, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            rows: Iterator[Row] = csv.DictReader(text)
+        else:
+            rows = _iter_jsonl(text)
+        batch: List[Row] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        text.detach()
+
+
+def parquet_schema(source: BinaryIO, vector_column: Optional[str] = None):
+    """
+    The source file's Arrow schema, with `vector_column` (if any) as list<float32>.
+    Inferring it from the first batch would type an all-null column as null, and a later
+    batch with values would then fail to cast.
+    """
+    _require_pyarrow()
+    schema = pq.ParquetFile(source).schema_arrow
+    if vector_column:
+        field = pa.field(vector_column, pa.list_(pa.float32()))
+        index = schema.get_field_index(vector_column)
+        schema = schema.set(index, field) if index >= 0 else schema.append(field)
+    return schema
+
+
+def _text_leaves(container: Any, key: Any, numbers: bool) -> Iterator[tuple]:
+    """(container, key) of every non-blank string under container[key], recursing into dicts and lists."""
+    value = container[key]
+    if isinstance(value, str):
+        if value.strip():
+            yield container, key
+    elif isinstance(value, dict):
+        for child in value:
+            yield from _text_leaves(value, child, numbers)
+    elif isinstance(value, list):
+        for index in range(len(value)):
+            yield from _text_leaves(value, index, numbers)
+    elif numbers and isinstance(value, int) and not isinstance(value, bool):
+        yield container, key
+
+
+def _iter_jsonl(lines: Iterator[str]) -> Iterator[Row]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"JSONL line {number} is not an object")
+        yield row
+
+
+class DatasetWriter:
+    """
+    Writes row batches in the input format. The CSV header comes from the first batch; the
+    Parquet schema should be passed in (see parquet_schema) and is otherwise inferred from it.
+    """
+
+    def __init__(self, output: BinaryIO, fmt: str, schema=None):
+        self.output = output
+        self.fmt = fmt
+        self.schema = schema
+        self._text: Optional[io.TextIOWrapper] = None
+        self._csv: Optional[csv.DictWriter] = None
+        self._parquet = None
+        if fmt == "parquet":
+            _require_pyarrow()
+        else:
+            self._text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+
+    def write(self, rows: List[Row]) -> None:
+        if not rows:
+            return
+        if self.fmt == "parquet":
+            table = pa.Table.from_pylist(rows, schema=self.schema)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.output, self.schema or table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        elif self.fmt == "csv":
+            if self._csv is None:
+                self._csv = csv.DictWriter(self._text, fieldnames=list(rows[0].keys()), extrasaction="ignore")
+                self._csv.writeheader()
+            self._csv.writerows(rows)
+        else:
+            for row in rows:
+                self._text.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._text is not None:
+            self._text.flush()
+            self._text.detach()
+
+
+class DatasetProcessor:
+    """
+    Column-aware redaction of tabular data. Every text cell of every column is scanned
+    unless the caller lists the column in `skip_columns`, including strings nested in
+    dict/list values (JSONL objects, Parquet structs and lists). Numeric-looking cells
+    (card numbers, SSNs, phone numbers in CSV) still get the regex pass, only NER is
+    skipped for them by the scanner's pre-filter; JSONL integers are scanned the same way
+    and become strings when redacted. Other non-string values (floats, booleans, Parquet
+    numeric columns, whose type must not change) are not scanned. Every batch goes
+    through Scanner.scan_many (one NER batch, one regex pass).
+    """
+
+    def __init__(self, scanner, embedder=None, batch_rows: int = DATASET_BATCH_ROWS):
+        self.scanner = scanner
+        self.embedder = embedder
+        self.batch_rows = max(1, batch_rows)
+
+    def classify_columns(self, rows: Sequence[Row], columns: Optional[Sequence[str]] = None,
+                         skip_columns: Sequence[str] = ()) -> List[str]:
+        """Columns of this batch to scan: the explicit `columns`, or every column seen, minus `skip_columns`."""
+        if columns:
+            return [c for c in columns if c not in skip_columns]
+        names: List[str] = []
+        for row in rows:
+            names.extend(k for k in row if k not in names and k not in skip_columns)
+        return names
+
+    def redact_batch(self, rows: List[Row], columns: Sequence[str], labels: Optional[List[str]] = None,
+                     stats: Optional[Dict[str, Any]] = None, scan_numbers: bool = False) -> List[Row]:
+        """Redacts the given columns in place; with `scan_numbers`, integer cells are scanned too."""
+        cells = [(col, container, key) for row in rows for col in columns if col in row
+                 for container, key in _text_leaves(row, col, scan_numbers)]
+        if not cells:
+            return rows
+        texts = [str(container[key]) for _, container, key in cells]
+        with span("dataset_scan"):
+            per_cell = self.scanner.scan_many(texts, labels=labels)
+        for (col, container, key), text, findings in zip(cells, texts, per_cell):
+            if findings:
+                container[key] = self.scanner.redact(text, findings)
+                if stats is not None:
+                    stats["findings"][col] = stats["findings"].get(col, 0) + len(findings)
+        return rows
+
+    def embed_batch(self, rows: List[Row], column: str, privacy_engine: PrivacyEngine) -> None:
+        """Adds `<column>_vector` with the noised embedding of the (already redacted) column."""
+        target = f"{column}_vector"
+        texts = [row for row in rows if isinstance(row.get(column), str) and row[column].strip()]
+        for row in rows:
+            row[target] = None
+        with span("dataset_embed"):
+            vectors = self.embedder.get_vectors([row[column] for row in texts]) if texts else []
+        for row, vector in zip(texts, vectors):
+            row[target] = privacy_engine.add_noise(np.asarray(vector)).tolist()
+
+    def process(self, source: BinaryIO, output: BinaryIO, fmt: str, epsilon: float = 1.0,
+                columns: Optional[Sequence[str]] = None, skip_columns: Sequence[str] = (),
+                embed_column: Optional[str] = None, labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        if embed_column and self.embedder is None:
+            raise ValueError("embed_column requires an embedder")
+        privacy_engine = PrivacyEngine(target_epsilon=epsilon)
+        schema = None
+        if fmt == "parquet":
+            schema = parquet_schema(source, f"{embed_column}_vector" if embed_column else None)
+        writer = DatasetWriter(output, fmt, schema)
+        stats: Dict[str, Any] = {"format": fmt, "rows": 0, "batches": 0, "findings": {}}
+        scanned: List[str] = []
+        try:
+            for rows in iter_batches(source, fmt, self.batch_rows):
+                # Per batch: JSONL rows may introduce new keys anywhere in the file.
+                scan_columns = self.classify_columns(rows, columns, skip_columns)
+                scanned.extend(c for c in scan_columns if c not in scanned)
+                self.redact_batch(rows, scan_columns, labels, stats, scan_numbers=fmt == "jsonl")
+                if embed_column:
+                    self.embed_batch(rows, embed_column, privacy_engine)
+                    if fmt == "csv":  # CSV cells hold the vector as a JSON array
+                        for row in rows:
+                            row[f"{embed_column}_vector"] = json.dumps(row[f"{embed_column}_vector"])
+                writer.write(rows)
+                stats["rows"] += len(rows)
+                stats["batches"] += 1
+        finally:
+            writer.close()
+        stats["scanned_columns"] = scanned
+        return stats
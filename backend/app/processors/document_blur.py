@@ -4,15 +4,17 @@ from __future__ import annotations
 import os
 import tempfile
 from pathlib import Path
-from typing import Any, Dict, List, Sequence
+from typing import Any, Dict, List, Optional, Sequence
 
 import fitz  # type: ignore[import-not-found]
 from PIL import Image, ImageFilter  # type: ignore[import-not-found]
 
-from app.config import DATA_DIR, UPLOAD_DIR
+from app.config import DATA_DIR, UPLOAD_DIR, PII_COMBINED_DESCRIPTION
 from app.processors.base import BaseProcessor
-from app.ner.pii_image_extractor import PIIImageExtractor, PIIExtractionResult
+from app.ner.pii_image_extractor import PIIImageExtractor, PIIExtractionResult, PIIExtractionWithSummary
 from app.core.scanner import Scanner
+from app.core.metrics import span, count_error
+from app.utils.vision_payload import VisionPayload, prepare_vision_payload
 
 DEFAULT_EPSILON = 1.0
 DEFAULT_TEST_PDF = Path(DATA_DIR) / "test_data" / "sample.pdf"
@@ -24,10 +26,13 @@ class DocumentProcessorBlur(BaseProcessor):
 
     SAFE_PREFIX = "blurred"
 
-    def __init__(self, gliner_scanner: Scanner, scale: int = 2, blur_radius: int = 10):
+    def __init__(self, gliner_scanner: Scanner, scale: int = 2, blur_radius: int = 10,
+                 combined: bool = PII_COMBINED_DESCRIPTION):
         self.gliner_scanner = gliner_scanner
         self.scale = scale
         self.blur_radius = blur_radius
+        # When set, the PII call also returns the page summary and no description payload is prepared.
+        self.combined = combined
         self.pii_extractor = PIIImageExtractor()
 
     def process(self, input_data: Any, epsilon: float) -> Dict[str, Any]:  # noqa: ARG002
@@ -42,14 +47,23 @@ class DocumentProcessorBlur(BaseProcessor):
         doc = fitz.open(str(source_path))
 
         processed_images: List[Image.Image] = []
+        page_payloads: List[Optional[VisionPayload]] = []
+        page_descriptions: List[Optional[str]] = []
         unsafe_words: List[str] = []
 
         try:
             for page_index in range(len(doc)):
                 page = doc[page_index]
 
-                unsafe_page_words: PIIExtractionResult = self.find_unsafe_words(page)
-                additional_findings = self.rescan_page_text(page)
+                # Rendered once: the same pixels feed PII extraction, blurring and the description payload.
+                with span("page_render"):
+                    pix = page.get_pixmap(matrix=fitz.Matrix(self.scale, self.scale))
+                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+                with span("pii_extract"):
+                    unsafe_page_words: PIIExtractionResult = self.find_unsafe_words(page, img)
+                with span("ner_rescan"):
+                    additional_findings = self.rescan_page_text(page)
 
                 page_word_list = list(unsafe_page_words.tolist())
                 additional_values = [value for finding in additional_findings for value in finding.values()]
@@ -58,21 +72,32 @@ class DocumentProcessorBlur(BaseProcessor):
                 self._extend_unique(unsafe_words, page_word_list)
                 self._extend_unique(unsafe_words, additional_values)
 
-                pix = page.get_pixmap(matrix=fitz.Matrix(self.scale, self.scale))
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-                for rect in self.get_bboxes(page, page_word_list):
-                    self._blur_rect(img, rect)
-
+                with span("page_blur"):
+                    for rect in self.get_bboxes(page, page_word_list):
+                        self._blur_rect(img, rect)
+
+                # A usable combined summary replaces the description call for this page.
+                description = None
+                if isinstance(unsafe_page_words, PIIExtractionWithSummary):
+                    description = unsafe_page_words.redacted_summary(page_word_list) or None
+                page_descriptions.append(description)
+                if description is None:
+                    with span("vision_prepare"):
+                        page_payloads.append(prepare_vision_payload(img))
+                else:
+                    page_payloads.append(None)
                 processed_images.append(img)
         finally:
             doc.close()
 
-        self._write_pdf(processed_images, output_path)
+        with span("pdf_write"):
+            self._write_pdf(processed_images, output_path)
 
         return {
             "safe_pdf_path": str(output_path),
             "unsafe_words": unsafe_words,
+            "page_payloads": page_payloads,
+            "page_descriptions": page_descriptions,
         }
 
     def rescan_page_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
@@ -84,10 +109,14 @@ class DocumentProcessorBlur(BaseProcessor):
             return [{f['label']: f['text']} for f in findings]
         except Exception as e:
             print(f'[DocumentProcessorBlur] Error rescanning page {page.number}: {e}')
+            count_error("document_rescan")
             return []
 
-    def find_unsafe_words(self, page: fitz.Page) -> PIIExtractionResult:
-        """Mock rule set for unsafe content discovery."""
+    def find_unsafe_words(self, page: fitz.Page, image: Optional[Image.Image] = None) -> PIIExtractionResult:
+        """Mock rule set for unsafe content discovery; renders the page unless `image` is given."""
+        if image is not None:
+            return self._extract_pii(prepare_vision_payload(image))
+
         matrix = fitz.Matrix(self.scale, self.scale)
         pix = page.get_pixmap(matrix=matrix)
         mode = "RGBA" if pix.alpha else "RGB"
@@ -96,10 +125,15 @@ class DocumentProcessorBlur(BaseProcessor):
             image = image.convert("RGB")
 
         try:
-            return self.pii_extractor.extract_from_file(image)
+            return self._extract_pii(image)
         finally:
             image.close()
 
+    def _extract_pii(self, image: Any) -> PIIExtractionResult:
+        if self.combined:
+            return self.pii_extractor.extract_with_summary(image)
+        return self.pii_extractor.extract_from_file(image)
+
     def get_bboxes(self, page: fitz.Page, unsafe_words: Sequence[str]) -> List[fitz.Rect]:
         boxes: List[fitz.Rect] = []
         seen: set[str] = set()
@@ -4,9 +4,16 @@ from app.config import (
     DEFAULT_TEST_IMAGE,
     DEFAULT_BLURRED_OUTPUT,
     FACE_CONFIDENCE_THRESHOLD,
-    FACE_BLUR_KERNEL_SIZE
+    FACE_BLUR_KERNEL_SIZE,
+    FACE_DETECTION_MAX_SIDE,
+    FACE_BOX_PADDING,
+    FACE_TILING_ENABLED,
+    FACE_TILE_TRIGGER_SIDE,
+    FACE_TILE_SIZE,
+    FACE_TILE_OVERLAP
 )
 from download_models import download_model
+from app.core.metrics import span
 import cv2 as cv
 import numpy as np
 import os
@@ -44,7 +51,9 @@ class FaceDetection:
     def __init__(self, model_path=FACE_DETECTION_MODEL_PATH,
                  conf_threshold=FACE_CONFIDENCE_THRESHOLD,
                  nms_threshold=0.3, top_k=5000,
-                 backend_target_idx=0):
+                 backend_target_idx=0,
+                 max_side=FACE_DETECTION_MAX_SIDE,
+                 tiling=FACE_TILING_ENABLED):
 
         backend_target_pairs = [
             [cv.dnn.DNN_BACKEND_OPENCV, cv.dnn.DNN_TARGET_CPU],
@@ -57,6 +66,10 @@ class FaceDetection:
         backend_id = backend_target_pairs[backend_target_idx][0]
         target_id = backend_target_pairs[backend_target_idx][1]
 
+        self.max_side = max_side
+        self.tiling = tiling
+        self.nms_threshold = nms_threshold
+
         download_model(model_path)
         self.detector = YuNet(modelPath=model_path,
                               inputSize=[320, 320],
@@ -73,25 +86,84 @@ class FaceDetection:
         if image is None:
             print(f"Error: Could not read image at {image_path}")
             return None
-
-        h, w, _ = image.shape
-        self.detector.setInputSize([w, h])
-        results = self.detector.infer(image)
-
+        return self.blur_array(image, blur_kernel)
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """
+        Returns face boxes as rows of [x, y, w, h, score] in full-resolution pixels.
+        Detection runs on a downscaled proxy (and optionally on tiles), so the
+        cost stays roughly constant regardless of the input resolution.
+        """
+        h, w = image.shape[:2]
+        if self.tiling and max(h, w) > FACE_TILE_TRIGGER_SIDE:
+            return self._detect_tiled(image)
+        return self._detect_proxy(image)
+
+    def _detect_proxy(self, image: np.ndarray) -> np.ndarray:
+        h, w = image.shape[:2]
+        scale = 1.0
+        proxy = image
+        if self.max_side and max(h, w) > self.max_side:
+            scale = self.max_side / max(h, w)
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            proxy = cv.resize(image, size, interpolation=cv.INTER_AREA)
+
+        ph, pw = proxy.shape[:2]
+        self.detector.setInputSize([pw, ph])
+        with span("face_detect"):
+            results = self.detector.infer(proxy)
+        if len(results) == 0:
+            return np.empty((0, 5), dtype=np.float32)
+
+        boxes = np.hstack([results[:, 0:4] / scale, results[:, 14:15]]).astype(np.float32)
+        if scale < 1.0:
+            # Proxy boxes are coarse after upscaling; grow them so no face edge is missed.
+            pad_x = boxes[:, 2] * FACE_BOX_PADDING
+            pad_y = boxes[:, 3] * FACE_BOX_PADDING
+            boxes[:, 0] -= pad_x
+            boxes[:, 1] -= pad_y
+            boxes[:, 2] += 2 * pad_x
+            boxes[:, 3] += 2 * pad_y
+        return boxes
+
+    def _detect_tiled(self, image: np.ndarray) -> np.ndarray:
+        h, w = image.shape[:2]
+        stride = max(1, int(FACE_TILE_SIZE * (1 - FACE_TILE_OVERLAP)))
+        # The whole-image pass catches faces larger than a tile.
+        found = [self._detect_proxy(image)]
+        for y in range(0, max(h - FACE_TILE_SIZE, 0) + stride, stride):
+            for x in range(0, max(w - FACE_TILE_SIZE, 0) + stride, stride):
+                tile = image[y:y + FACE_TILE_SIZE, x:x + FACE_TILE_SIZE]
+                boxes = self._detect_proxy(tile)
+                boxes[:, 0] += x
+                boxes[:, 1] += y
+                found.append(boxes)
+
+        boxes = np.vstack(found)
+        if len(boxes) == 0:
+            return boxes
+        keep = cv.dnn.NMSBoxes(boxes[:, 0:4].tolist(), boxes[:, 4].tolist(), 0.0, self.nms_threshold)
+        return boxes[np.array(keep, dtype=np.int64).reshape(-1)]
+
+    def blur_array(self, image: np.ndarray, blur_kernel=(FACE_BLUR_KERNEL_SIZE, FACE_BLUR_KERNEL_SIZE)):
+        """Blurs faces in an already decoded BGR image; the input is left untouched."""
+        return self.blur_boxes(image, self.detect(image), blur_kernel)
+
+    @staticmethod
+    def blur_boxes(image: np.ndarray, boxes: np.ndarray, blur_kernel=(FACE_BLUR_KERNEL_SIZE, FACE_BLUR_KERNEL_SIZE)):
+        """Returns a copy of the image with every [x, y, w, h, ...] box blurred."""
+        h, w = image.shape[:2]
         blurred_image = image.copy()
-        for det in results:
-            bbox = det[0:4].astype(np.int32)
+        for det in boxes:
+            bx, by, bw, bh = det[0:4].astype(np.int32)
             # Ensure bbox is within image boundaries
-            bx, by, bw, bh = bbox
-            bx = max(0, bx)
-            by = max(0, by)
-            bw = min(bw, w - bx)
-            bh = min(bh, h - by)
-
-            if bw > 0 and bh > 0:
-                roi = blurred_image[by:by+bh, bx:bx+bw]
+            x0, y0 = max(0, bx), max(0, by)
+            x1, y1 = min(w, bx + bw), min(h, by + bh)
+
+            if x1 > x0 and y1 > y0:
+                roi = blurred_image[y0:y1, x0:x1]
                 roi = cv.GaussianBlur(roi, blur_kernel, 0)
-                blurred_image[by:by+bh, bx:bx+bw] = roi
+                blurred_image[y0:y1, x0:x1] = roi
 
         return blurred_image
 
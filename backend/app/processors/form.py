@@ -17,9 +17,12 @@ class FormProcessor(BaseProcessor):
         audit_log = []
         combined_text_for_vector = ""
 
-        for key, value in input_data.items():
-            str_value = str(value)
-            findings = self.scanner.scan(str_value)
+        keys = list(input_data.keys())
+        values = [str(value) for value in input_data.values()]
+        # All fields share one GLiNER batch and one regex pass.
+        per_field = self.scanner.scan_many(values)
+
+        for key, str_value, findings in zip(keys, values, per_field):
             safe_value = self.scanner.redact(str_value, findings)
             safe_data[key] = safe_value
 
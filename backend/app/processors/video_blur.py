@@ -0,0 +1,222 @@
+"""Video face blurring: YuNet on keyframes, IoU tracking in between, threaded encoding."""
+
+from __future__ import annotations
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import av
+import cv2 as cv
+import numpy as np
+
+from app.config import (
+    VIDEO_DETECTION_INTERVAL,
+    VIDEO_TRACK_IOU_THRESHOLD,
+    VIDEO_TRACK_MAX_MISSES,
+    VIDEO_TRACK_PADDING,
+    VIDEO_FRAME_QUEUE_SIZE,
+    VIDEO_OUTPUT_CODEC
+)
+from app.core.metrics import span, count_error
+from app.processors.face_blur import FaceDetection
+from app.utils.audio_tools import mux_audio
+
+_END_OF_STREAM = None
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """IoU of two [x, y, w, h] boxes."""
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+class _Track:
+    __slots__ = ("box", "velocity", "frame", "misses")
+
+    def __init__(self, box: np.ndarray, frame: int):
+        self.box = box.astype(np.float32)
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.frame = frame
+        self.misses = 0
+
+    def at(self, frame: int) -> np.ndarray:
+        moved = self.box.copy()
+        moved[0:2] += self.velocity * (frame - self.frame)
+        return moved
+
+
+class FaceTracker:
+    """
+    Propagates keyframe detections to the frames in between.
+    Tracks are matched greedily by IoU and extrapolated with constant velocity.
+    """
+
+    def __init__(self, iou_threshold: float = VIDEO_TRACK_IOU_THRESHOLD,
+                 max_misses: int = VIDEO_TRACK_MAX_MISSES,
+                 padding: float = VIDEO_TRACK_PADDING):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.padding = padding
+        self.tracks: List[_Track] = []
+
+    def update(self, detections: np.ndarray, frame: int) -> None:
+        unmatched = list(range(len(detections)))
+        for track in self.tracks:
+            predicted = track.at(frame)
+            best, best_iou = None, self.iou_threshold
+            for i in unmatched:
+                iou = box_iou(predicted, detections[i][0:4])
+                if iou >= best_iou:
+                    best, best_iou = i, iou
+            if best is None:
+                track.misses += 1
+                continue
+
+            new_box = detections[best][0:4].astype(np.float32)
+            elapsed = max(frame - track.frame, 1)
+            track.velocity = (new_box[0:2] - track.box[0:2]) / elapsed
+            track.box, track.frame, track.misses = new_box, frame, 0
+            unmatched.remove(best)
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        self.tracks.extend(_Track(detections[i][0:4], frame) for i in unmatched)
+
+    def boxes_at(self, frame: int) -> np.ndarray:
+        if not self.tracks:
+            return np.empty((0, 4), dtype=np.float32)
+        boxes = np.stack([t.at(frame) for t in self.tracks])
+        pad = boxes[:, 2:4] * self.padding
+        boxes[:, 0:2] -= pad
+        boxes[:, 2:4] += 2 * pad
+        return boxes
+
+
+class VideoFaceBlur:
+    """
+    Streams a video through detection, tracking and blurring with a bounded frame queue.
+    Frames between keyframes wait for the next keyframe: its detections are interpolated
+    back over them, so a face that enters between keyframes is blurred from its first frame.
+    """
+
+    def __init__(self, detection_interval: int = VIDEO_DETECTION_INTERVAL,
+                 detector_factory: Callable[[], FaceDetection] = FaceDetection,
+                 queue_size: int = VIDEO_FRAME_QUEUE_SIZE):
+        self.detection_interval = max(1, detection_interval)
+        self.detector_factory = detector_factory
+        self.queue_size = queue_size
+
+    def _encode_loop(self, frames: "queue.Queue[Optional[np.ndarray]]", writer: cv.VideoWriter,
+                     errors: List[BaseException]) -> None:
+        try:
+            while True:
+                frame = frames.get()
+                if frame is _END_OF_STREAM:
+                    return
+                writer.write(frame)
+        except BaseException as e:  # surfaced to the caller after join
+            errors.append(e)
+            # Keep draining so the producer never blocks on a full queue.
+            while frames.get() is not _END_OF_STREAM:
+                pass
+
+    def process(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Writes the blurred video to output_path. `audio` in the result is "copied", "none" or "dropped"."""
+        video_path = f"{output_path}.video.mp4"
+        try:
+            result = self._blur(input_path, video_path)
+            result["audio"] = self._add_audio(input_path, video_path, output_path)
+        finally:
+            if os.path.exists(video_path):
+                os.remove(video_path)
+        return result
+
+    def _add_audio(self, input_path: str, video_path: str, output_path: str) -> str:
+        # OpenCV writes video only; the audio track is copied over from the source.
+        try:
+            if mux_audio(input_path, video_path, output_path):
+                return "copied"
+            status = "none"
+        except av.error.FFmpegError as e:
+            print(f"[VIDEO ERROR]: audio track not copied: {e}")
+            count_error("video_audio")
+            status = "dropped"
+        os.replace(video_path, output_path)
+        return status
+
+    def _blur(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        capture = cv.VideoCapture(input_path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video: {input_path}")
+
+        fps = capture.get(cv.CAP_PROP_FPS) or 25.0
+        width = int(capture.get(cv.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv.CAP_PROP_FRAME_HEIGHT))
+        writer = cv.VideoWriter(output_path, cv.VideoWriter_fourcc(*VIDEO_OUTPUT_CODEC), fps, (width, height))
+        if not writer.isOpened():
+            capture.release()
+            raise RuntimeError(f"Could not open video writer for {output_path}")
+
+        # One detector per video: cv.FaceDetectorYN must not be shared across threads.
+        detector = self.detector_factory()
+        tracker = FaceTracker()
+        frames: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=self.queue_size)
+        errors: List[BaseException] = []
+        encoder = threading.Thread(target=self._encode_loop, args=(frames, writer, errors), daemon=True)
+        encoder.start()
+
+        frame_index = 0
+        keyframes = 0
+        max_faces = 0
+        held: List[Tuple[int, np.ndarray]] = []  # frames since the last keyframe
+
+        def emit(frame: np.ndarray, boxes: np.ndarray, extra: Optional[np.ndarray] = None) -> None:
+            nonlocal max_faces
+            max_faces = max(max_faces, len(boxes))
+            if extra is not None and len(extra):
+                boxes = np.concatenate([boxes, extra])
+            frames.put(FaceDetection.blur_boxes(frame, boxes))
+
+        try:
+            with span("video_blur"):
+                while not errors:
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    if frame_index % self.detection_interval == 0:
+                        extrapolated = [tracker.boxes_at(i) for i, _ in held]
+                        tracker.update(detector.detect(frame), frame_index)
+                        keyframes += 1
+                        # Held frames get both the old extrapolation and the tracks as updated
+                        # now: interpolated for matched faces, in place for new ones.
+                        for (i, held_frame), before in zip(held, extrapolated):
+                            emit(held_frame, tracker.boxes_at(i), before)
+                        held.clear()
+                        emit(frame, tracker.boxes_at(frame_index))
+                    else:
+                        held.append((frame_index, frame))
+                    frame_index += 1
+                for i, held_frame in held:
+                    if errors:
+                        break
+                    emit(held_frame, tracker.boxes_at(i))
+        finally:
+            frames.put(_END_OF_STREAM)
+            encoder.join()
+            capture.release()
+            writer.release()
+
+        if errors:
+            raise RuntimeError(f"Video encoding failed: {errors[0]}")
+
+        return {
+            "frames": frame_index,
+            "keyframes": keyframes,
+            "fps": fps,
+            "width": width,
+            "height": height,
+            "max_faces_per_frame": max_faces,
+        }
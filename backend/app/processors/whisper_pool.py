@@ -0,0 +1,135 @@
+"""LRU pool of Whisper models of different sizes, bounded by an approximate memory budget."""
+
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from app.config import (
+    WHISPER_MODEL_SIZE,
+    WHISPER_MODEL_SIZES,
+    WHISPER_MODEL_MEMORY_MB,
+    WHISPER_POOL_MEMORY_MB,
+    WHISPER_AUTO_DURATION_TIERS,
+    WHISPER_DOWNGRADE_ACTIVE_REQUESTS,
+    AUDIO_PARALLEL_WORKERS
+)
+from app.core.metrics import metrics, count_cache_hit
+
+
+# Pool key of the parallel transcriber (a process pool holding one size) for that size.
+PARALLEL_PREFIX = "parallel:"
+
+
+class WhisperModelPool:
+    """
+    Loads models on first use and keeps them resident while they fit the budget.
+    The least recently used model is evicted first; pinned sizes and the requested one never are.
+    Eviction only drops the pool's reference, so a request still holding a model finishes normally.
+
+    The parallel transcriber is one more entry, charged `parallel_workers` copies of its size.
+    At most one is kept; evicting it shuts its processes down once no transcription uses them.
+    """
+
+    def __init__(self, loader: Callable[[str], Any],
+                 memory_budget_mb: int = WHISPER_POOL_MEMORY_MB,
+                 model_memory_mb: Optional[Dict[str, int]] = None,
+                 pinned: Sequence[str] = (),
+                 parallel_loader: Optional[Callable[[str], Any]] = None,
+                 parallel_workers: int = AUDIO_PARALLEL_WORKERS):
+        self.loader = loader
+        self.parallel_loader = parallel_loader
+        self.parallel_workers = max(1, parallel_workers)
+        self.pinned = set(pinned)
+        self.memory_budget_mb = memory_budget_mb
+        self.model_memory_mb = model_memory_mb or WHISPER_MODEL_MEMORY_MB
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._memory: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _size_mb(self, size: str) -> int:
+        if size not in self.model_memory_mb:
+            raise ValueError(f"Unknown Whisper model size: {size}")
+        return self.model_memory_mb[size]
+
+    def get(self, size: str) -> Any:
+        return self._get(size, size, self._size_mb(size), self.loader)
+
+    def get_parallel(self, size: str) -> Any:
+        """The parallel transcriber for `size`; one of another size is shut down first."""
+        memory_mb = self._size_mb(size) * self.parallel_workers
+        return self._get(PARALLEL_PREFIX + size, size, memory_mb, self.parallel_loader)
+
+    def _get(self, key: str, size: str, memory_mb: int, loader: Callable[[str], Any]) -> Any:
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                count_cache_hit(f"whisper-{key}")
+                return self._models[key]
+
+            if key.startswith(PARALLEL_PREFIX):
+                for other in [k for k in self._models if k.startswith(PARALLEL_PREFIX)]:
+                    self._evict(other)
+            self._evict_for(memory_mb)
+            print(f"Loading Whisper Audio Model ({key})...")
+            model = loader(size)
+            self._models[key] = model
+            self._memory[key] = memory_mb
+            metrics.set_gauge("whisper_pool_memory_mb", self.memory_used_mb())
+            return model
+
+    def _evict_for(self, needed_mb: int) -> None:
+        evictable = [key for key in self._models if key not in self.pinned]
+        while evictable and self.memory_used_mb() + needed_mb > self.memory_budget_mb:
+            self._evict(evictable.pop(0))
+
+    def _evict(self, key: str) -> None:
+        model = self._models.pop(key)
+        del self._memory[key]
+        if key.startswith(PARALLEL_PREFIX):
+            model.close()
+        print(f"Evicting Whisper model ({key}) from pool")
+        metrics.inc("whisper_pool_evictions_total", {"model": key})
+        metrics.set_gauge("whisper_pool_memory_mb", self.memory_used_mb())
+
+    def close(self) -> None:
+        """Shuts the parallel transcriber down (registered atexit); in-process models need nothing."""
+        with self._lock:
+            for key in [k for k in self._models if k.startswith(PARALLEL_PREFIX)]:
+                self._evict(key)
+
+    def memory_used_mb(self) -> int:
+        return sum(self._memory.values())
+
+    def loaded(self) -> Sequence[str]:
+        return list(self._models)
+
+
+def downgrade(size: str, steps: int, sizes: Sequence[str] = WHISPER_MODEL_SIZES) -> str:
+    """Moves `steps` sizes towards the fastest model."""
+    return sizes[max(0, sizes.index(size) - steps)]
+
+
+def choose_model_size(requested: Optional[str], duration: Optional[float] = None,
+                      active_requests: int = 0) -> str:
+    """
+    Resolves a requested size. Explicit sizes are honoured as-is; "auto" picks by
+    audio duration and then sheds load by downgrading one size per
+    WHISPER_DOWNGRADE_ACTIVE_REQUESTS transcriptions already in flight.
+    """
+    if not requested:
+        return WHISPER_MODEL_SIZE
+    if requested != "auto":
+        if requested not in WHISPER_MODEL_SIZES:
+            raise ValueError(f"Unknown Whisper model size: {requested}")
+        return requested
+
+    size = WHISPER_MODEL_SIZES[0]
+    if duration is None:
+        size = WHISPER_MODEL_SIZE
+    else:
+        for max_seconds, tier_size in WHISPER_AUTO_DURATION_TIERS:
+            if duration <= max_seconds:
+                size = tier_size
+                break
+    return downgrade(size, active_requests // WHISPER_DOWNGRADE_ACTIVE_REQUESTS)
@@ -0,0 +1,129 @@
+import heapq
+import wave
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+import av
+import numpy as np
+from app.config import AUDIO_SAMPLE_RATE, AUDIO_SPLIT_SEARCH_SECONDS, AUDIO_SPLIT_FRAME_MS
+
+PCM_DTYPE = np.int16
+_CHUNK_SAMPLES = 1 << 20  # ~1M samples (2 MB) per read/write
+
+
+def decode_to_pcm_file(source: Union[str, BinaryIO], pcm_path: str, sample_rate: int = AUDIO_SAMPLE_RATE) -> int:
+    """
+    Decodes any ffmpeg-readable input into a raw mono int16 file, frame by frame.
+    Memory use is independent of the input length. Returns the number of samples.
+    """
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+    total = 0
+    with av.open(source, mode="r", metadata_errors="ignore") as container, open(pcm_path, "wb") as out:
+        def write(frames) -> None:
+            nonlocal total
+            for resampled in frames:
+                samples = resampled.to_ndarray().reshape(-1)
+                out.write(samples.tobytes())
+                total += samples.size
+
+        for frame in container.decode(audio=0):
+            frame.pts = None  # let the resampler generate continuous timestamps
+            write(resampler.resample(frame))
+        write(resampler.resample(None))
+    return total
+
+
+def probe_duration(source: Union[str, BinaryIO]) -> Optional[float]:
+    """Container duration in seconds from the header, or None if unknown. File-likes are rewound."""
+    try:
+        with av.open(source, mode="r", metadata_errors="ignore") as container:
+            if container.duration is None:
+                return None
+            return container.duration / av.time_base
+    except av.error.FFmpegError:
+        return None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+def _packet_time(packet: av.Packet) -> float:
+    return float(packet.dts * packet.time_base) if packet.dts is not None else float("inf")
+
+
+def mux_audio(source_path: str, video_path: str, output_path: str) -> bool:
+    """
+    Writes the video of `video_path` plus the first audio track of `source_path` into
+    `output_path`, copying packets without re-encoding. Returns False, writing nothing,
+    if the source has no audio. Raises av.error.FFmpegError if the output container
+    cannot hold the audio codec.
+    """
+    with av.open(source_path, mode="r", metadata_errors="ignore") as source:
+        if not source.streams.audio:
+            return False
+        with av.open(video_path, mode="r") as video, av.open(output_path, mode="w") as out:
+            in_video, in_audio = video.streams.video[0], source.streams.audio[0]
+            out_streams = {"video": out.add_stream_from_template(in_video),
+                           "audio": out.add_stream_from_template(in_audio)}
+            for packet in heapq.merge(video.demux(in_video), source.demux(in_audio), key=_packet_time):
+                if packet.dts is None:  # demuxer flush packet
+                    continue
+                packet.stream = out_streams[packet.stream.type]
+                out.mux(packet)
+    return True
+
+
+def open_pcm(pcm_path: str, n_samples: int, writable: bool = False) -> np.memmap:
+    return np.memmap(pcm_path, dtype=PCM_DTYPE, mode="r+" if writable else "r", shape=(n_samples,))
+
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """int16 PCM -> float32 in [-1, 1), the format Whisper expects."""
+    return samples.astype(np.float32) / 32768.0
+
+
+def iter_windows(n_samples: int, window_samples: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, n_samples, window_samples):
+        yield start, min(start + window_samples, n_samples)
+
+
+def split_on_silence(pcm: np.ndarray, window_samples: int,
+                     sample_rate: int = AUDIO_SAMPLE_RATE,
+                     search_seconds: float = AUDIO_SPLIT_SEARCH_SECONDS,
+                     frame_ms: int = AUDIO_SPLIT_FRAME_MS) -> List[Tuple[int, int]]:
+    """
+    Splits PCM into windows of roughly window_samples, moving each cut to the
+    lowest-energy frame within +/- search_seconds so words are not cut in half.
+    Only the search regions are read, which keeps memory-mapped inputs cheap.
+    """
+    n_samples = len(pcm)
+    if n_samples <= window_samples:
+        return [(0, n_samples)] if n_samples else []
+
+    frame = max(1, sample_rate * frame_ms // 1000)
+    search = int(search_seconds * sample_rate)
+    cuts = [0]
+    target = window_samples
+    while target < n_samples - frame:
+        lo = max(cuts[-1] + frame, target - search)
+        hi = min(n_samples, target + search)
+        region = pcm[lo:hi].astype(np.float32)
+        n_frames = len(region) // frame
+        if n_frames == 0:
+            cut = target
+        else:
+            energy = np.square(region[:n_frames * frame]).reshape(n_frames, frame).mean(axis=1)
+            cut = lo + int(np.argmin(energy)) * frame + frame // 2
+        cuts.append(cut)
+        target = cut + window_samples
+    cuts.append(n_samples)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def write_wav(pcm: np.ndarray, output: Union[str, BinaryIO], sample_rate: int = AUDIO_SAMPLE_RATE) -> None:
+    """Streams an int16 (memory-mapped) buffer into a mono WAV file chunk by chunk."""
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(np.dtype(PCM_DTYPE).itemsize)
+        wav.setframerate(sample_rate)
+        for start, end in iter_windows(len(pcm), _CHUNK_SAMPLES):
+            wav.writeframes(np.ascontiguousarray(pcm[start:end]).tobytes())
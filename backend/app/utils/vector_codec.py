@@ -0,0 +1,91 @@
+"""Compact wire encodings for the vectors in API responses."""
+
+import base64
+import math
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from app.config import VECTOR_ENCODINGS, VECTOR_ENCODING_DEFAULT
+
+EncodedVector = Union[List[float], Dict[str, Any]]
+
+_DTYPES = {"f32": "<f4", "f16": "<f2", "int8": "i1"}
+
+# Set once per request by the API layer; the pipeline encodes with whatever the client asked for.
+_request_encoding: ContextVar[str] = ContextVar("vector_encoding", default=VECTOR_ENCODING_DEFAULT)
+
+
+def set_request_encoding(encoding: str) -> None:
+    _request_encoding.set(encoding)
+
+
+def negotiate_encoding(query_value: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """
+    ?vector_encoding= wins over a `vector-encoding` parameter in the Accept header.
+    Raises ValueError for an unknown encoding.
+    """
+    encoding = query_value
+    if not encoding and accept:
+        for media_range in accept.split(","):
+            for param in media_range.split(";")[1:]:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "vector-encoding":
+                    encoding = value.strip().strip('"')
+                    break
+            if encoding:
+                break
+    encoding = (encoding or VECTOR_ENCODING_DEFAULT).lower()
+    if encoding not in VECTOR_ENCODINGS:
+        raise ValueError(f"Unknown vector encoding: {encoding} (expected one of {', '.join(VECTOR_ENCODINGS)})")
+    return encoding
+
+
+def encode_vector(vector: Optional[np.ndarray], encoding: Optional[str] = None) -> EncodedVector:
+    """
+    json -> [floats]; f32/f16 -> {"encoding", "dim", "data"}; int8 -> the same plus "scale",
+    where value = int8 * scale (symmetric quantization).
+    """
+    if vector is None:
+        return []
+    encoding = encoding or _request_encoding.get()
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    if encoding == "json":
+        return vector.tolist()
+
+    payload: Dict[str, Any] = {"encoding": encoding, "dim": int(vector.shape[0])}
+    if encoding == "int8":
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        data = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        payload["scale"] = scale
+    else:
+        data = vector.astype(_DTYPES[encoding])
+    payload["data"] = base64.b64encode(data.tobytes()).decode("ascii")
+    return payload
+
+
+def decode_vector(payload: EncodedVector) -> np.ndarray:
+    """Inverse of encode_vector; accepts a plain float list too."""
+    if isinstance(payload, dict):
+        encoding = payload.get("encoding")
+        if encoding not in _DTYPES:
+            raise ValueError(f"Unknown vector encoding: {encoding}")
+        try:
+            raw = base64.b64decode(payload["data"], validate=True)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Encoded vector needs base64 'data'")
+        dtype = np.dtype(_DTYPES[encoding])
+        if len(raw) % dtype.itemsize:
+            raise ValueError("Encoded vector data has a partial element")
+        vector = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+        if encoding == "int8":
+            scale = payload.get("scale", 1.0)
+            if isinstance(scale, bool) or not isinstance(scale, (int, float)) or not math.isfinite(scale):
+                raise ValueError("Encoded int8 vector needs a numeric 'scale'")
+            vector = vector * np.float32(scale)
+        return vector
+    if not isinstance(payload, list) or not all(isinstance(v, (int, float)) for v in payload):
+        raise ValueError("vector must be a list of numbers or an encoded vector object")
+    return np.asarray(payload, dtype=np.float32)
@@ -0,0 +1,71 @@
+"""One preparation stage for every image sent to the Ollama vision model."""
+
+import base64
+import os
+from pathlib import Path
+from typing import NamedTuple, Union
+
+import cv2 as cv
+import numpy as np
+from PIL import Image
+
+from app.config import VISION_INPUT_MAX_SIDE, VISION_IMAGE_FORMAT, VISION_IMAGE_QUALITY
+from app.core.metrics import metrics
+
+_ENCODERS = {
+    "jpeg": (".jpg", "image/jpeg", cv.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv.IMWRITE_WEBP_QUALITY),
+}
+
+
+class VisionPayload(NamedTuple):
+    image: np.ndarray  # downscaled BGR pixels that were encoded (also what the description cache hashes)
+    data: str  # base64 of the encoded image, ready for the "images" field
+    mime: str
+    nbytes: int
+
+
+ImageSource = Union[np.ndarray, Image.Image, bytes, str, Path, VisionPayload]
+
+
+def _to_bgr(image) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return cv.cvtColor(image, cv.COLOR_GRAY2BGR)
+        return image[:, :, :3] if image.shape[2] == 4 else image
+    if isinstance(image, Image.Image):
+        return cv.cvtColor(np.asarray(image.convert("RGB")), cv.COLOR_RGB2BGR)
+    if hasattr(image, "samples"):  # fitz.Pixmap: RGB(A) rows
+        pixels = np.frombuffer(image.samples, np.uint8).reshape(image.height, image.width, image.n)
+        return cv.cvtColor(pixels[:, :, :3], cv.COLOR_RGB2BGR)
+    if isinstance(image, (str, Path, os.PathLike)):
+        decoded = cv.imread(str(image), cv.IMREAD_COLOR)
+    else:
+        decoded = cv.imdecode(np.frombuffer(image, np.uint8), cv.IMREAD_COLOR)
+    if decoded is None:
+        raise ValueError("Could not decode image for the vision model")
+    return decoded
+
+
+def prepare_vision_payload(image: ImageSource, max_side: int = VISION_INPUT_MAX_SIDE,
+                           fmt: str = VISION_IMAGE_FORMAT, quality: int = VISION_IMAGE_QUALITY) -> VisionPayload:
+    """
+    Downscales to the model's input size and encodes once; callers reuse the result for
+    every request about the same pixels. A VisionPayload is returned unchanged.
+    """
+    if isinstance(image, VisionPayload):
+        return image
+    pixels = _to_bgr(image)
+    height, width = pixels.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        pixels = cv.resize(pixels, size, interpolation=cv.INTER_AREA)
+
+    ext, mime, quality_flag = _ENCODERS.get(fmt, _ENCODERS["jpeg"])
+    ok, buffer = cv.imencode(ext, pixels, [quality_flag, quality])
+    if not ok:
+        raise ValueError(f"Could not encode image as {fmt}")
+    metrics.inc("vision_payloads_total", {"format": fmt})
+    metrics.inc("vision_payload_bytes_total", {"format": fmt}, value=float(buffer.size))
+    return VisionPayload(pixels, base64.b64encode(buffer.tobytes()).decode("ascii"), mime, int(buffer.size))
@@ -1,4 +1,5 @@
 import os
+import sys
 import urllib.request
 from gliner import GLiNER
 
@@ -6,6 +7,10 @@ from app.config import (DATA_DIR,
                         NER_MODEL_NAME,
                         GLINER_MODEL_NAME,
                         GLINER_LOCAL_DIR,
+                        GLINER_ONNX_DIR,
+                        NER_RUNTIME,
+                        NER_ONNX_QUANTIZED,
+                        NER_ONNX_MODEL_FILE,
                         FACE_DETECTION_MODEL_PATH,
                         FACE_DETECTION_MODEL_DIR,
                         FACE_DETECTION_MODEL_NAME)
@@ -25,6 +30,24 @@ def download_gliner():
     print(f"✅ Model saved to: {model_path}")
 
 
+def export_gliner_onnx(quantize: bool = NER_ONNX_QUANTIZED):
+    onnx_dir = os.path.join(DATA_DIR, "models", GLINER_ONNX_DIR)
+    if os.path.exists(os.path.join(onnx_dir, NER_ONNX_MODEL_FILE)):
+        print(f"✅ GLiNER ONNX model already exported at: {onnx_dir}")
+        return
+
+    download_gliner()
+    model_path = os.path.join(DATA_DIR, "models", GLINER_LOCAL_DIR)
+    print(f"⏳ Exporting GLiNER to ONNX (quantize={quantize})...")
+    try:
+        model = GLiNER.from_pretrained(model_path, local_files_only=True)
+        paths = model.export_to_onnx(onnx_dir, quantize=quantize)
+        print(f"✅ ONNX model saved to: {paths.get('quantized_path') or paths.get('onnx_path')}")
+    except ImportError as e:
+        # The server cannot start with NER_RUNTIME=onnx without the export, so fail the setup step.
+        sys.exit(f"Error exporting GLiNER to ONNX ({e}). Install the extra (`poetry install -E onnx`) and retry.")
+
+
 def download_model(model_path: str = FACE_DETECTION_MODEL_PATH):
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
     if os.path.exists(model_path):
@@ -42,4 +65,6 @@ def download_model(model_path: str = FACE_DETECTION_MODEL_PATH):
 
 if __name__ == "__main__":
     download_gliner()
+    if NER_RUNTIME == "onnx" or "--onnx" in sys.argv:
+        export_gliner_onnx()
     download_model()
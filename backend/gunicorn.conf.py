@@ -0,0 +1,87 @@
+"""
+Production server settings: `gunicorn -c gunicorn.conf.py`.
+
+The app is imported once in the master (preload_app) and workers are forked
+afterwards, sharing the GLiNER and YuNet weights copy-on-write. Nothing that
+holds threads or file handles exists in the master: torch runs single-threaded
+there, and Whisper (CTranslate2 starts its threads on load), the metrics flush
+thread, the Ollama scheduler state and the vector-store handles are created in
+each worker by main.start_worker() from post_fork. With NER_RUNTIME=onnx the
+ONNX Runtime session starts its thread pool on load, so the app is imported in
+each worker instead and every worker holds its own copy.
+
+Send HUP for a graceful worker restart, or USR2 followed by WINCH/QUIT on the
+old master to roll out new code with zero downtime.
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+# Many gthread threads share one GLiNER copy per worker: batch their NER chunks.
+os.environ.setdefault("NER_MICRO_BATCHING", "true")
+# Workers write their metrics here and /metrics merges them (see app.core.metrics).
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "safe-data-metrics"))
+# Ollama lane limits are shared by all workers through lock files here (see app.core.ollama_scheduler).
+os.environ.setdefault("OLLAMA_SLOT_DIR", os.path.join(tempfile.gettempdir(), "safe-data-ollama-slots"))
+# Whisper, threads and file handles are created per worker in post_fork (main.start_worker).
+os.environ["WORKER_DEFERRED_START"] = "true"
+
+import torch
+
+# No torch thread pool may exist in the master when it forks; post_fork sizes each worker's.
+torch.set_num_threads(1)
+
+from app.config import (
+    HOST,
+    PORT,
+    SERVER_PROFILE,
+    SERVER_PROFILES,
+    GUNICORN_WORKERS,
+    GUNICORN_THREADS,
+    GRACEFUL_TIMEOUT_SECONDS,
+    WORKER_MAX_REQUESTS,
+    WORKER_MAX_REQUESTS_JITTER,
+    WORKER_TORCH_THREADS,
+    METRICS_MULTIPROC_DIR,
+    NER_RUNTIME,
+)
+
+_profile = SERVER_PROFILES.get(SERVER_PROFILE, SERVER_PROFILES["all"])
+
+wsgi_app = "wsgi:app"
+bind = f"{HOST}:{PORT}"
+preload_app = NER_RUNTIME != "onnx"
+worker_class = "gthread"
+workers = GUNICORN_WORKERS or _profile["workers"]
+threads = GUNICORN_THREADS or _profile["threads"]
+timeout = _profile["timeout"]
+graceful_timeout = GRACEFUL_TIMEOUT_SECONDS
+max_requests = WORKER_MAX_REQUESTS
+max_requests_jitter = WORKER_MAX_REQUESTS_JITTER
+accesslog = "-"
+
+
+def on_starting(server):
+    # Counters restart with the master; drop series left behind by a previous run.
+    shutil.rmtree(METRICS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation so
+    # the cyclic GC never touches (and thereby un-shares) those pages in workers.
+    gc.freeze()
+    server.log.info(f"Serving; profile={SERVER_PROFILE} preload={preload_app} workers={workers} threads={threads}")
+
+
+def post_fork(server, worker):
+    torch.set_num_threads(WORKER_TORCH_THREADS)
+    # Without preload this is also where the worker imports the app.
+    from main import start_worker
+    start_worker()
+
+
+def child_exit(server, worker):
+    from app.core.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
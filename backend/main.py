@@ -1,10 +1,23 @@
 import os
+import time
 
-from flask import Flask, jsonify
+import numpy as np
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 
-from app.api.routes import api
-from app.config import UPLOAD_DIR
+from app.api.routes import api, pipeline
+from app.config import UPLOAD_DIR, TIMING_HEADER_ENABLED, HOST, PORT, DEBUG
+from app.core.circuit_breaker import start_request_degradation
+from app.core.metrics import (
+    metrics,
+    count_error,
+    start_request_timing,
+    get_request_timings,
+    format_timing_header,
+    timing_requested,
+    start_worker_metrics,
+)
+from app.core.ollama_scheduler import scheduler
 
 
 def create_app() -> Flask:
@@ -13,10 +26,32 @@ def create_app() -> Flask:
     CORS(
         app,
         resources={r"/*": {"origins": "*"}},
-        expose_headers=["X-Privacy-Metadata", "X-Metadata", "X-Document-Metadata"],
+        expose_headers=["X-Privacy-Metadata", "X-Metadata", "X-Document-Metadata", "X-Timing"],
     )
     app.register_blueprint(api, url_prefix="")
 
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        start_request_timing()
+        start_request_degradation()
+
+    @app.after_request
+    def record_timing(response):
+        start = g.pop("request_start", None)
+        if start is None:
+            return response
+
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe("request_duration_seconds", elapsed, {"endpoint": endpoint, "method": request.method})
+        if response.status_code >= 500:
+            count_error(f"http:{endpoint}")
+
+        if TIMING_HEADER_ENABLED or timing_requested(request.headers.get("X-Timing")):
+            response.headers["X-Timing"] = format_timing_header(get_request_timings(), elapsed)
+        return response
+
     @app.route("/status", methods=["GET"])
     def system_status():
         return jsonify({"status": "ok", "message": "Backend is online"})
@@ -25,7 +60,21 @@ def create_app() -> Flask:
     return app
 
 
+def start_worker() -> None:
+    """
+    Called in each gunicorn worker right after the fork (WORKER_DEFERRED_START): creates
+    the threads, locks, file handles and models that must not be inherited from the master.
+    """
+    # Forked workers inherit the master's RNG state; without a reseed every
+    # worker would draw the same Laplace noise sequence.
+    np.random.seed()
+    start_worker_metrics()
+    scheduler.reset()
+    pipeline.start_worker()
+
+
 if __name__ == "__main__":
     flask_app = create_app()
-    print("Safe-Data Backend running on port 8000")
-    flask_app.run(host="0.0.0.0", port=8000, debug=True)
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py`.
+    print(f"Safe-Data Backend running on port {PORT}")
+    flask_app.run(host=HOST, port=PORT, debug=DEBUG)
@@ -0,0 +1,47 @@
+"""
+Redacts a CSV/JSONL/Parquet dataset from the command line, in constant memory.
+
+    poetry run python redact_dataset.py export.csv export_redacted.csv
+    poetry run python redact_dataset.py events.jsonl out.jsonl --columns message,notes --embed-column message
+"""
+import argparse
+import json
+
+from app.config import DATASET_BATCH_ROWS
+from app.core.scanner import Scanner
+from app.processors.dataset import DatasetProcessor, detect_format
+
+
+def _columns(value: str):
+    return [c.strip() for c in value.split(",") if c.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrub PII from a CSV/JSONL/Parquet dataset.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--format", help="csv, jsonl or parquet (default: from the input extension)")
+    parser.add_argument("--columns", type=_columns, help="comma-separated columns to scan (default: all)")
+    parser.add_argument("--skip-columns", type=_columns, default=[], help="comma-separated columns to pass through")
+    parser.add_argument("--embed-column", help="add a noised embedding of this column as <column>_vector")
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--batch-rows", type=int, default=DATASET_BATCH_ROWS)
+    args = parser.parse_args()
+
+    embedder = None
+    if args.embed_column:
+        from app.core.embedder import Embedder
+        embedder = Embedder()
+
+    fmt = args.format or detect_format(args.input)
+    processor = DatasetProcessor(Scanner(), embedder, batch_rows=args.batch_rows)
+    with open(args.input, "rb") as source, open(args.output, "wb") as output:
+        stats = processor.process(
+            source, output, fmt, args.epsilon,
+            columns=args.columns, skip_columns=args.skip_columns, embed_column=args.embed_column
+        )
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
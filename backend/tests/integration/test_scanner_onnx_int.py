@@ -0,0 +1,58 @@
+import os
+import pytest
+from unittest.mock import patch
+from gliner import GLiNER
+from app.config import GLINER_ONNX_DIR
+from app.core.scanner import Scanner
+
+
+SAMPLES = [
+    "Elon Musk lives in Texas and works at SpaceX.",
+    "Please contact Maria Garcia at maria.garcia@example.com or +1 415 555 0199.",
+    "Patient John Doe, born 12/04/1985, lives at 221B Baker Street, London.",
+]
+
+
+def _spans(findings):
+    return sorted((f["start"], f["end"], f["text"], f["label"]) for f in findings)
+
+
+class TestScannerOnnxIntegration:
+    """
+    Parity between the PyTorch and the int8 ONNX Runtime GLiNER backends.
+    Loads the REAL model, exports it to ONNX (requires the 'onnx' package) and builds the
+    second Scanner through its NER_RUNTIME=onnx path.
+    """
+
+    @pytest.fixture(scope="class")
+    def scanners(self, tmp_path_factory):
+        pytest.importorskip("onnx")
+        cached = Scanner._model_instance
+        Scanner._model_instance = None
+        torch_scanner = Scanner()
+
+        data_dir = tmp_path_factory.mktemp("data")
+        onnx_dir = os.path.join(data_dir, "models", GLINER_ONNX_DIR)
+        os.makedirs(onnx_dir)
+        paths = torch_scanner.ner_model.export_to_onnx(onnx_dir, quantize=True)
+
+        Scanner._model_instance = None
+        with patch("app.core.scanner.NER_RUNTIME", "onnx"), \
+             patch("app.core.scanner.DATA_DIR", str(data_dir)), \
+             patch("app.core.scanner.NER_ONNX_MODEL_FILE", os.path.basename(paths["quantized_path"])), \
+             patch("app.core.scanner.GLiNER.from_pretrained", wraps=GLiNER.from_pretrained) as load:
+            onnx_scanner = Scanner()
+        assert load.call_args.kwargs["load_onnx_model"] is True
+
+        yield torch_scanner, onnx_scanner
+        Scanner._model_instance = cached
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    def test_findings_match_pytorch(self, scanners, text):
+        """
+        Scenario: The same text is scanned by both backends.
+        Expectation: Exactly the same spans with the same labels; only scores may differ.
+        """
+        torch_scanner, onnx_scanner = scanners
+
+        assert _spans(onnx_scanner.scan(text)) == _spans(torch_scanner.scan(text))
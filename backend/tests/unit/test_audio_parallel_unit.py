@@ -0,0 +1,98 @@
+import numpy as np
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+from app.processors.audio import AudioProcessor
+from app.processors.audio_parallel import ParallelTranscriber
+from app.utils.audio_tools import open_pcm, split_on_silence
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class TestAudioParallelUnit:
+
+    def test_split_on_silence_cuts_in_quiet_region(self):
+        """
+        Scenario: 10 s of tone with a 0.5 s silence at 4.0-4.5 s, target window 5 s.
+        Expectation: The cut moves back into the silence instead of landing mid-tone.
+        """
+        rate = 1000
+        pcm = np.full(10 * rate, 8000, dtype=np.int16)
+        pcm[4000:4500] = 0
+
+        windows = split_on_silence(pcm, 5 * rate, sample_rate=rate, search_seconds=2, frame_ms=50)
+
+        assert windows[0][0] == 0 and windows[-1][1] == len(pcm)
+        assert 4000 <= windows[0][1] <= 4500
+        assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+
+    def test_split_on_silence_short_input_is_one_window(self):
+        assert split_on_silence(np.zeros(100, dtype=np.int16), 1000) == [(0, 100)]
+        assert split_on_silence(np.zeros(0, dtype=np.int16), 1000) == []
+
+    def test_transcribe_stitches_windows_in_order(self, tmp_path):
+        """Segments come back in window order even if workers finish out of order."""
+        path = str(tmp_path / "audio.pcm")
+        np.zeros(1000, dtype=np.int16).tofile(path)
+        pcm = open_pcm(path, 1000)
+
+        pool = MagicMock()
+        pool.submit.side_effect = lambda fn, p, n, start, end, words: _done([{"start": float(start), "text": f"w{start}"}])
+        transcriber = ParallelTranscriber(workers=2)
+
+        with patch.object(transcriber, "_get_pool", return_value=pool), \
+             patch("app.processors.audio_parallel.split_on_silence", return_value=[(0, 400), (400, 1000)]):
+            segments = transcriber.transcribe(pcm)
+
+        assert [s["text"] for s in segments] == ["w0", "w400"]
+        submitted = [c.args for c in pool.submit.call_args_list]
+        assert submitted[0][1] == path and submitted[1][3:5] == (400, 1000)
+
+    def test_window_samples_respects_bounds(self):
+        with patch("app.processors.audio_parallel.AUDIO_PARALLEL_MIN_WINDOW_SECONDS", 1), \
+             patch("app.processors.audio_parallel.AUDIO_TRANSCRIBE_WINDOW_SECONDS", 10), \
+             patch("app.processors.audio_parallel.AUDIO_SAMPLE_RATE", 100):
+            transcriber = ParallelTranscriber(workers=4)
+            assert transcriber.window_samples(2000) == 501
+            assert transcriber.window_samples(100) == 100
+            assert transcriber.window_samples(100000) == 1000
+
+    def test_parallel_path_does_not_load_a_model_in_this_process(self, tmp_path):
+        path = str(tmp_path / "audio.pcm")
+        np.zeros(1000, dtype=np.int16).tofile(path)
+        processor = AudioProcessor.__new__(AudioProcessor)
+        processor.model, processor.pool = MagicMock(), MagicMock()
+        processor.pool.get_parallel.return_value.transcribe.return_value = [{"text": "hi"}]
+
+        with patch("app.processors.audio.AUDIO_PARALLEL_WORKERS", 2), \
+             patch("app.processors.audio.AUDIO_PARALLEL_MIN_SECONDS", 0):
+            segments = processor.transcribe_pcm(open_pcm(path, 1000), model_size="medium")
+
+        assert segments == [{"text": "hi"}]
+        processor.pool.get_parallel.assert_called_once_with("medium")
+        processor.pool.get.assert_not_called()
+
+    def test_close_waits_for_the_running_transcription(self, tmp_path):
+        """
+        Scenario: The pool evicts the transcriber while a transcription is still collecting results.
+        Expectation: The processes are stopped only after that transcription finishes.
+        """
+        path = str(tmp_path / "audio.pcm")
+        np.zeros(1000, dtype=np.int16).tofile(path)
+        transcriber = ParallelTranscriber(workers=2)
+        pool = MagicMock()
+
+        def submit(*args):
+            transcriber.close()
+            pool.shutdown.assert_not_called()
+            return _done([])
+
+        pool.submit.side_effect = submit
+        transcriber._pool = pool
+        with patch("app.processors.audio_parallel.split_on_silence", return_value=[(0, 1000)]):
+            transcriber.transcribe(open_pcm(path, 1000))
+
+        pool.shutdown.assert_called_once_with(wait=False)
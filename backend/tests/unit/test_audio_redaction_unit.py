@@ -0,0 +1,77 @@
+import io
+import wave
+import numpy as np
+import pytest
+from app.processors.audio_redaction import AudioRedactor
+from app.utils.audio_tools import decode_to_pcm_file, open_pcm, write_wav
+
+
+SEGMENTS = [
+    {"start": 0.0, "end": 2.0, "text": " Hi, I am John Doe.", "words": [
+        {"word": " Hi,", "start": 0.0, "end": 0.3},
+        {"word": " I", "start": 0.3, "end": 0.4},
+        {"word": " am", "start": 0.4, "end": 0.6},
+        {"word": " John", "start": 0.6, "end": 1.0},
+        {"word": " Doe.", "start": 1.0, "end": 1.4},
+    ]},
+    {"start": 2.0, "end": 4.0, "text": " Call me later.", "words": []},
+]
+
+
+class TestAudioRedactionUnit:
+
+    def test_finding_maps_to_word_times(self):
+        """
+        Scenario: 'John Doe' found at characters 11-19 of the joined transcript.
+        Expectation: One range from John's start to Doe's end, padded.
+        """
+        redactor = AudioRedactor(padding=0.1)
+        text = " ".join(seg["text"] for seg in SEGMENTS)
+        start = text.index("John Doe")
+        ranges = redactor.time_ranges(SEGMENTS, [{"start": start, "end": start + 8}])
+        assert ranges == [(pytest.approx(0.5), pytest.approx(1.5))]
+
+    def test_unaligned_finding_falls_back_to_segment(self):
+        """Without word timestamps the whole containing segment is redacted."""
+        redactor = AudioRedactor(padding=0.0)
+        text = " ".join(seg["text"] for seg in SEGMENTS)
+        start = text.index("later")
+        assert redactor.time_ranges(SEGMENTS, [{"start": start, "end": start + 5}]) == [(2.0, 4.0)]
+
+    def test_merge_overlapping_ranges(self):
+        assert AudioRedactor.merge([(1.0, 2.0), (-0.5, 0.5), (1.5, 3.0)]) == [(0.0, 0.5), (1.0, 3.0)]
+
+    def test_apply_mutes_and_bleeps_memmap(self, tmp_path):
+        """Only the requested sample range of the memory-mapped buffer is overwritten."""
+        path = str(tmp_path / "audio.pcm")
+        np.full(100, 1000, dtype=np.int16).tofile(path)
+        pcm = open_pcm(path, 100, writable=True)
+
+        AudioRedactor(mode="mute", sample_rate=100).apply(pcm, [(0.1, 0.2)])
+        assert np.all(pcm[10:20] == 0)
+        assert np.all(pcm[:10] == 1000) and np.all(pcm[20:] == 1000)
+
+        AudioRedactor(mode="bleep", sample_rate=100).apply(pcm, [(0.5, 0.6)])
+        assert not np.all(pcm[50:60] == 1000)
+        assert np.all(np.fromfile(path, dtype=np.int16)[50:60] == pcm[50:60])
+
+    def test_decode_and_write_roundtrip(self, tmp_path):
+        """A WAV decodes into a raw PCM file and writes back with the same sample count."""
+        source = io.BytesIO()
+        with wave.open(source, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(np.arange(16000, dtype=np.int16).tobytes())
+        source.seek(0)
+
+        pcm_path = str(tmp_path / "decoded.pcm")
+        n_samples = decode_to_pcm_file(source, pcm_path)
+        assert n_samples == 16000
+
+        output = io.BytesIO()
+        write_wav(open_pcm(pcm_path, n_samples), output)
+        output.seek(0)
+        with wave.open(output, "rb") as wav:
+            assert wav.getnframes() == 16000
+            assert wav.getframerate() == 16000
@@ -0,0 +1,126 @@
+import io
+import json
+import threading
+import zipfile
+import cv2 as cv
+import numpy as np
+from unittest.mock import MagicMock
+from app.processors.batch_blur import BatchFaceBlur, iter_zip_images, MANIFEST_NAME
+from app.processors.face_blur import FaceDetection
+
+
+def _png_bytes(w=40, h=30):
+    _, buffer = cv.imencode('.png', np.full((h, w, 3), 128, dtype=np.uint8))
+    return buffer.tobytes()
+
+
+class TestBatchBlurUnit:
+
+    def _fake_detector(self, created):
+        detector = MagicMock()
+        detector.detect.return_value = np.array([[5, 5, 10, 10, 0.9]], dtype=np.float32)
+        detector.blur_boxes.side_effect = FaceDetection.blur_boxes
+        created.append(threading.get_ident())
+        return detector
+
+    def test_process_writes_images_and_manifest(self):
+        """
+        Scenario: Two valid images and one corrupt file.
+        Expectation: Two blurred images plus a manifest that reports the failure.
+        """
+        created = []
+        batch = BatchFaceBlur(max_workers=2, detector_factory=lambda: self._fake_detector(created))
+        images = [("a.png", _png_bytes()), ("dir/b.jpg", _png_bytes()), ("broken.png", b"not an image")]
+
+        output = io.BytesIO()
+        manifest = batch.process(iter(images), output)
+
+        with zipfile.ZipFile(io.BytesIO(output.getvalue())) as zf:
+            names = set(zf.namelist())
+            stored_manifest = json.loads(zf.read(MANIFEST_NAME))
+
+        assert names == {"a.png", "b.jpg", MANIFEST_NAME}
+        assert len(manifest) == 3
+        assert sorted(entry["status"] for entry in stored_manifest) == ["error", "ok", "ok"]
+        assert all(entry["faces"] == 1 for entry in manifest if entry["status"] == "ok")
+
+    def test_detector_reused_per_thread(self):
+        """Each worker thread builds at most one detector, however many images it handles."""
+        created = []
+        batch = BatchFaceBlur(max_workers=2, detector_factory=lambda: self._fake_detector(created))
+        images = [(f"img_{i}.png", _png_bytes()) for i in range(12)]
+
+        batch.process(iter(images), io.BytesIO())
+
+        assert 1 <= len(created) <= 2
+        assert len(set(created)) == len(created)
+
+    def test_pool_and_detectors_outlive_a_request(self):
+        created = []
+        batch = BatchFaceBlur(max_workers=1, detector_factory=lambda: self._fake_detector(created))
+
+        batch.process(iter([("a.png", _png_bytes())]), io.BytesIO())
+        batch.process(iter([("b.png", _png_bytes())]), io.BytesIO())
+
+        assert len(created) == 1
+
+    def test_clashing_output_names_are_suffixed(self):
+        """
+        Scenario: a.png and a.PNG, the same upload name twice, and an image named like the manifest.
+        Expectation: Every image gets its own zip entry and the manifest points at it.
+        """
+        created = []
+        batch = BatchFaceBlur(max_workers=2, detector_factory=lambda: self._fake_detector(created))
+        images = [("a.png", _png_bytes()), ("a.PNG", _png_bytes()), ("a.png", _png_bytes()),
+                  ("manifest.json.png", _png_bytes())]
+
+        output = io.BytesIO()
+        manifest = batch.process(iter(images), output)
+
+        with zipfile.ZipFile(io.BytesIO(output.getvalue())) as zf:
+            names = zf.namelist()
+
+        assert len(names) == len(set(name.lower() for name in names)) == 5
+        assert sorted(entry["output"] for entry in manifest) == sorted(n for n in names if n != MANIFEST_NAME)
+
+    def test_member_paths_are_flattened(self):
+        """
+        Scenario: Members named with `../`, an absolute path, a Windows path and a subfolder.
+        Expectation: Only file names reach the zip and the manifest; the clash is suffixed.
+        """
+        batch = BatchFaceBlur(max_workers=1, detector_factory=lambda: self._fake_detector([]))
+        images = [("../../evil.png", _png_bytes()), ("/etc/cron.png", _png_bytes()),
+                  ("..\\win.png", _png_bytes()), ("photos/evil.png", _png_bytes())]
+
+        output = io.BytesIO()
+        manifest = batch.process(iter(images), output)
+
+        with zipfile.ZipFile(io.BytesIO(output.getvalue())) as zf:
+            names = zf.namelist()
+
+        assert sorted(names) == sorted(["evil.png", "evil-2.png", "cron.png", "win.png", MANIFEST_NAME])
+        assert sorted(entry["output"] for entry in manifest) == sorted(n for n in names if n != MANIFEST_NAME)
+
+    def test_oversized_zip_members_are_not_read(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("small.png", _png_bytes())
+            zf.writestr("bomb.png", bytes(10_000))
+        archive.seek(0)
+
+        images = list(iter_zip_images(archive, max_bytes=5_000))
+        manifest = BatchFaceBlur(max_workers=1, detector_factory=lambda: self._fake_detector([])).process(
+            iter(images), io.BytesIO())
+
+        assert [(name, data is None) for name, data in images] == [("small.png", False), ("bomb.png", True)]
+        assert {entry["file"]: entry["status"] for entry in manifest} == {"small.png": "ok", "bomb.png": "error"}
+
+    def test_iter_zip_images_filters_members(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("photos/one.JPG", b"x")
+            zf.writestr("notes.txt", b"y")
+            zf.writestr("photos/.hidden.png", b"z")
+        archive.seek(0)
+
+        assert [name for name, _ in iter_zip_images(archive)] == ["photos/one.JPG"]
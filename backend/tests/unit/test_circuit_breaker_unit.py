@@ -0,0 +1,182 @@
+import time
+import numpy as np
+import pytest
+import requests
+from unittest.mock import patch
+from app.core.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ModelUnavailableError,
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    get_degraded,
+    start_request_degradation
+)
+from app.core.embedder import Embedder
+from app.core.metrics import metrics
+from app.core.vision import VisionEngine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(breaker):
+    with pytest.raises(requests.ConnectionError):
+        with breaker.guard():
+            raise requests.ConnectionError("refused")
+
+
+class TestCircuitBreakerUnit:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def breaker(self, clock):
+        return CircuitBreaker("test", failure_threshold=3, cooldown=10, clock=clock)
+
+    def test_opens_after_consecutive_failures(self, breaker):
+        fail(breaker)
+        fail(breaker)
+        assert breaker.state == CLOSED
+
+        fail(breaker)
+
+        assert breaker.state == OPEN
+        assert metrics.get_gauge("circuit_breaker_state", {"breaker": "test"}) == 2
+        with pytest.raises(CircuitOpenError) as excinfo:
+            breaker.before_call()
+        assert excinfo.value.retry_after == pytest.approx(10)
+
+    def test_success_resets_the_failure_count(self, breaker):
+        fail(breaker)
+        fail(breaker)
+        with breaker.guard():
+            pass
+        fail(breaker)
+
+        assert breaker.state == CLOSED
+
+    def test_non_transport_errors_do_not_count(self, breaker):
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                with breaker.guard():
+                    raise ValueError("malformed model answer")
+
+        assert breaker.state == CLOSED
+
+    def test_other_errors_are_not_counted_as_success(self, breaker):
+        """
+        Scenario: Two failures, then a call interrupted by a non-transport error, then a third failure.
+        Expectation: The interruption did not reset the count, so the breaker opens.
+        """
+        fail(breaker)
+        fail(breaker)
+        with pytest.raises(KeyboardInterrupt):
+            with breaker.guard():
+                raise KeyboardInterrupt
+        fail(breaker)
+
+        assert breaker.state == OPEN
+
+    def test_interrupted_probe_keeps_the_breaker_half_open(self, breaker, clock):
+        for _ in range(3):
+            fail(breaker)
+        clock.now = 10.0
+
+        with pytest.raises(ValueError):
+            with breaker.guard():
+                raise ValueError("malformed model answer")
+
+        assert breaker.state == HALF_OPEN
+        breaker.before_call()  # the next caller may probe
+
+    def test_gauge_turns_half_open_without_a_call(self):
+        breaker = CircuitBreaker("passive", failure_threshold=1, cooldown=0.05)
+        fail(breaker)
+        assert metrics.get_gauge("circuit_breaker_state", {"breaker": "passive"}) == 2
+
+        deadline = time.monotonic() + 2
+        while metrics.get_gauge("circuit_breaker_state", {"breaker": "passive"}) != 1:
+            assert time.monotonic() < deadline, "gauge never left open"
+            time.sleep(0.01)
+
+    def test_half_open_allows_a_single_probe(self, breaker, clock):
+        """
+        Scenario: Breaker open, cooldown elapses, probe in flight, second caller arrives.
+        Expectation: Second caller is rejected; a successful probe closes the breaker.
+        """
+        for _ in range(3):
+            fail(breaker)
+        clock.now = 10.0
+        assert breaker.state == HALF_OPEN
+
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens_for_another_cooldown(self, breaker, clock):
+        for _ in range(3):
+            fail(breaker)
+        clock.now = 10.0
+
+        fail(breaker)
+
+        assert breaker.state == OPEN
+        clock.now = 19.0
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+
+class TestModelClientFailureModesUnit:
+
+    @pytest.fixture
+    def embedder(self):
+        embedder = Embedder()
+        embedder.breaker = CircuitBreaker("embedder-test", failure_threshold=2, cooldown=60)
+        return embedder
+
+    @patch('app.core.embedder.requests.post')
+    def test_open_breaker_skips_the_host(self, mock_post, embedder):
+        mock_post.side_effect = requests.ConnectionError("refused")
+        start_request_degradation()
+
+        for _ in range(5):
+            vector = embedder.get_vector("hello")
+
+        assert mock_post.call_count == 2
+        assert np.all(vector == 0)
+        assert get_degraded() == ["embedder"]
+
+    @patch('app.core.embedder.OLLAMA_FAILURE_MODE', "fail")
+    @patch('app.core.embedder.requests.post')
+    def test_fail_mode_raises_model_unavailable(self, mock_post, embedder):
+        mock_post.side_effect = requests.ConnectionError("refused")
+
+        with pytest.raises(ModelUnavailableError):
+            embedder.get_vector("hello")
+        with pytest.raises(ModelUnavailableError):
+            embedder.get_vector("hello")
+        with pytest.raises(CircuitOpenError) as excinfo:
+            embedder.get_vector("hello")
+        assert excinfo.value.component == "embedder-test"
+
+    @patch('app.core.vision.requests.post')
+    def test_vision_marks_the_request_degraded(self, mock_post):
+        engine = VisionEngine()
+        engine.breaker = CircuitBreaker("vision-test")
+        mock_post.side_effect = requests.Timeout("read timeout")
+        start_request_degradation()
+
+        assert engine.describe_image(b"data") == "Error generating image description."
+        assert get_degraded() == ["vision"]
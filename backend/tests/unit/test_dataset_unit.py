@@ -0,0 +1,141 @@
+import io
+import json
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from app.processors.dataset import DatasetProcessor, detect_format, iter_batches
+
+
+def _regex_scanner():
+    """Scanner stand-in that flags every '@' token as an email."""
+    scanner = MagicMock()
+
+    def scan_many(values, labels=None):
+        results = []
+        for value in values:
+            start = value.find("@")
+            results.append([] if start < 0 else [{"text": value, "label": "email", "start": 0, "end": len(value)}])
+        return results
+
+    scanner.scan_many.side_effect = scan_many
+    scanner.redact.side_effect = lambda text, findings: "<EMAIL>"
+    return scanner
+
+
+class TestDatasetUnit:
+
+    def test_detect_format(self):
+        assert detect_format("export.CSV") == "csv"
+        assert detect_format("events.ndjson") == "jsonl"
+        with pytest.raises(ValueError):
+            detect_format("data.xlsx")
+
+    def test_classify_columns_only_skips_requested_columns(self):
+        processor = DatasetProcessor(MagicMock())
+        rows = [
+            {"user_id": "a1", "age": "42", "email": "a@b.com"},
+            {"user_id": "a2", "age": "37", "email": "", "note": "12"},
+        ]
+        assert processor.classify_columns(rows) == ["user_id", "age", "email", "note"]
+        assert processor.classify_columns(rows, skip_columns=["user_id"]) == ["age", "email", "note"]
+        assert processor.classify_columns(rows, columns=["note", "age"], skip_columns=["age"]) == ["note"]
+
+    def test_numeric_csv_cells_are_still_scanned(self):
+        """
+        Scenario: A CSV column of digit-only card numbers, then free text in a later batch.
+        Expectation: Every cell of both columns reaches the scanner; nothing is passed through unscanned.
+        """
+        source = io.BytesIO(b"card,note\n4111111111111111,12\n5500000000000004,call a@b.com\n")
+        scanner = _regex_scanner()
+
+        stats = DatasetProcessor(scanner, batch_rows=1).process(source, io.BytesIO(), "csv")
+
+        scanned = [value for call in scanner.scan_many.call_args_list for value in call.args[0]]
+        assert scanned == ["4111111111111111", "12", "5500000000000004", "call a@b.com"]
+        assert stats["scanned_columns"] == ["card", "note"]
+
+    def test_jsonl_line_that_is_not_an_object_is_rejected(self):
+        source = io.BytesIO(b'{"a": 1}\n[1, 2]\n')
+
+        with pytest.raises(ValueError, match="line 2"):
+            list(iter_batches(source, "jsonl"))
+
+    def test_csv_is_redacted_in_batches(self):
+        """
+        Scenario: 5 CSV rows with a batch size of 2.
+        Expectation: 3 batches, one scan_many call each; only the email column changes.
+        """
+        source = io.BytesIO(("id,email,city\n" + "".join(f"{i},user{i}@x.com,Paris\n" for i in range(5))).encode())
+        output = io.BytesIO()
+        scanner = _regex_scanner()
+
+        stats = DatasetProcessor(scanner, batch_rows=2).process(source, output, "csv")
+
+        assert stats["rows"] == 5 and stats["batches"] == 3
+        assert stats["findings"] == {"email": 5}
+        assert scanner.scan_many.call_count == 3
+        lines = output.getvalue().decode().splitlines()
+        assert lines[0] == "id,email,city"
+        assert lines[1] == "0,<EMAIL>,Paris"
+
+    def test_jsonl_with_embedded_column(self):
+        source = io.BytesIO(b'{"id": 1, "msg": "mail me at a@b.com"}\n{"id": 2, "msg": ""}\n')
+        output = io.BytesIO()
+        embedder = MagicMock()
+        embedder.get_vectors.side_effect = lambda texts: [np.zeros(3, dtype=np.float32) for _ in texts]
+
+        DatasetProcessor(_regex_scanner(), embedder).process(source, output, "jsonl", embed_column="msg")
+
+        rows = [json.loads(line) for line in output.getvalue().decode().splitlines()]
+        assert rows[0]["msg"] == "<EMAIL>"
+        assert len(rows[0]["msg_vector"]) == 3
+        assert rows[1]["msg_vector"] is None
+        embedder.get_vectors.assert_called_once_with(["<EMAIL>"])
+
+    def test_nested_jsonl_values_are_scanned(self):
+        """
+        Scenario: JSONL rows with the email inside an object, inside a list, and an integer phone number.
+        Expectation: Every string and integer leaf reaches the scanner; findings are redacted in place.
+        """
+        source = io.BytesIO(b'{"user": {"name": "Ann", "email": "a@b.com"}, "tags": ["x", "c@d.org"], '
+                            b'"phone": 5551234567, "score": 1.5, "ok": true}\n')
+        output = io.BytesIO()
+        scanner = _regex_scanner()
+
+        stats = DatasetProcessor(scanner).process(source, output, "jsonl")
+
+        scanned = scanner.scan_many.call_args.args[0]
+        assert scanned == ["Ann", "a@b.com", "x", "c@d.org", "5551234567"]
+        row = json.loads(output.getvalue())
+        assert row["user"] == {"name": "Ann", "email": "<EMAIL>"}
+        assert row["tags"] == ["x", "<EMAIL>"]
+        assert row["phone"] == 5551234567 and row["score"] == 1.5
+        assert stats["findings"] == {"user": 1, "tags": 1}
+
+    def test_parquet_vector_column_starts_all_null(self):
+        """
+        Scenario: A Parquet file whose first batch has no text to embed, the second one does.
+        Expectation: The output keeps the source types and writes msg_vector as list<float32>.
+        """
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+        source = io.BytesIO()
+        pq.write_table(pa.table({"id": pa.array([1, 2], pa.int32()), "msg": [None, "hello"]}), source)
+        source.seek(0)
+        output = io.BytesIO()
+        embedder = MagicMock()
+        embedder.get_vectors.side_effect = lambda texts: [np.zeros(3, dtype=np.float32) for _ in texts]
+
+        DatasetProcessor(_regex_scanner(), embedder, batch_rows=1).process(source, output, "parquet",
+                                                                         embed_column="msg")
+
+        output.seek(0)
+        table = pq.read_table(output)
+        assert table.schema.field("id").type == pa.int32()
+        assert table.schema.field("msg_vector").type == pa.list_(pa.float32())
+        assert table.column("msg_vector").to_pylist()[0] is None
+
+    def test_iter_batches_leaves_source_open(self):
+        source = io.BytesIO(b'{"a": 1}\n{"a": 2}\n{"a": 3}\n')
+        assert [len(b) for b in iter_batches(source, "jsonl", batch_rows=2)] == [2, 1]
+        assert not source.closed
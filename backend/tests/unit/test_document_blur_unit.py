@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock, patch, ANY
 from pathlib import Path
 from app.processors.document_blur import DocumentProcessorBlur
+from app.ner.pii_image_extractor import PIIExtractionWithSummary
 
 
 class TestDocumentBlurUnit:
@@ -15,10 +16,12 @@ class TestDocumentBlurUnit:
     def processor(self, mock_extractor):
         return DocumentProcessorBlur()
 
+    @patch('app.processors.document_blur.prepare_vision_payload')
     @patch('app.processors.document_blur.fitz.open')
     @patch('app.processors.document_blur.Image')
     @patch('app.processors.document_blur.os.makedirs')
-    def test_process_flow(self, mock_makedirs, mock_image, mock_fitz_open, processor, mock_extractor, tmp_path):
+    def test_process_flow(self, mock_makedirs, mock_image, mock_fitz_open, mock_prepare, processor, mock_extractor,
+                          tmp_path):
         """
         Scenario: Process a PDF with 1 page.
         Expectation: Opens PDF, finds PII, blurs it, and saves output.
@@ -45,7 +48,10 @@ class TestDocumentBlurUnit:
         assert result["unsafe_words"] == ["John Doe"]
 
         mock_fitz_open.assert_called_once_with(str(input_file))
-        processor.find_unsafe_words.assert_called_once_with(mock_page)
+        # The page is rendered once and that image is reused for PII extraction and blurring.
+        processor.find_unsafe_words.assert_called_once_with(mock_page, mock_img_obj)
+        mock_prepare.assert_called_once_with(mock_img_obj)
+        assert result["page_payloads"] == [mock_prepare.return_value]
         mock_img_obj.paste.assert_called()
         mock_img_obj.save.assert_called()
 
@@ -64,4 +70,49 @@ class TestDocumentBlurUnit:
         """Test the helper for unique list extension."""
         target = ["A", "B"]
         processor._extend_unique(target, ["B", "C", "A"])
-        assert target == ["A", "B", "C"]
\ No newline at end of file
+        assert target == ["A", "B", "C"]
+
+
+class TestDocumentBlurCombinedUnit:
+
+    @pytest.fixture
+    def processor(self):
+        with patch('app.processors.document_blur.PIIImageExtractor'):
+            processor = DocumentProcessorBlur(MagicMock(), combined=True)
+        processor.rescan_page_text = MagicMock(return_value=[{"organization": "Acme"}])
+        processor.get_bboxes = MagicMock(return_value=[])
+        return processor
+
+    def run(self, processor, tmp_path):
+        input_file = tmp_path / "test.pdf"
+        input_file.touch()
+        mock_doc = MagicMock()
+        mock_doc.__len__.return_value = 1
+        with patch('app.processors.document_blur.fitz.open', return_value=mock_doc), \
+                patch('app.processors.document_blur.Image'), \
+                patch('app.processors.document_blur.UPLOAD_DIR', str(tmp_path)), \
+                patch('app.processors.document_blur.prepare_vision_payload') as mock_prepare:
+            return processor.process(str(input_file), epsilon=1.0), mock_prepare
+
+    def test_summary_replaces_description_payload(self, processor, tmp_path):
+        """
+        Scenario: Combined call returns PII and a summary that repeats a value found by the NER rescan.
+        Expectation: Summary is redacted and used; no description payload is prepared for the page.
+        """
+        processor.pii_extractor.extract_with_summary.return_value = PIIExtractionWithSummary(
+            names=["John Doe"], summary="A lease between a tenant and Acme.")
+
+        result, mock_prepare = self.run(processor, tmp_path)
+
+        processor.pii_extractor.extract_from_file.assert_not_called()
+        assert result["page_descriptions"] == ["A lease between a tenant and [REDACTED]."]
+        assert result["page_payloads"] == [None]
+        assert mock_prepare.call_count == 1  # the PII call's payload only
+
+    def test_missing_summary_falls_back_to_description_payload(self, processor, tmp_path):
+        processor.pii_extractor.extract_with_summary.return_value = PIIExtractionWithSummary()
+
+        result, mock_prepare = self.run(processor, tmp_path)
+
+        assert result["page_descriptions"] == [None]
+        assert result["page_payloads"] == [mock_prepare.return_value]
@@ -1,7 +1,7 @@
 import pytest
 import numpy as np
 from unittest.mock import patch, MagicMock
-from app.core.embedder import Embedder
+from app.core.embedder import Embedder, split_by_tokens, pool_vectors
 from app.config import OLLAMA_BASE_URL, EMBED_MODEL
 
 
@@ -65,4 +65,83 @@ class TestEmbedderUnit:
         embedder = Embedder()
         vector = embedder.get_vector("Test")
 
-        assert np.all(vector == 0)
\ No newline at end of file
+        assert np.all(vector == 0)
+
+class TestChunkedEmbeddingUnit:
+
+    def test_split_by_tokens_windows_overlap(self):
+        text = " ".join(f"w{i}" for i in range(25))
+
+        chunks = split_by_tokens(text, max_tokens=10, overlap=2)
+
+        assert [c["tokens"] for c in chunks] == [10, 10, 9]
+        assert chunks[0]["text"].split()[-2:] == chunks[1]["text"].split()[:2]
+        assert chunks[-1]["text"].endswith("w24")
+        assert text[chunks[1]["start"]:chunks[1]["end"]] == chunks[1]["text"]
+
+    def test_weighted_pooling_follows_token_counts(self):
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+
+        weighted = pool_vectors(vectors, [3, 1], mode="weighted")
+        mean = pool_vectors(vectors, [3, 1], mode="mean")
+
+        assert weighted[0] == pytest.approx(3 * weighted[1])
+        assert mean[0] == pytest.approx(mean[1])
+        # Rescaled to the chunk norms, so it is comparable to a single-call vector.
+        assert np.linalg.norm(weighted) == pytest.approx(1.0)
+
+    @patch('app.core.embedder.EMBED_BATCH_SIZE', 2)
+    @patch('app.core.embedder.EMBED_CHUNK_OVERLAP_TOKENS', 0)
+    @patch('app.core.embedder.EMBED_CHUNK_TOKENS', 4)
+    @patch('app.core.embedder.requests.post')
+    def test_long_text_is_embedded_in_batches(self, mock_post):
+        """
+        Scenario: 10 tokens with 4-token chunks and 2 chunks per request.
+        Expectation: 3 chunks in 2 /api/embed calls, pooled into one vector.
+        """
+        def respond(url, json, timeout):
+            response = MagicMock()
+            response.json.return_value = {"embeddings": [[1.0, float(len(t.split()))] for t in json["input"]]}
+            return response
+        mock_post.side_effect = respond
+
+        embedder = Embedder()
+        vector = embedder.get_vector("a b c d e f g h i j")
+        _, chunks = embedder.get_chunked_vectors("a b c d e f g h i j")
+
+        assert mock_post.call_count == 4
+        assert all(call.args[0] == embedder.batch_url for call in mock_post.call_args_list)
+        assert [c["tokens"] for c in chunks] == [4, 4, 2]
+        assert chunks[2]["vector"].tolist() == [1.0, 2.0]
+        assert vector.shape == (2,)
+
+    @patch('app.core.embedder.EMBED_CHUNK_TOKENS', 4)
+    @patch('app.core.embedder.requests.post')
+    def test_chunked_failure_falls_back_to_zero_vector(self, mock_post):
+        mock_post.side_effect = Exception("Connection Refused")
+
+        vector, chunks = Embedder().get_chunked_vectors("a b c d e f g h i j")
+
+        assert chunks == []
+        assert len(vector) == 768
+        assert np.all(vector == 0)
+
+    @patch('app.core.embedder.EMBED_BATCH_SIZE', 2)
+    @patch('app.core.embedder.requests.post')
+    def test_get_vectors_batches_short_texts(self, mock_post):
+        """
+        Scenario: Three short texts with 2 texts per request.
+        Expectation: 2 /api/embed calls instead of one call per text, results in input order.
+        """
+        def respond(url, json, timeout):
+            response = MagicMock()
+            response.json.return_value = {"embeddings": [[float(len(t))] for t in json["input"]]}
+            return response
+        mock_post.side_effect = respond
+
+        embedder = Embedder()
+        vectors = embedder.get_vectors(["a", "bb", "ccc"])
+
+        assert mock_post.call_count == 2
+        assert all(call.args[0] == embedder.batch_url for call in mock_post.call_args_list)
+        assert [v.tolist() for v in vectors] == [[1.0], [2.0], [3.0]]
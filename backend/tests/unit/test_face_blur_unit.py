@@ -60,4 +60,68 @@ class TestFaceBlurUnit:
             result = fd.blur_faces("fake_path.jpg")
 
             mock_blur.assert_not_called()
-            assert np.array_equal(result, mock_img)
\ No newline at end of file
+            assert np.array_equal(result, mock_img)
+
+    @patch('app.processors.face_blur.cv.imread')
+    @patch('app.processors.face_blur.YuNet')
+    def test_blur_array_skips_disk(self, mock_yunet, mock_imread):
+        """blur_array works on a decoded buffer and never touches the filesystem."""
+        image = np.zeros((60, 80, 3), dtype=np.uint8)
+        mock_instance = mock_yunet.return_value
+        mock_instance.infer.return_value = np.empty((0, 15))
+
+        fd = FaceDetection()
+        result = fd.blur_array(image)
+
+        mock_imread.assert_not_called()
+        mock_instance.setInputSize.assert_called_with([80, 60])
+        assert result is not image
+        assert np.array_equal(result, image)
+
+    @patch('app.processors.face_blur.YuNet')
+    def test_detect_on_downscaled_proxy(self, mock_yunet):
+        """
+        Scenario: A 4000x2000 image with a 1000 px proxy limit.
+        Expectation: YuNet sees a 1000x500 proxy and boxes come back in full-res pixels, padded.
+        """
+        image = np.zeros((2000, 4000, 3), dtype=np.uint8)
+        mock_instance = mock_yunet.return_value
+        det = np.zeros((1, 15), dtype=np.float32)
+        det[0, 0:4] = [100, 50, 20, 20]
+        det[0, 14] = 0.95
+        mock_instance.infer.return_value = det
+
+        fd = FaceDetection(max_side=1000)
+        boxes = fd.detect(image)
+
+        mock_instance.setInputSize.assert_called_with([1000, 500])
+        assert mock_instance.infer.call_args[0][0].shape == (500, 1000, 3)
+        x, y, w, h, score = boxes[0]
+        assert w > 80 and h > 80
+        assert x < 400 < x + w
+        assert y < 200 < y + h
+        assert score == pytest.approx(0.95)
+
+    @patch('app.processors.face_blur.FACE_TILE_TRIGGER_SIDE', 100)
+    @patch('app.processors.face_blur.FACE_TILE_SIZE', 100)
+    @patch('app.processors.face_blur.YuNet')
+    def test_tiled_detection_merges_duplicates(self, mock_yunet):
+        """Overlapping tiles that see the same face collapse to a single box."""
+        image = np.zeros((150, 150, 3), dtype=np.uint8)
+        mock_instance = mock_yunet.return_value
+        mock_instance.infer.return_value = np.empty((0, 15))
+
+        fd = FaceDetection(max_side=0, tiling=True)
+        face = np.array([[40, 40, 20, 20, 0.9]], dtype=np.float32)
+
+        def fake_proxy(tile):
+            # The whole-image pass and the top-left tile both see the same face.
+            if tile.shape[:2] in {(150, 150), (100, 100)}:
+                return face.copy()
+            return np.empty((0, 5), dtype=np.float32)
+
+        with patch.object(fd, '_detect_proxy', side_effect=fake_proxy):
+            boxes = fd.detect(image)
+
+        assert len(boxes) == 1
+        assert list(boxes[0, 0:2]) == [40, 40]
@@ -21,7 +21,7 @@ class TestFormUnit:
         Scenario: Input dictionary with 2 fields.
         Expectation: Both fields scanned, redacted, and audit log populated.
         """
-        mock_deps['scanner'].scan.return_value = [{"text": "secret", "label": "KEY"}]
+        mock_deps['scanner'].scan_many.side_effect = lambda values: [[{"text": "secret", "label": "KEY"}] for _ in values]
         mock_deps['scanner'].redact.return_value = "<REDACTED>"
         mock_deps['embedder'].get_vector.return_value = [0.1, 0.2]
         mock_deps['privacy'].add_noise.return_value = [0.11, 0.22]
@@ -31,7 +31,8 @@ class TestFormUnit:
         input_data = {"field1": "value1", "field2": "value2"}
         result = processor.process(input_data, epsilon=1.0)
 
-        assert mock_deps['scanner'].scan.call_count == 2
+        assert mock_deps['scanner'].scan_many.call_count == 1
+        mock_deps['scanner'].scan.assert_not_called()
         assert len(result['audit_log']) == 2
         assert result['audit_log'][0]['field'] in ["field1", "field2"]
 
@@ -42,6 +43,7 @@ class TestFormUnit:
     def test_process_handles_non_string_types(self, mock_deps):
         """Test robust handling of integers/booleans."""
         processor = FormProcessor()
+        mock_deps['scanner'].scan_many.return_value = [[], []]
         mock_deps['scanner'].redact.return_value = "123"
 
         input_data = {"age": 123, "active": True}
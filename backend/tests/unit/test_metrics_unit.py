@@ -0,0 +1,137 @@
+import json
+import os
+import pytest
+from app.core.metrics import (
+    MetricsRegistry,
+    mark_process_dead,
+    metrics,
+    span,
+    start_request_timing,
+    get_request_timings,
+    format_timing_header,
+    timing_requested,
+)
+
+
+class TestMetricsUnit:
+
+    @pytest.fixture
+    def registry(self):
+        return MetricsRegistry(prefix="test", buckets=(0.1, 1.0))
+
+    def test_counter_and_gauge(self, registry):
+        """Counters accumulate per label set; gauges keep the last value."""
+        registry.inc("calls_total", {"model": "gliner"})
+        registry.inc("calls_total", {"model": "gliner"}, value=2)
+        registry.set_gauge("queue_depth", 3)
+        registry.set_gauge("queue_depth", 1)
+
+        assert registry.get_counter("calls_total", {"model": "gliner"}) == 3
+        assert registry.get_counter("calls_total", {"model": "whisper"}) == 0
+        assert registry.get_gauge("queue_depth") == 1
+
+    def test_histogram_prometheus_rendering(self, registry):
+        """
+        Scenario: Three observations across two buckets.
+        Expectation: Cumulative buckets, +Inf, sum and count lines are rendered.
+        """
+        registry.describe("stage_seconds", "Stage latency.")
+        for value in (0.05, 0.5, 5.0):
+            registry.observe("stage_seconds", value, {"stage": "scan"})
+
+        text = registry.render()
+        assert "# TYPE test_stage_seconds histogram" in text
+        assert 'test_stage_seconds_bucket{stage="scan",le="0.1"} 1' in text
+        assert 'test_stage_seconds_bucket{stage="scan",le="1.0"} 2' in text
+        assert 'test_stage_seconds_bucket{stage="scan",le="+Inf"} 3' in text
+        assert 'test_stage_seconds_count{stage="scan"} 3' in text
+
+    def test_span_records_timing_and_errors(self):
+        """Spans feed the stage histogram, the request timings and the error counter."""
+        start_request_timing()
+        with span("unit_stage"):
+            pass
+        with pytest.raises(ValueError):
+            with span("unit_failing_stage"):
+                raise ValueError("boom")
+
+        stages = [stage for stage, _ in get_request_timings()]
+        assert stages == ["unit_stage", "unit_failing_stage"]
+        assert metrics.get_histogram_count("stage_duration_seconds", {"stage": "unit_stage"}) >= 1
+        assert metrics.get_counter("errors_total", {"component": "unit_failing_stage"}) >= 1
+
+    def test_timing_header_format(self):
+        header = format_timing_header([("scan", 0.012), ("embed", 0.1)], total=0.2)
+        assert header == "scan;dur=12.00, embed;dur=100.00, total;dur=200.00"
+
+    def test_timing_header_is_parsed_as_a_boolean(self):
+        assert timing_requested("1") and timing_requested(" True ")
+        assert not any(timing_requested(value) for value in (None, "", "0", "false", "no"))
+
+    def test_clear_counts_keeps_gauges(self, registry):
+        """A forked worker forgets the master's counts but not the current state."""
+        registry.inc("calls_total")
+        registry.observe("stage_seconds", 0.5)
+        registry.set_gauge("breaker_state", 2)
+
+        registry.clear_counts()
+
+        assert registry.get_counter("calls_total") == 0
+        assert registry.get_histogram_count("stage_seconds") == 0
+        assert registry.get_gauge("breaker_state") == 2
+
+    def test_multiprocess_render_merges_workers(self, registry, tmp_path):
+        """
+        Scenario: Two gunicorn workers; this one answers the scrape, the other wrote its file earlier.
+        Expectation: Counters and histograms are summed, gauges are reported per worker.
+        """
+        other = MetricsRegistry(prefix="test", buckets=(0.1, 1.0))
+        other.inc("calls_total", {"model": "gliner"}, value=2)
+        other.set_gauge("inflight", 3)
+        other.observe("stage_seconds", 0.5)
+        (tmp_path / "4242.json").write_text(json.dumps(other.snapshot()))
+
+        registry.enable_multiprocess(str(tmp_path), interval=3600)
+        registry.inc("calls_total", {"model": "gliner"})
+        registry.set_gauge("inflight", 1)
+        registry.observe("stage_seconds", 0.05)
+        text = registry.render()
+
+        assert 'test_calls_total{model="gliner"} 3.0' in text
+        assert 'test_inflight{worker="4242"} 3.0' in text
+        assert f'test_inflight{{worker="{os.getpid()}"}} 1.0' in text
+        assert 'test_stage_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_stage_seconds_count 2' in text
+
+    def test_exited_worker_keeps_counters_but_not_gauges(self, registry, tmp_path):
+        other = MetricsRegistry(prefix="test", buckets=(0.1, 1.0))
+        other.inc("calls_total", value=5)
+        other.set_gauge("inflight", 3)
+        (tmp_path / "4242.json").write_text(json.dumps(other.snapshot()))
+
+        mark_process_dead(4242, str(tmp_path))
+        registry.enable_multiprocess(str(tmp_path), interval=3600)
+        text = registry.render()
+
+        assert not (tmp_path / "4242.json").exists()
+        assert "test_calls_total 5.0" in text
+        assert 'worker="4242"' not in text
+
+    def test_exited_workers_fold_into_one_file(self, registry, tmp_path):
+        """
+        Scenario: Two workers exit one after the other (e.g. max_requests restarts).
+        Expectation: Their counts are summed into exited.json and no per-pid file is left.
+        """
+        for pid, calls in ((4242, 5), (4343, 2)):
+            other = MetricsRegistry(prefix="test", buckets=(0.1, 1.0))
+            other.inc("calls_total", value=calls)
+            other.observe("stage_seconds", 0.5)
+            (tmp_path / f"{pid}.json").write_text(json.dumps(other.snapshot()))
+            mark_process_dead(pid, str(tmp_path))
+
+        registry.enable_multiprocess(str(tmp_path), interval=3600)
+        text = registry.render()
+
+        assert sorted(p.name for p in tmp_path.glob("*.json")) == sorted(["exited.json", f"{os.getpid()}.json"])
+        assert "test_calls_total 7.0" in text
+        assert 'test_stage_seconds_bucket{le="1.0"} 2' in text
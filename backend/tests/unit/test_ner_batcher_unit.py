@@ -0,0 +1,80 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from app.core.ner_batcher import NERMicroBatcher
+
+
+def _echo_model():
+    """Returns one entity per text whose 'text' field echoes the input."""
+    model = MagicMock()
+    model.batch_predict_entities.side_effect = lambda texts, labels, threshold: [
+        [{"text": t, "label": labels[0], "score": 0.9, "start": 0, "end": len(t)}] for t in texts
+    ]
+    return model
+
+
+class TestNERBatcherUnit:
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        """
+        Scenario: Four threads submit a chunk each within the wait window.
+        Expectation: One batched model call, and every caller gets its own result.
+        """
+        model = _echo_model()
+        batcher = NERMicroBatcher(model, threshold=0.5, max_batch=4, max_wait_ms=500)
+        results = {}
+        barrier = threading.Barrier(4)
+
+        def worker(i):
+            barrier.wait()
+            results[i] = batcher.predict(f"text {i}", ["person"])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert model.batch_predict_entities.call_count == 1
+        assert {i: r[0]["text"] for i, r in results.items()} == {i: f"text {i}" for i in range(4)}
+
+    def test_batches_are_split_by_label_set(self):
+        model = _echo_model()
+        batcher = NERMicroBatcher(model, threshold=0.5, max_batch=8, max_wait_ms=200)
+
+        first = batcher.submit("a", ["person"])
+        second = batcher.submit("b", ["employer"])
+
+        assert first.result(timeout=5)[0]["label"] == "person"
+        assert second.result(timeout=5)[0]["label"] == "employer"
+        assert model.batch_predict_entities.call_count == 2
+
+    def test_model_errors_reach_every_caller(self):
+        model = MagicMock()
+        model.batch_predict_entities.side_effect = RuntimeError("model crashed")
+        batcher = NERMicroBatcher(model, threshold=0.5, max_wait_ms=1)
+
+        with pytest.raises(RuntimeError, match="model crashed"):
+            batcher.predict("a", ["person"])
+
+    def test_errors_outside_the_model_call_keep_the_worker_alive(self):
+        """
+        Scenario: Bookkeeping for the first batch raises before the model is called.
+        Expectation: That caller gets the error instead of hanging; the next one is served normally.
+        """
+        batcher = NERMicroBatcher(_echo_model(), threshold=0.5, max_wait_ms=1)
+
+        with patch("app.core.ner_batcher.count_model_call", side_effect=[ValueError("metrics down"), None]):
+            with pytest.raises(ValueError, match="metrics down"):
+                batcher.submit("a", ["person"]).result(timeout=5)
+            assert batcher.predict("b", ["person"])[0]["text"] == "b"
+
+        assert batcher._thread.is_alive()
+
+    def test_precomputed_label_embeddings_are_used(self):
+        model = MagicMock()
+        model.batch_predict_with_embeds.return_value = [[]]
+        batcher = NERMicroBatcher(model, threshold=0.5, max_wait_ms=1)
+
+        assert batcher.predict("a", ["person"], embeddings="embeds") == []
+        model.batch_predict_with_embeds.assert_called_once_with(["a"], "embeds", ["person"], threshold=0.5)
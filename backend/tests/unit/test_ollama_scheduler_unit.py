@@ -0,0 +1,222 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from app.core.embedder import Embedder
+from app.core.metrics import metrics
+from app.core.ollama_scheduler import BATCH, INTERACTIVE, OllamaScheduler, QueueFullError
+from app.core.vision import VisionEngine
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+class TestOllamaSchedulerUnit:
+
+    @pytest.fixture
+    def scheduler(self):
+        return OllamaScheduler(limits={"embed": 2, "vision": 1}, max_queue=10, queue_timeout=5)
+
+    def queue_up(self, scheduler, order, name, priority=INTERACTIVE, tenant="default"):
+        """Starts a caller that records when it gets the vision slot; returns once it is queued."""
+        waiting = scheduler.stats()["vision"]
+        queued = waiting["waiting_interactive"] + waiting["waiting_batch"] + 1
+
+        def call():
+            with scheduler.slot("vision", priority, tenant):
+                order.append(name)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        wait_until(lambda: sum(v for k, v in scheduler.stats()["vision"].items() if k.startswith("waiting")) == queued)
+        return thread
+
+    def test_lane_limit_blocks_until_release(self, scheduler):
+        order = []
+        scheduler.acquire("vision")
+        thread = self.queue_up(scheduler, order, "second")
+
+        assert order == []
+        scheduler.release("vision")
+        thread.join(2)
+
+        assert order == ["second"]
+        assert scheduler.stats()["vision"]["active"] == 0
+
+    def test_lanes_are_independent(self, scheduler):
+        """
+        Scenario: A long vision generation holds the only vision slot.
+        Expectation: Embedding calls are admitted immediately.
+        """
+        scheduler.acquire("vision")
+
+        with scheduler.slot("embed"), scheduler.slot("embed"):
+            assert scheduler.stats()["embed"]["active"] == 2
+
+        scheduler.release("vision")
+
+    def test_interactive_goes_before_batch(self, scheduler):
+        order = []
+        scheduler.acquire("vision")
+        threads = [self.queue_up(scheduler, order, "page-1", BATCH, "docs"),
+                   self.queue_up(scheduler, order, "page-2", BATCH, "docs"),
+                   self.queue_up(scheduler, order, "image", INTERACTIVE, "web")]
+
+        assert metrics.get_gauge("ollama_queue_depth", {"lane": "vision", "priority": "batch"}) == 2
+        assert metrics.get_gauge("ollama_queue_depth", {"lane": "vision", "priority": "interactive"}) == 1
+        scheduler.release("vision")
+        for thread in threads:
+            thread.join(2)
+
+        assert order == ["image", "page-1", "page-2"]
+        assert metrics.get_gauge("ollama_queue_depth", {"lane": "vision", "priority": "batch"}) == 0
+
+    def test_tenants_are_served_round_robin(self, scheduler):
+        """
+        Scenario: Tenant A queued three pages before tenant B queued one.
+        Expectation: B is served right after A's first page, not after all of them.
+        """
+        order = []
+        scheduler.acquire("vision")
+        threads = [self.queue_up(scheduler, order, f"a{i}", BATCH, "a") for i in range(3)]
+        threads.append(self.queue_up(scheduler, order, "b0", BATCH, "b"))
+
+        scheduler.release("vision")
+        for thread in threads:
+            thread.join(2)
+
+        assert order == ["a0", "b0", "a1", "a2"]
+
+    def test_full_queue_rejects(self):
+        scheduler = OllamaScheduler(limits={"vision": 1}, max_queue=0, queue_timeout=5)
+        scheduler.acquire("vision")
+
+        with pytest.raises(QueueFullError) as excinfo:
+            scheduler.acquire("vision")
+
+        assert excinfo.value.component == "vision"
+        assert excinfo.value.retry_after == 5
+
+    def test_queue_timeout_leaves_no_waiter_behind(self):
+        scheduler = OllamaScheduler(limits={"vision": 1}, max_queue=10, queue_timeout=0.05)
+        scheduler.acquire("vision")
+
+        with pytest.raises(QueueFullError):
+            scheduler.acquire("vision")
+        scheduler.release("vision")
+
+        assert scheduler.stats()["vision"] == {"active": 0, "limit": 1, "waiting_interactive": 0,
+                                               "waiting_batch": 0}
+
+    def test_reset_forgets_inherited_slots(self, scheduler):
+        scheduler.acquire("vision")
+
+        scheduler.reset()
+
+        assert scheduler.stats()["vision"]["active"] == 0
+        with scheduler.slot("vision"):
+            assert scheduler.stats()["vision"]["active"] == 1
+
+    def test_slot_dir_makes_the_limit_global(self, tmp_path):
+        """
+        Scenario: Two schedulers (two gunicorn workers) share a slot directory; vision limit 1.
+        Expectation: While one holds the slot the other times out; after release it gets the slot.
+        """
+        worker_a = OllamaScheduler(limits={"vision": 1}, queue_timeout=5, slot_dir=str(tmp_path))
+        worker_b = OllamaScheduler(limits={"vision": 1}, queue_timeout=0.1, slot_dir=str(tmp_path))
+
+        token = worker_a.acquire("vision")
+        with pytest.raises(QueueFullError):
+            worker_b.acquire("vision")
+        assert worker_b.stats()["vision"]["active"] == 0
+
+        worker_a.release("vision", token)
+        with worker_b.slot("vision"):
+            assert worker_b.stats()["vision"]["active"] == 1
+
+
+    def test_only_one_caller_per_worker_waits_for_a_shared_slot(self, tmp_path):
+        """
+        Scenario: Another worker holds both shared embed slots; this worker gets three calls.
+        Expectation: One waits for a slot file, the other two stay in the local queue; none counts as active.
+        """
+        other = OllamaScheduler(limits={"embed": 2}, queue_timeout=5, slot_dir=str(tmp_path))
+        worker = OllamaScheduler(limits={"embed": 2}, queue_timeout=5, slot_dir=str(tmp_path))
+        tokens = [other.acquire("embed"), other.acquire("embed")]
+        done = []
+
+        def call():
+            with worker.slot("embed"):
+                done.append(1)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: worker.stats()["embed"]["waiting_interactive"] == 2)
+        assert worker.stats()["embed"]["active"] == 0
+
+        for token in tokens:
+            other.release("embed", token)
+        for thread in threads:
+            thread.join(2)
+        assert len(done) == 3
+
+    def test_interactive_goes_first_across_workers(self, tmp_path):
+        """
+        Scenario: Worker A holds the only vision slot; B waits with a batch call, then C with an interactive one.
+        Expectation: When A releases, C's interactive call gets the slot before B's batch call.
+        """
+        worker_a, worker_b, worker_c = (OllamaScheduler(limits={"vision": 1}, queue_timeout=5, slot_dir=str(tmp_path))
+                                        for _ in range(3))
+        token = worker_a.acquire("vision")
+        order = []
+
+        def call(scheduler, priority, name):
+            with scheduler.slot("vision", priority):
+                order.append(name)
+                time.sleep(0.05)
+
+        batch = threading.Thread(target=call, args=(worker_b, BATCH, "batch"))
+        batch.start()
+        wait_until(lambda: worker_b._lanes["vision"].granted == 1)
+        interactive = threading.Thread(target=call, args=(worker_c, INTERACTIVE, "interactive"))
+        interactive.start()
+
+        def interactive_waiting():
+            with open(tmp_path / "vision.interactive.lock", "a") as gate:
+                return not OllamaScheduler._no_interactive_waiting(gate)
+
+        wait_until(interactive_waiting)
+
+        worker_a.release("vision", token)
+        batch.join(2)
+        interactive.join(2)
+
+        assert order == ["interactive", "batch"]
+
+
+class TestSchedulerClientsUnit:
+
+    @patch('app.core.embedder.requests.post')
+    def test_embedder_uses_the_embed_lane(self, mock_post):
+        mock_post.return_value = MagicMock(**{"json.return_value": {"embedding": [0.1, 0.2]}})
+        embedder = Embedder()
+        embedder.scheduler = MagicMock()
+
+        embedder.get_vector("hello")
+
+        embedder.scheduler.slot.assert_called_once_with("embed")
+
+    @patch('app.core.vision.requests.post')
+    def test_vision_uses_the_vision_lane(self, mock_post):
+        mock_post.return_value = MagicMock(**{"json.return_value": {"response": "A cat."}})
+        engine = VisionEngine(cache=MagicMock())
+        engine.scheduler = MagicMock()
+
+        engine.describe_image(b"raw")
+
+        engine.scheduler.slot.assert_called_once_with("vision")
@@ -2,7 +2,7 @@ import pytest
 import base64
 from PIL import Image
 from unittest.mock import patch, MagicMock
-from app.ner.pii_image_extractor import PIIImageExtractor, PIIExtractionResult
+from app.ner.pii_image_extractor import PIIImageExtractor, PIIExtractionResult, PIIExtractionWithSummary
 from app.config import OLLAMA_BASE_URL
 import requests
 from pydantic import ValidationError
@@ -83,4 +83,30 @@ class TestPIIImageExtractorUnit:
         }
         mock_post.return_value = mock_response
         with pytest.raises(ValidationError):
-            extractor.extract_from_file(dummy_image)
\ No newline at end of file
+            extractor.extract_from_file(dummy_image)
+
+    @patch("app.ner.pii_image_extractor.requests.post")
+    def test_extract_with_summary_single_call(self, mock_post, extractor, dummy_image):
+        """
+        Scenario: Combined mode; the model returns the PII lists and a summary in one JSON object.
+        Expectation: One request with the combined prompt, validated into PIIExtractionWithSummary.
+        """
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "message": {"content": '{"names": ["John Doe"], "summary": "An invoice for office chairs."}'}
+        }
+        mock_post.return_value = mock_response
+
+        result = extractor.extract_with_summary(dummy_image)
+
+        assert mock_post.call_count == 1
+        assert "summary" in mock_post.call_args.kwargs["json"]["messages"][0]["content"]
+        assert isinstance(result, PIIExtractionWithSummary)
+        assert result.names == ["John Doe"]
+        assert result.summary == "An invoice for office chairs."
+
+    def test_redacted_summary_masks_leaked_values(self):
+        result = PIIExtractionWithSummary(names=["John Doe"], emails=["john@example.com"],
+                                          summary="Letter from JOHN DOE (john@example.com) to Acme about rent.")
+
+        assert result.redacted_summary(["Acme"]) == "Letter from [REDACTED] ([REDACTED]) to [REDACTED] about rent."
@@ -75,7 +75,7 @@ class TestSecurePipelineUnit:
         result = pipeline._apply_standard_security(test_text, epsilon)
 
         # Verify call order and arguments
-        mock_scanner.scan.assert_called_once_with(test_text)
+        mock_scanner.scan.assert_called_once_with(test_text, labels=None)
         mock_scanner.redact.assert_called_once()
         mock_scanner.create_boomerang_map.assert_called_once()
         mock_embedder.get_vector.assert_called_once()
@@ -161,31 +161,24 @@ class TestSecurePipelineUnit:
         assert all(isinstance(x, (int, float)) for x in result["safe_vector"])
 
     @patch('tempfile.NamedTemporaryFile')
-    @patch('os.remove')
-    def test_audio_pipeline_temp_file_cleanup(self, mock_remove, mock_temp, pipeline):
-        """Test that audio pipeline cleans up temporary files"""
-        # Setup mock file
-        mock_file = MagicMock()
-        mock_file.name = "/tmp/test_audio.wav"
-        mock_temp.return_value.__enter__.return_value = mock_file
-
-        # Mock audio processor
-        mock_audio_proc = Mock()
+    def test_audio_pipeline_streams_upload(self, mock_temp, pipeline):
+        """Test that the audio upload stream goes straight to Whisper without a temp file"""
+        mock_audio_proc = MagicMock()
         mock_audio_proc.extract_text.return_value = "Test transcription"
+        mock_audio_proc.choose_model_size.return_value = "small"
         pipeline.audio_proc = mock_audio_proc
 
-        # Mock the security wrapper
         with patch.object(pipeline, '_apply_standard_security') as mock_security:
             mock_security.return_value = {"safe_content": "test"}
 
-            # Create a mock file object
             mock_file_obj = Mock()
-            mock_file_obj.read.return_value = b"fake audio data"
+            result = pipeline.run_audio_pipeline(mock_file_obj, epsilon=1.0)
 
-            pipeline.run_audio_pipeline(mock_file_obj, epsilon=1.0)
-
-            # Verify temp file was removed
-            mock_remove.assert_called_once_with(mock_file.name)
+            mock_audio_proc.extract_text.assert_called_once_with(mock_file_obj.stream, model_size="small")
+            assert result["whisper_model"] == "small"
+            mock_temp.assert_not_called()
+            mock_file_obj.read.assert_not_called()
+            mock_security.assert_called_once_with("Test transcription", 1.0)
 
     def test_boomerang_map_excludes_secrets(self, pipeline):
         """Test that security secrets are excluded from boomerang map"""
@@ -202,3 +195,239 @@ class TestSecurePipelineUnit:
         # But regular PII should be
         assert "John Doe" in boomerang
 
+
+
+class TestPipelineReadinessUnit:
+
+    def test_is_ready_requires_all_models(self):
+        """Readiness only flips once GLiNER, Whisper and YuNet are all loaded."""
+        pipeline = SecurePipeline.__new__(SecurePipeline)
+        pipeline.scanner = Mock(ner_model=object())
+        pipeline.audio_proc = Mock(model=None)
+        pipeline.face_proc = Mock(detector=object())
+        assert pipeline.is_ready() is False
+
+        pipeline.audio_proc.model = object()
+        assert pipeline.is_ready() is True
+
+
+@pytest.fixture
+def bare_pipeline():
+    """Pipeline with a regex-only scanner and mocked models (no model downloads)."""
+    from app.core.scanner import Scanner
+    scanner = Scanner.__new__(Scanner)
+    scanner.ner_model = Mock()
+    scanner.ner_model.predict_entities.return_value = []
+    scanner.ner_model.batch_predict_entities.side_effect = lambda texts, labels, threshold: [[] for _ in texts]
+    scanner.labels = []
+    scanner.threshold = 0.5
+
+    pipeline = SecurePipeline.__new__(SecurePipeline)
+    pipeline.scanner = scanner
+    pipeline.embedder = Mock()
+    pipeline.embedder.get_vector.return_value = np.zeros(4, dtype=np.float32)
+    pipeline.privacy_engine = Mock()
+    pipeline.privacy_engine.add_noise.side_effect = lambda v: v
+    pipeline.audio_proc = MagicMock()
+    pipeline.audio_proc.choose_model_size.return_value = "small"
+    return pipeline
+
+
+class TestAudioStreamPipelineUnit:
+
+    def test_stream_pipeline_maps_findings_to_segments(self, bare_pipeline):
+        """
+        Scenario: Three segments, the second one containing an SSN.
+        Expectation: Finding offsets are segment-relative and only that segment is redacted.
+        """
+        segments = [
+            MagicMock(start=0.0, end=1.5, text=" Hello there."),
+            MagicMock(start=1.5, end=3.0, text=" My SSN is 123-45-6789."),
+            MagicMock(start=3.0, end=4.0, text=" Bye."),
+        ]
+        bare_pipeline.audio_proc.stream_segments.return_value = iter(segments)
+
+        result = bare_pipeline.run_audio_stream_pipeline(Mock(), epsilon=1.0)
+
+        assert [s["start"] for s in result["segments"]] == [0.0, 1.5, 3.0]
+        second = result["segments"][1]
+        assert second["findings"][0]["text"] == "123-45-6789"
+        assert second["text"][second["findings"][0]["start"]:second["findings"][0]["end"]] == "123-45-6789"
+        assert "123-45-6789" not in second["safe_text"]
+        assert result["segments"][0]["safe_text"] == " Hello there."
+        assert "123-45-6789" not in result["safe_content"]
+
+    def test_stream_pipeline_propagates_transcription_errors(self, bare_pipeline):
+        def failing_segments(_, **kwargs):
+            yield MagicMock(start=0.0, end=1.0, text=" partial")
+            raise RuntimeError("decoder crashed")
+
+        bare_pipeline.audio_proc.stream_segments.side_effect = failing_segments
+
+        with pytest.raises(RuntimeError, match="decoder crashed"):
+            bare_pipeline.run_audio_stream_pipeline(Mock(), epsilon=1.0)
+
+    def test_stream_pipeline_stops_transcriber_when_scan_fails(self, bare_pipeline):
+        """
+        Scenario: The scanner raises while Whisper keeps producing more segments than the queue holds.
+        Expectation: The error reaches the caller and the transcriber thread stops instead of blocking.
+        """
+        produced = []
+
+        def endless_segments(_, **kwargs):
+            while True:
+                produced.append(1)
+                yield MagicMock(start=0.0, end=1.0, text=" word")
+
+        bare_pipeline.audio_proc.stream_segments.side_effect = endless_segments
+        bare_pipeline.scanner = Mock()
+        bare_pipeline.scanner.scan.side_effect = RuntimeError("scan failed")
+
+        with patch("app.core.pipeline.AUDIO_STREAM_QUEUE_SIZE", 2):
+            with pytest.raises(RuntimeError, match="scan failed"):
+                bare_pipeline.run_audio_stream_pipeline(Mock(), epsilon=1.0)
+
+        # Returning at all means the producer was joined; it stopped pulling from Whisper too.
+        assert len(produced) < 10
+
+
+class TestAudioRedactionPipelineUnit:
+
+    def test_unknown_mode_fails_before_decoding(self, bare_pipeline):
+        with patch("app.core.pipeline.decode_to_pcm_file") as mock_decode:
+            with pytest.raises(ValueError, match="redaction mode"):
+                bare_pipeline.run_audio_redaction_pipeline(Mock(), 1.0, Mock(), mode="beep")
+
+        mock_decode.assert_not_called()
+        bare_pipeline.audio_proc.transcribe_pcm.assert_not_called()
+
+    def test_repeated_values_are_muted_too(self, bare_pipeline, tmp_path):
+        """
+        Scenario: A surname is found once and repeated later in the transcript.
+        Expectation: Both occurrences are redacted in safe_text and both become time ranges.
+        """
+        segments = [{"start": 0.0, "end": 4.0, "text": "Call Smith now",
+                     "words": [{"word": "Call", "start": 0.0, "end": 1.0}, {"word": "Smith", "start": 1.0, "end": 2.0},
+                               {"word": "now", "start": 2.0, "end": 3.0}]},
+                    {"start": 10.0, "end": 14.0, "text": "again Smith",
+                     "words": [{"word": "again", "start": 10.0, "end": 11.0},
+                               {"word": "Smith", "start": 12.0, "end": 13.0}]}]
+        bare_pipeline.audio_proc.transcribe_pcm.return_value = segments
+        bare_pipeline.audio_redactor = Mock()
+        bare_pipeline.audio_redactor.redact.return_value = []
+        bare_pipeline.vector_store = None
+        only_first = [{"text": "Smith", "label": "person", "start": 5, "end": 10}]
+
+        with patch("app.core.pipeline.UPLOAD_DIR", str(tmp_path)), \
+                patch("app.core.pipeline.decode_to_pcm_file", return_value=16000), \
+                patch("app.core.pipeline.open_pcm"), patch("app.core.pipeline.write_wav"), \
+                patch.object(bare_pipeline.scanner, "scan", return_value=only_first):
+            result = bare_pipeline.run_audio_redaction_pipeline(Mock(), 1.0, Mock())
+
+        replaced = bare_pipeline.audio_redactor.redact.call_args.args[2]
+        assert [(r["start"], r["end"]) for r in replaced] == [(5, 10), (21, 26)]
+        assert "Smith" not in result["safe_content"]
+
+
+class TestFormPipelineUnit:
+
+    def test_form_findings_keep_field_attribution(self, bare_pipeline):
+        """
+        Scenario: A form with an SSN in one field.
+        Expectation: The finding is tagged with its field, offsets point into the flattened
+        text, and only that field's safe_value is redacted.
+        """
+        result = bare_pipeline.run_form_pipeline({"name": "Jo", "ssn": "123-45-6789"}, epsilon=1.0)
+
+        finding = result["audit_log"][0]
+        assert finding["field"] == "ssn"
+        assert "name: Jo. ssn: 123-45-6789"[finding["start"]:finding["end"]] == "123-45-6789"
+        assert result["fields"]["name"]["safe_value"] == "Jo"
+        assert "123-45-6789" not in result["fields"]["ssn"]["safe_value"]
+        assert result["fields"]["ssn"]["findings"][0]["start"] == 0
+
+
+class TestVectorStorePipelineUnit:
+
+    def test_safe_vector_is_stored_with_source(self, bare_pipeline, tmp_path):
+        from app.core.vector_store import VectorStore
+        bare_pipeline.vector_store = VectorStore(directory=str(tmp_path), dim=4)
+        bare_pipeline.embedder.get_vector.return_value = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+
+        result = bare_pipeline.run_form_pipeline({"note": "hello"}, epsilon=1.0)
+        hits = bare_pipeline.run_search_pipeline(1, vector=[1.0, 0.0, 0.0, 0.0])
+
+        assert result["vector_id"] == 0
+        assert hits[0]["id"] == 0
+        assert hits[0]["source"] == "form"
+        assert hits[0]["text"] == result["safe_content"]
+
+    def test_store_errors_do_not_fail_the_request(self, bare_pipeline):
+        bare_pipeline.vector_store = Mock()
+        bare_pipeline.vector_store.add.side_effect = OSError("disk full")
+
+        result = bare_pipeline.run_text_pipeline("hello", epsilon=1.0)
+
+        assert result["vector_id"] is None
+        assert result["safe_content"] == "hello"
+
+    def test_raw_vector_can_be_omitted(self, bare_pipeline):
+        with patch("app.core.pipeline.INCLUDE_RAW_VECTOR", False):
+            result = bare_pipeline.run_text_pipeline("hello", epsilon=1.0)
+
+        assert "raw_vector" not in result
+        assert isinstance(result["safe_vector"], list)
+
+    def test_chunk_vectors_are_noised(self, bare_pipeline):
+        chunk = {"start": 0, "end": 5, "tokens": 1, "vector": np.ones(4, dtype=np.float32)}
+        bare_pipeline.embedder.get_chunked_vectors.return_value = (np.ones(4, dtype=np.float32), [chunk])
+        bare_pipeline.privacy_engine.add_noise.side_effect = lambda v: v + 1
+
+        result = bare_pipeline.run_text_pipeline("hello", epsilon=1.0, chunk_vectors=True)
+
+        assert result["chunk_vectors"] == [{"start": 0, "end": 5, "tokens": 1, "vector": [2.0, 2.0, 2.0, 2.0]}]
+        bare_pipeline.embedder.get_vector.assert_not_called()
+
+
+class TestDocumentPipelineUnit:
+
+    def test_document_descriptions_reuse_prepared_pages(self, bare_pipeline):
+        """
+        Scenario: The blur stage returns one prepared payload per page.
+        Expectation: Each payload is described as-is; the blurred PDF is not re-opened.
+        """
+        pages = [Mock(), Mock()]
+        bare_pipeline.doc_proc = Mock()
+        bare_pipeline.doc_proc.process.return_value = {
+            "safe_pdf_path": "/tmp/blurred.pdf", "unsafe_words": [], "page_payloads": pages
+        }
+        bare_pipeline.vision_engine = Mock()
+        bare_pipeline.vision_engine.describe_pdf_content.side_effect = ["Page one.", "Page two."]
+
+        with patch("app.core.pipeline.fitz.open") as mock_open:
+            result = bare_pipeline.run_document_pipeline("/tmp/in.pdf", epsilon=1.0)
+
+        mock_open.assert_not_called()
+        assert [c.args[0] for c in bare_pipeline.vision_engine.describe_pdf_content.call_args_list] == pages
+        assert result["description"] == "Page one.\nPage two."
+        assert "page_payloads" not in result
+
+    def test_combined_summaries_skip_the_description_call(self, bare_pipeline):
+        """
+        Scenario: The first page was summarized by the combined PII call, the second was not.
+        Expectation: Only the second page goes to the vision engine; descriptions keep page order.
+        """
+        payload = Mock()
+        bare_pipeline.doc_proc = Mock()
+        bare_pipeline.doc_proc.process.return_value = {
+            "safe_pdf_path": "/tmp/blurred.pdf", "unsafe_words": [],
+            "page_payloads": [None, payload], "page_descriptions": ["Page one.", None]
+        }
+        bare_pipeline.vision_engine = Mock()
+        bare_pipeline.vision_engine.describe_pdf_content.return_value = "Page two."
+
+        result = bare_pipeline.run_document_pipeline("/tmp/in.pdf", epsilon=1.0)
+
+        bare_pipeline.vision_engine.describe_pdf_content.assert_called_once_with(payload, blurred=True)
+        assert result["description"] == "Page one.\nPage two."
+        assert "page_descriptions" not in result
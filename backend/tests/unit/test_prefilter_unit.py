@@ -0,0 +1,43 @@
+import pytest
+from app.core.metrics import metrics
+from app.core.prefilter import classify_value, needs_ner
+
+
+class TestPrefilterUnit:
+
+    @pytest.mark.parametrize("value, rule", [
+        ("", "empty"),
+        (" -- ", "empty"),
+        ("TRUE", "boolean"),
+        ("42", "numeric"),
+        ("-1,234.50", "numeric"),
+        ("€ 12", "no_letters"),
+        ("123e4567-e89b-12d3-a456-426614174000", "uuid"),
+        ("2024-05-01T10:30:00Z", "iso_date"),
+        ("555-0199", "no_letters"),
+        ("(555) 010-0199", "no_letters"),
+    ])
+    def test_structured_values_skip_ner(self, value, rule):
+        assert classify_value(value) == rule
+
+    @pytest.mark.parametrize("value", [
+        "Alice",
+        "John Doe",
+        "Project Falcon",
+        "192.168.0.1",  # ip address is an NER label without a regex fallback
+        "X1234567",
+        "1" * 70,  # too long to trust the shape
+    ])
+    def test_textual_values_need_ner(self, value):
+        assert classify_value(value) is None
+
+    def test_rules_can_be_disabled(self):
+        assert classify_value("555-0199", rules=("numeric",)) is None
+
+    def test_decisions_are_counted(self):
+        metrics.reset()
+        assert needs_ner("Alice") is True
+        assert needs_ner("42") is False
+        assert metrics.get_counter("ner_prefilter_total", {"decision": "ner"}) == 1
+        assert metrics.get_counter("ner_prefilter_total", {"decision": "numeric"}) == 1
+        assert metrics.get_counter("ner_prefilter_skipped_chars_total") == 2
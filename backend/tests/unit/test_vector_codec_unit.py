@@ -0,0 +1,72 @@
+import json
+import numpy as np
+import pytest
+from app.utils.vector_codec import encode_vector, decode_vector, negotiate_encoding, set_request_encoding
+
+
+VECTOR = np.random.default_rng(0).normal(size=768).astype(np.float32)
+
+
+class TestVectorCodecUnit:
+
+    def test_json_encoding_is_a_float_list(self):
+        encoded = encode_vector(VECTOR, "json")
+
+        assert isinstance(encoded, list)
+        assert np.allclose(encoded, VECTOR)
+
+    @pytest.mark.parametrize("encoding, tolerance", [("f32", 0.0), ("f16", 2e-3), ("int8", 0.02)])
+    def test_binary_encodings_round_trip(self, encoding, tolerance):
+        encoded = encode_vector(VECTOR, encoding)
+        decoded = decode_vector(json.loads(json.dumps(encoded)))
+
+        assert encoded["encoding"] == encoding
+        assert encoded["dim"] == 768
+        assert np.max(np.abs(decoded - VECTOR)) <= tolerance * np.max(np.abs(VECTOR)) + 1e-7
+
+    def test_compact_encodings_shrink_the_response(self):
+        """
+        Scenario: One 768-dim vector serialized as JSON in each encoding.
+        Expectation: f16 is at least 4x smaller than the float list, int8 smaller still.
+        """
+        sizes = {e: len(json.dumps(encode_vector(VECTOR, e))) for e in ("json", "f32", "f16", "int8")}
+
+        assert sizes["f32"] < sizes["json"]
+        assert sizes["f16"] * 4 < sizes["json"]
+        assert sizes["int8"] < sizes["f16"]
+
+    def test_zero_vector_int8_has_unit_scale(self):
+        encoded = encode_vector(np.zeros(4), "int8")
+
+        assert encoded["scale"] == 1.0
+        assert decode_vector(encoded).tolist() == [0.0, 0.0, 0.0, 0.0]
+
+    def test_none_encodes_to_empty_list(self):
+        assert encode_vector(None, "f16") == []
+
+    def test_request_encoding_is_the_default(self):
+        set_request_encoding("f16")
+        try:
+            assert encode_vector(VECTOR)["encoding"] == "f16"
+        finally:
+            set_request_encoding("json")
+
+    def test_negotiation_prefers_query_over_accept(self):
+        assert negotiate_encoding("int8", "application/json; vector-encoding=f16") == "int8"
+        assert negotiate_encoding(None, "text/html, application/json; q=0.9; vector-encoding=\"F16\"") == "f16"
+        assert negotiate_encoding(None, "*/*") == "json"
+
+    def test_negotiation_rejects_unknown_encodings(self):
+        with pytest.raises(ValueError):
+            negotiate_encoding("bf16")
+
+    def test_decode_rejects_malformed_payloads(self):
+        with pytest.raises(ValueError):
+            decode_vector({"encoding": "f16", "data": "abc"})
+        with pytest.raises(ValueError):
+            decode_vector({"encoding": "f64", "data": ""})
+        with pytest.raises(ValueError):
+            decode_vector(["a", "b"])
+        for scale in ({"x": 1}, "2", None, True, float("nan")):
+            with pytest.raises(ValueError):
+                decode_vector({"encoding": "int8", "data": "AQI=", "scale": scale})
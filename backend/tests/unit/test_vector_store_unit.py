@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+from app.core.vector_store import VectorStore, normalize, train_ivf, assign_lists
+
+
+DIM = 16
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("train_min", 10 ** 9)  # no background builds unless a test asks for one
+    return VectorStore(directory=str(tmp_path / "store"), dim=DIM, **kwargs)
+
+
+def random_vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+class TestVectorStoreUnit:
+
+    def test_add_and_search_returns_nearest_first(self, tmp_path):
+        store = make_store(tmp_path)
+        vectors = random_vectors(50)
+        ids = [store.add(v, "text", f"row {i}") for i, v in enumerate(vectors)]
+
+        results = store.search(vectors[7] * 3.0, top_k=3)
+
+        assert ids == list(range(50))
+        assert results[0]["id"] == 7
+        assert results[0]["text"] == "row 7"
+        assert results[0]["source"] == "text"
+        assert results[0]["score"] == pytest.approx(1.0, abs=1e-3)
+        assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+    def test_zero_vector_is_not_stored(self, tmp_path):
+        store = make_store(tmp_path)
+
+        assert store.add(np.zeros(DIM), "text") is None
+        assert store.count == 0
+        assert store.search(random_vectors(1)[0]) == []
+
+    def test_dimension_mismatch_raises(self, tmp_path):
+        store = make_store(tmp_path)
+
+        with pytest.raises(ValueError):
+            store.add(np.ones(DIM + 1), "text")
+
+    def test_rows_are_visible_to_another_instance(self, tmp_path):
+        """
+        Scenario: Two store objects on one directory (like two gunicorn workers).
+        Expectation: Rows appended by one are found by the other, and ids keep increasing.
+        """
+        writer = make_store(tmp_path)
+        reader = make_store(tmp_path)
+        vectors = random_vectors(5)
+        for v in vectors[:3]:
+            writer.add(v, "form")
+        reader.add(vectors[3], "audio")
+
+        assert reader.search(vectors[1], top_k=1)[0]["id"] == 1
+        hit = writer.search(vectors[3], top_k=1)[0]
+        assert (hit["id"], hit["source"]) == (3, "audio")
+
+    def test_store_persists_across_restarts(self, tmp_path):
+        vectors = random_vectors(10)
+        store = make_store(tmp_path, dtype="float32")
+        for v in vectors:
+            store.add(v, "image", "described")
+
+        reopened = make_store(tmp_path, dtype="float32")
+
+        assert reopened.count == 10
+        assert reopened.search(vectors[4], top_k=1)[0]["id"] == 4
+
+    def test_deleted_rows_are_hidden_and_compaction_drops_them(self, tmp_path):
+        store = make_store(tmp_path)
+        vectors = random_vectors(20)
+        for i, v in enumerate(vectors):
+            store.add(v, "text", f"row {i}")
+
+        assert store.delete([3, 5]) == 2
+        assert all(r["id"] not in (3, 5) for r in store.search(vectors[3], top_k=20))
+
+        stats = store.compact()
+
+        assert stats == {"rows": 18, "removed": 2}
+        assert store.generation == "gen-1"
+        assert not (tmp_path / "store" / "gen-0").exists()
+        hit = store.search(vectors[10], top_k=1)[0]
+        assert (hit["id"], hit["text"]) == (10, "row 10")
+        # Ids are never reused, even after the last rows were compacted away.
+        store.delete([19])
+        store.compact()
+        assert store.add(vectors[0], "text") == 20
+
+    def test_concurrent_searches_read_their_own_metadata(self, tmp_path):
+        """
+        Scenario: Many threads search at once; one record is longer than a single metadata read.
+        Expectation: Every hit carries its own text (reads do not share a file position).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        store = make_store(tmp_path)
+        vectors = random_vectors(40)
+        texts = [("é" * 1900 if i == 0 else f"row {i}") for i in range(40)]
+        for v, text in zip(vectors, texts):
+            store.add(v, "text", text)
+
+        with ThreadPoolExecutor(8) as pool:
+            hits = list(pool.map(lambda i: store.search(vectors[i], top_k=1)[0], list(range(40)) * 5))
+
+        assert all(hit["text"] == texts[hit["id"]] for hit in hits)
+        assert hits[0]["text"] == "é" * 1900
+
+    def test_ivf_index_matches_brute_force(self, tmp_path):
+        """
+        Scenario: 2000 clustered rows indexed with IVF, queried with probing of every list.
+        Expectation: Same top-10 as the exhaustive scan; new rows past the index are still found.
+        """
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(20, DIM))
+        data = centers[rng.integers(0, 20, 2000)] + 0.1 * rng.normal(size=(2000, DIM))
+        store = make_store(tmp_path, dtype="float32")
+        for v in data:
+            store.add(v, "text")
+        query = data[123] + 0.05 * rng.normal(size=DIM)
+        exhaustive = [r["id"] for r in store.search(query, top_k=10)]
+
+        assert store.build_index()
+        assert store.indexed == 2000
+
+        indexed = [r["id"] for r in store.search(query, top_k=10, nprobe=10 ** 6)]
+        assert indexed == exhaustive
+        approximate = [r["id"] for r in store.search(query, top_k=10)]
+        assert len(set(approximate) & set(exhaustive)) >= 8
+
+        new_id = store.add(query, "text")
+        assert store.search(query, top_k=1)[0]["id"] == new_id
+
+    def test_index_is_loaded_by_other_instances(self, tmp_path):
+        store = make_store(tmp_path)
+        for v in random_vectors(300):
+            store.add(v, "text")
+        store.build_index()
+
+        other = make_store(tmp_path)
+
+        assert other.stats()["indexed"] == 300
+
+    def test_background_build_starts_at_threshold(self, tmp_path):
+        store = make_store(tmp_path, train_min=50)
+        for v in random_vectors(50):
+            store.add(v, "text")
+        store._build_thread.join(timeout=30)
+        store.refresh()
+
+        assert store.indexed == 50
+
+    def test_train_ivf_assigns_to_own_cluster(self):
+        rng = np.random.default_rng(2)
+        centers = np.eye(DIM)[:4]
+        data = np.stack([normalize(centers[i % 4] + 0.01 * rng.normal(size=DIM)) for i in range(400)])
+
+        centroids = train_ivf(data, 4)
+        assign = assign_lists(data, centroids)
+
+        for cluster in range(4):
+            assert len(set(assign[cluster::4])) == 1
+        assert len(set(assign)) == 4
+
+    def test_unknown_index_kind_raises(self, tmp_path):
+        with pytest.raises(ValueError):
+            make_store(tmp_path, index="lsh")
@@ -0,0 +1,121 @@
+import av
+import cv2 as cv
+import numpy as np
+from unittest.mock import MagicMock, patch
+from app.processors.face_blur import FaceDetection
+from app.processors.video_blur import FaceTracker, VideoFaceBlur, box_iou
+
+
+def write_clip(path, frames=10, fps=10, audio=False):
+    """Small mp4 of flat grey frames, optionally with an AAC sine track."""
+    with av.open(path, mode="w") as out:
+        video = out.add_stream("mpeg4", rate=fps)
+        video.width, video.height, video.pix_fmt = 64, 48, "yuv420p"
+        sound = out.add_stream("aac", rate=16000) if audio else None
+        for i in range(frames):
+            image = np.full((48, 64, 3), i * 20, dtype=np.uint8)
+            out.mux(video.encode(av.VideoFrame.from_ndarray(image, format="bgr24")))
+        out.mux(video.encode())
+        if sound is not None:
+            samples = (np.sin(np.arange(16000 * frames // fps) / 5) * 0.3).astype(np.float32)[None, :]
+            for start in range(0, samples.shape[1], 1024):
+                chunk = av.AudioFrame.from_ndarray(np.ascontiguousarray(samples[:, start:start + 1024]),
+                                                   format="fltp", layout="mono")
+                chunk.sample_rate, chunk.pts = 16000, start
+                out.mux(sound.encode(chunk))
+            out.mux(sound.encode())
+
+
+class TestVideoBlurUnit:
+
+    def test_box_iou(self):
+        a = np.array([0, 0, 10, 10], dtype=np.float32)
+        assert box_iou(a, a) == 1.0
+        assert box_iou(a, np.array([20, 20, 5, 5])) == 0.0
+        assert round(box_iou(a, np.array([5, 0, 10, 10])), 3) == 0.333
+
+    def test_tracker_extrapolates_between_keyframes(self):
+        """
+        Scenario: A face moves 10 px per frame between keyframes 0 and 5.
+        Expectation: Frame 7 is predicted 20 px further along without running detection.
+        """
+        tracker = FaceTracker(iou_threshold=0.1, padding=0.0)
+        tracker.update(np.array([[0, 0, 100, 100, 0.9]]), frame=0)
+        tracker.update(np.array([[50, 0, 100, 100, 0.9]]), frame=5)
+
+        boxes = tracker.boxes_at(7)
+        assert len(boxes) == 1
+        assert boxes[0][0] == 70
+        assert boxes[0][2] == 100
+
+    def test_tracker_drops_stale_tracks(self):
+        """A track survives a missed keyframe, then expires after max_misses."""
+        tracker = FaceTracker(max_misses=1)
+        tracker.update(np.array([[0, 0, 20, 20, 0.9]]), frame=0)
+        tracker.update(np.empty((0, 5)), frame=5)
+        assert len(tracker.boxes_at(5)) == 1
+        tracker.update(np.empty((0, 5)), frame=10)
+        assert len(tracker.boxes_at(10)) == 0
+
+    def test_process_runs_detection_only_on_keyframes(self, tmp_path):
+        """
+        Scenario: 10-frame clip with a detection interval of 4.
+        Expectation: YuNet runs on frames 0, 4 and 8 and every frame is written out.
+        """
+        input_path = str(tmp_path / "in.mp4")
+        output_path = str(tmp_path / "out.mp4")
+        write_clip(input_path)
+
+        detector = MagicMock()
+        detector.detect.return_value = np.array([[10, 10, 20, 20, 0.9]], dtype=np.float32)
+        video = VideoFaceBlur(detection_interval=4, detector_factory=lambda: detector, queue_size=2)
+
+        result = video.process(input_path, output_path)
+
+        assert result["frames"] == 10
+        assert result["keyframes"] == 3
+        assert detector.detect.call_count == 3
+        assert result["max_faces_per_frame"] == 1
+        assert result["audio"] == "none"
+
+        capture = cv.VideoCapture(output_path)
+        assert int(capture.get(cv.CAP_PROP_FRAME_COUNT)) == 10
+        capture.release()
+
+    def test_face_entering_between_keyframes_is_blurred_from_the_start(self, tmp_path):
+        """
+        Scenario: No face on keyframe 0; a face is first detected on keyframe 4.
+        Expectation: Frames 1-3, written before that detection, are blurred with it too.
+        """
+        input_path = str(tmp_path / "in.mp4")
+        write_clip(input_path, frames=6)
+        detector = MagicMock()
+        detector.detect.side_effect = [np.empty((0, 5), dtype=np.float32),
+                                       np.array([[10, 10, 20, 20, 0.9]], dtype=np.float32)]
+        video = VideoFaceBlur(detection_interval=4, detector_factory=lambda: detector)
+        blurred = []
+
+        def record(frame, boxes):
+            blurred.append(len(boxes))
+            return frame
+
+        with patch.object(FaceDetection, "blur_boxes", side_effect=record):
+            video.process(input_path, str(tmp_path / "out.mp4"))
+
+        assert blurred == [0, 1, 1, 1, 1, 1]
+
+    def test_audio_track_is_copied(self, tmp_path):
+        input_path = str(tmp_path / "in.mp4")
+        output_path = str(tmp_path / "out.mp4")
+        write_clip(input_path, audio=True)
+        detector = MagicMock()
+        detector.detect.return_value = np.empty((0, 5), dtype=np.float32)
+
+        result = VideoFaceBlur(detector_factory=lambda: detector).process(input_path, output_path)
+
+        assert result["audio"] == "copied"
+        with av.open(output_path) as container:
+            assert len(container.streams.video) == 1
+            assert container.streams.audio[0].codec_context.name == "aac"
+            assert sum(1 for packet in container.demux(video=0) if packet.dts is not None) == 10
+        assert not (tmp_path / "out.mp4.video.mp4").exists()
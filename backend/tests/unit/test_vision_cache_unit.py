@@ -0,0 +1,142 @@
+import cv2 as cv
+import numpy as np
+import pytest
+from unittest.mock import patch, MagicMock
+from app.core.vision import VisionEngine
+from app.core.vision_cache import VisionCache, phash, dhash
+
+
+def document_image(seed=0, size=(300, 400)):
+    """Synthetic 'page': random dark boxes on white."""
+    rng = np.random.default_rng(seed)
+    img = np.full(size + (3,), 255, dtype=np.uint8)
+    for _ in range(12):
+        y, x = rng.integers(0, size[0] - 40), rng.integers(0, size[1] - 80)
+        cv.rectangle(img, (int(x), int(y)), (int(x + 80), int(y + 30)), (40, 40, 40), -1)
+    return img
+
+
+def png(img):
+    return cv.imencode(".png", img)[1].tobytes()
+
+
+def rescan(img):
+    """Same page re-scanned: JPEG round trip, a little sensor noise, slightly different size."""
+    noisy = np.clip(img.astype(np.int16) + np.random.default_rng(9).integers(-6, 7, img.shape), 0, 255)
+    resized = cv.resize(noisy.astype(np.uint8), (img.shape[1] + 12, img.shape[0] + 9))
+    return cv.imdecode(cv.imencode(".jpg", resized, [cv.IMWRITE_JPEG_QUALITY, 70])[1], cv.IMREAD_COLOR)
+
+
+class TestVisionCacheUnit:
+
+    def test_hashes_are_stable_for_near_duplicates(self):
+        gray = cv.cvtColor(document_image(), cv.COLOR_BGR2GRAY)
+        gray_rescan = cv.cvtColor(rescan(document_image()), cv.COLOR_BGR2GRAY)
+        other = cv.cvtColor(document_image(seed=5), cv.COLOR_BGR2GRAY)
+
+        assert (phash(gray) ^ phash(gray_rescan)).bit_count() <= 4
+        assert (dhash(gray) ^ dhash(gray_rescan)).bit_count() <= 4
+        assert (phash(gray) ^ phash(other)).bit_count() > 10
+
+    def test_near_duplicate_hits_and_different_image_misses(self):
+        cache = VisionCache(max_entries=10, max_distance=4)
+        key = cache.key(png(document_image()), "vision", "describe")
+        cache.put(key, "A letter on company letterhead.")
+
+        assert cache.get(cache.key(png(rescan(document_image())), "vision", "describe")) == "A letter on company letterhead."
+        assert cache.get(cache.key(png(document_image(seed=5)), "vision", "describe")) is None
+
+    def test_prompt_and_model_are_part_of_the_key(self):
+        cache = VisionCache(max_entries=10, max_distance=4)
+        image = png(document_image())
+        cache.put(cache.key(image, "vision", "describe"), "cached")
+
+        assert cache.get(cache.key(image, "vision", "describe the pdf")) is None
+        assert cache.get(cache.key(image, "other-model", "describe")) is None
+
+    def test_tenants_do_not_share_entries(self):
+        cache = VisionCache(max_entries=10, max_distance=4)
+        image = png(document_image())
+        cache.put(cache.key(image, "vision", "describe", "tenant-a"), "cached")
+
+        assert cache.get(cache.key(image, "vision", "describe", "tenant-b")) is None
+        assert cache.get(cache.key(image, "vision", "describe", "tenant-a")) == "cached"
+
+    def test_exact_lookup_ignores_near_duplicates(self):
+        """
+        Scenario: A page is cached; a re-scan of it is looked up with fuzzy=False, and with fuzzy matching off.
+        Expectation: Both miss; only identical pixels hit.
+        """
+        cache = VisionCache(max_entries=10, max_distance=4)
+        cache.put(cache.key(document_image(), "vision", "describe"), "cached")
+        rescanned = cache.key(rescan(document_image()), "vision", "describe")
+
+        assert cache.get(rescanned, fuzzy=False) is None
+        assert VisionCache(max_entries=10, max_distance=0).get(rescanned) is None
+        assert cache.get(cache.key(document_image(), "vision", "describe"), fuzzy=False) == "cached"
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VisionCache(max_entries=2, max_distance=0)
+        keys = [cache.key(png(document_image(seed=s)), "vision", "p") for s in range(3)]
+        cache.put(keys[0], "zero")
+        cache.put(keys[1], "one")
+        cache.get(keys[0])
+        cache.put(keys[2], "two")
+
+        assert len(cache) == 2
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) == "zero"
+
+    def test_undecodable_bytes_have_no_key(self):
+        assert VisionCache().key(b"not an image", "vision", "p") is None
+
+
+class TestVisionEngineCacheUnit:
+
+    @pytest.fixture
+    def engine(self):
+        return VisionEngine(cache=VisionCache(max_entries=10, max_distance=4))
+
+    @patch('app.core.vision.requests.post')
+    def test_blurred_images_are_described_once(self, mock_post, engine):
+        mock_post.return_value = MagicMock(**{"json.return_value": {"response": "A page of text."}})
+
+        first = engine.describe_image(png(document_image()), blurred=True)
+        second = engine.describe_image(png(rescan(document_image())), blurred=True)
+
+        assert first == second == "A page of text."
+        assert mock_post.call_count == 1
+
+    @patch('app.core.vision.requests.post')
+    def test_unblurred_images_bypass_the_cache(self, mock_post, engine):
+        mock_post.return_value = MagicMock(**{"json.return_value": {"response": "A face."}})
+
+        engine.describe_image(png(document_image()))
+        engine.describe_image(png(document_image()))
+
+        assert mock_post.call_count == 2
+        assert len(engine.cache) == 0
+
+    @patch('app.core.vision.requests.post')
+    def test_failures_are_not_cached(self, mock_post, engine):
+        mock_post.side_effect = Exception("model crashed")
+
+        engine.describe_image(png(document_image()), blurred=True)
+
+        assert len(engine.cache) == 0
+
+    @patch('app.core.vision.requests.post')
+    def test_pdf_pages_only_hit_identical_pixels(self, mock_post, engine):
+        mock_post.return_value = MagicMock(**{"json.return_value": {"response": "A page of text."}})
+
+        engine.describe_pdf_content(document_image(), blurred=True)
+        engine.describe_pdf_content(rescan(document_image()), blurred=True)
+        engine.describe_pdf_content(document_image(), blurred=True)
+
+        assert mock_post.call_count == 2
+
+    @patch('app.core.vision.prepare_vision_payload', side_effect=ValueError("Could not encode image as jpeg"))
+    @patch('app.core.vision.requests.post')
+    def test_unencodable_pixels_fall_back_instead_of_raising(self, mock_post, _, engine):
+        assert engine.describe_image(document_image(), blurred=True) == "Error generating image description."
+        mock_post.assert_not_called()
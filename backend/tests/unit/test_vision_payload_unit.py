@@ -0,0 +1,60 @@
+import base64
+import cv2 as cv
+import numpy as np
+import pytest
+from PIL import Image
+from app.utils.vision_payload import VisionPayload, prepare_vision_payload
+
+
+def photo(height=3000, width=2000):
+    rng = np.random.default_rng(0)
+    base = cv.resize(rng.integers(0, 255, (30, 20, 3), dtype=np.uint8), (width, height))
+    return base
+
+
+class TestVisionPayloadUnit:
+
+    def test_large_image_is_downscaled_to_model_input(self):
+        """
+        Scenario: 2000x3000 image (a phone photo).
+        Expectation: Longer side fits the 1120px input, aspect ratio kept, JPEG well under 1 MB.
+        """
+        payload = prepare_vision_payload(photo(), max_side=1120)
+
+        assert payload.image.shape[:2] == (1120, 747)
+        assert payload.mime == "image/jpeg"
+        raw = base64.b64decode(payload.data)
+        assert raw[:3] == b"\xff\xd8\xff"
+        assert payload.nbytes == len(raw) < 1_000_000
+
+    def test_small_image_is_not_upscaled(self):
+        payload = prepare_vision_payload(np.zeros((100, 50, 3), dtype=np.uint8), max_side=1120)
+
+        assert payload.image.shape[:2] == (100, 50)
+
+    def test_pil_and_encoded_inputs_match_pixels(self):
+        bgr = photo(200, 100)
+        rgb = Image.fromarray(cv.cvtColor(bgr, cv.COLOR_BGR2RGB))
+        png = cv.imencode(".png", bgr)[1].tobytes()
+
+        from_pil = prepare_vision_payload(rgb)
+        from_png = prepare_vision_payload(png)
+
+        assert np.array_equal(from_pil.image, bgr)
+        assert np.array_equal(from_png.image, bgr)
+
+    def test_webp_format(self):
+        payload = prepare_vision_payload(photo(200, 100), fmt="webp")
+
+        assert payload.mime == "image/webp"
+        assert base64.b64decode(payload.data)[8:12] == b"WEBP"
+
+    def test_payload_is_returned_unchanged(self):
+        payload = prepare_vision_payload(photo(200, 100))
+
+        assert prepare_vision_payload(payload) is payload
+        assert isinstance(payload, VisionPayload)
+
+    def test_undecodable_bytes_raise(self):
+        with pytest.raises(ValueError):
+            prepare_vision_payload(b"not an image")
@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app.processors.whisper_pool import WhisperModelPool, choose_model_size, downgrade
+
+
+MEMORY = {"tiny": 100, "base": 200, "small": 500, "medium": 1500}
+
+
+class TestWhisperPoolUnit:
+
+    def test_pool_reuses_loaded_models(self):
+        loader = MagicMock(side_effect=lambda size: f"model-{size}")
+        pool = WhisperModelPool(loader, memory_budget_mb=1000, model_memory_mb=MEMORY)
+
+        assert pool.get("tiny") == "model-tiny"
+        assert pool.get("tiny") == "model-tiny"
+        loader.assert_called_once_with("tiny")
+
+    def test_pool_evicts_least_recently_used(self):
+        """
+        Scenario: Budget 700 MB with tiny, base loaded; tiny used again, then small requested.
+        Expectation: base (least recently used) is evicted, tiny stays.
+        """
+        pool = WhisperModelPool(lambda size: size, memory_budget_mb=700, model_memory_mb=MEMORY)
+        pool.get("tiny")
+        pool.get("base")
+        pool.get("tiny")
+        pool.get("small")
+
+        assert pool.loaded() == ["tiny", "small"]
+        assert pool.memory_used_mb() == 600
+
+    def test_pool_never_evicts_pinned(self):
+        pool = WhisperModelPool(lambda size: size, memory_budget_mb=600, model_memory_mb=MEMORY, pinned=("small",))
+        pool.get("small")
+        pool.get("base")
+        pool.get("tiny")
+
+        assert "small" in pool.loaded()
+        assert "base" not in pool.loaded()
+
+    def test_parallel_transcriber_counts_against_the_budget(self):
+        """
+        Scenario: Budget 1000 MB, tiny and base loaded; a 4-worker parallel transcriber of base, then of tiny.
+        Expectation: The first is charged 800 MB and evicts tiny; the second replaces and closes it.
+        """
+        parallel = MagicMock(side_effect=lambda size: MagicMock(name=size))
+        pool = WhisperModelPool(lambda size: size, memory_budget_mb=1000, model_memory_mb=MEMORY,
+                                pinned=("base",), parallel_loader=parallel, parallel_workers=4)
+        pool.get("tiny")
+        pool.get("base")
+        first = pool.get_parallel("base")
+
+        assert pool.loaded() == ["base", "parallel:base"]
+        assert pool.memory_used_mb() == 1000
+
+        pool.get_parallel("tiny")
+        first.close.assert_called_once_with()
+        assert pool.loaded() == ["base", "parallel:tiny"]
+
+        pool.close()
+        assert pool.loaded() == ["base"]
+
+    def test_pool_rejects_unknown_size(self):
+        pool = WhisperModelPool(lambda size: size, model_memory_mb=MEMORY)
+        with pytest.raises(ValueError):
+            pool.get("huge")
+
+    def test_downgrade_stops_at_fastest(self):
+        assert downgrade("small", 1) == "base"
+        assert downgrade("base", 5) == "tiny"
+
+    def test_choose_model_size(self):
+        with patch("app.processors.whisper_pool.WHISPER_MODEL_SIZE", "small"), \
+             patch("app.processors.whisper_pool.WHISPER_DOWNGRADE_ACTIVE_REQUESTS", 4):
+            assert choose_model_size(None) == "small"
+            assert choose_model_size("medium", duration=10000, active_requests=50) == "medium"
+            assert choose_model_size("auto", duration=60) == "small"
+            assert choose_model_size("auto", duration=900) == "base"
+            assert choose_model_size("auto", duration=7200) == "tiny"
+            assert choose_model_size("auto", duration=60, active_requests=4) == "base"
+            with pytest.raises(ValueError):
+                choose_model_size("huge")